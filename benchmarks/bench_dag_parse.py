@@ -0,0 +1,109 @@
+"""Benchmark: time the scheduler spends parsing dags/pipeline_airflow.py.
+
+Each repeat runs in a fresh interpreter that first imports the Airflow modules
+the DAG processor already has loaded, then parses the DAG file with DagBag, the
+way the scheduler does, under python -X importtime. Reports the parse time, the
+import time the DAG file adds and its heaviest imports.
+
+    python benchmarks/bench_dag_parse.py --repeat 5 --budget-ms 250
+
+Exits with status 1 if the median parse time is over --budget-ms or parsing
+imports one of the --forbid modules.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DAG_FILE = os.path.join(ROOT_DIR, 'dags', 'pipeline_airflow.py')
+
+# Modules only the task callables need; importing any of them at parse time is a regression
+FORBIDDEN_MODULES = ['pandas', 'numpy', 'pyarrow', 'steps.pipeline_tasks', 'steps.b_clean_trasform']
+
+MARKER = '--- parse ---'
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+import airflow.models.dagbag, airflow.models.mappedoperator, airflow.operators.python
+import airflow.serialization.serialized_objects
+from airflow.models.dagbag import DagBag
+before = set(sys.modules)
+print({marker!r}, file=sys.stderr, flush=True)
+start = time.perf_counter()
+bag = DagBag(dag_folder={dag_file!r}, include_examples=False)
+parse_ms = (time.perf_counter() - start) * 1000
+print(json.dumps({{'parse_ms': parse_ms, 'dag_ids': sorted(bag.dag_ids), 'import_errors': bag.import_errors,
+                  'modules': sorted(set(sys.modules) - before)}}))
+"""
+
+
+def parse_importtime(stderr):
+    """(module, cumulative microseconds, depth) of every import after the marker line"""
+    lines = stderr.split(MARKER, 1)[-1].splitlines()
+    imports = []
+    for line in lines:
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2 - 1
+        imports.append((name.strip(), int(cumulative), depth))
+    return imports
+
+
+def measure(dag_file=DAG_FILE):
+    """Parse dag_file once in a fresh interpreter; returns the child's measurements plus its imports"""
+    code = CHILD.format(root=ROOT_DIR, marker=MARKER, dag_file=dag_file)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT_DIR, check=True,
+                          capture_output=True, text=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['imports'] = parse_importtime(proc.stderr)
+    result['import_ms'] = sum(cumulative for _, cumulative, depth in result['imports'] if depth == 0) / 1000
+    return result
+
+
+def check(results, budget_ms, forbid=FORBIDDEN_MODULES):
+    """Budget violations of a set of runs, as messages; empty when parsing is within budget"""
+    problems = []
+    median_ms = statistics.median(result['parse_ms'] for result in results)
+    if median_ms > budget_ms:
+        problems.append(f"median parse time {median_ms:.0f} ms is over the {budget_ms:.0f} ms budget")
+    loaded = sorted({module for result in results for name in result['modules'] for module in forbid
+                     if name == module or name.startswith(module + '.')})
+    if loaded:
+        problems.append(f"parsing imported {', '.join(loaded)}")
+    for result in results:
+        if result['import_errors'] or not result['dag_ids']:
+            problems.append(f"DAG file failed to parse: {result['import_errors']}")
+            break
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=250)
+    parser.add_argument('--forbid', nargs='*', default=FORBIDDEN_MODULES)
+    parser.add_argument('--top', type=int, default=10, help='heaviest imports to list')
+    args = parser.parse_args()
+
+    results = [measure() for _ in range(args.repeat)]
+    print(f"{'run':>4}{'parse ms':>12}{'import ms':>12}{'modules':>10}")
+    for i, result in enumerate(results, 1):
+        print(f"{i:>4}{result['parse_ms']:>12.1f}{result['import_ms']:>12.1f}{len(result['modules']):>10}")
+
+    print("\nHeaviest imports while parsing (last run, cumulative ms):")
+    for name, cumulative, depth in sorted(results[-1]['imports'], key=lambda i: -i[1])[:args.top]:
+        print(f"{cumulative / 1000:>10.1f}  {'  ' * depth}{name}")
+
+    problems = check(results, args.budget_ms, args.forbid)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark: serial whole-file Data Lake transfers vs. concurrent chunked ones.
+
+Runs against LocalStorageBackend, wrapping it to add a fixed latency and a
+per-connection bandwidth to each request, so the effect of overlapping
+transfers shows up without a network.
+The serial path mirrors the notebook: read each file whole, upload it, then
+download it and decode it to a string before parsing. The concurrent path
+uses steps.ingestion from a thread pool and streams ranges into read_csv.
+
+    python benchmarks/bench_ingestion.py --files 8 --rows 200000 --latency-ms 20 --mbps 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import StringIO
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_load_orders import make_orders
+from steps.ingestion import LocalStorageBackend, read_csv_files, upload_directory
+
+
+class LatencyBackend(LocalStorageBackend):
+    """LocalStorageBackend that sleeps like a remote request: round trip plus bytes / bandwidth"""
+
+    def __init__(self, root, latency, bandwidth):
+        super().__init__(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def _wait(self, nbytes=0):
+        time.sleep(self.latency + nbytes / self.bandwidth)
+
+    def size(self, path):
+        self._wait()
+        return super().size(path)
+
+    def read_range(self, path, offset, length):
+        data = super().read_range(path, offset, length)
+        self._wait(len(data))
+        return data
+
+    def append(self, path, data, offset):
+        self._wait(len(data))
+        super().append(path, data, offset)
+
+
+def serial_roundtrip(backend, local_dir, dest_dir):
+    for name in sorted(os.listdir(local_dir)):
+        with open(os.path.join(local_dir, name), 'rb') as f:
+            contents = f.read()
+        backend.create(f"{dest_dir}/{name}")
+        backend.append(f"{dest_dir}/{name}", contents, 0)
+        backend.flush(f"{dest_dir}/{name}", len(contents))
+    frames = {}
+    for path in backend.list(dest_dir):
+        text = backend.read_range(path, 0, backend.size(path)).decode('utf-8')
+        frames[os.path.basename(path)] = pd.read_csv(StringIO(text))
+    return frames
+
+
+def concurrent_roundtrip(backend, local_dir, dest_dir, workers):
+    upload_directory(backend, local_dir, dest_dir, workers=workers)
+    return read_csv_files(backend, backend.list(dest_dir), workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--mbps', type=float, default=50.0, help='bandwidth of each connection, MB/s')
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        local_dir = os.path.join(tmp, 'raw')
+        os.makedirs(local_dir)
+        orders_df = make_orders(args.rows)
+        for i in range(args.files):
+            orders_df.to_csv(os.path.join(local_dir, f'pedidos_{i:03d}.csv'), index=False)
+        total_mb = sum(os.path.getsize(os.path.join(local_dir, f)) for f in os.listdir(local_dir)) / 1024 ** 2
+
+        backend = LatencyBackend(os.path.join(tmp, 'lake'), args.latency_ms / 1000, args.mbps * 1024 ** 2)
+        print(f"{args.files} files, {total_mb:.1f} MB, {args.latency_ms:.0f} ms + {args.mbps:.0f} MB/s per request")
+        print(f"{'mode':<12}{'seconds':>10}{'MB/s':>10}")
+        for mode, run in (('serial', lambda: serial_roundtrip(backend, local_dir, 'serial')),
+                          ('concurrent', lambda: concurrent_roundtrip(backend, local_dir, 'concurrent',
+                                                                     args.workers))):
+            start = time.perf_counter()
+            frames = run()
+            elapsed = time.perf_counter() - start
+            assert sum(len(df) for df in frames.values()) == args.files * args.rows
+            print(f"{mode:<12}{elapsed:>10.2f}{total_mb / elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark: COPY bulk load vs. row-by-row INSERT into fato_pedidos.
+
+Requires a reachable PostgreSQL configured in load_data_to_postgres.DB_PARAMS.
+
+    python benchmarks/bench_load_orders.py --rows 1000000 --row-sample 20000
+
+The row-by-row path issues two round trips per order, so by default it is timed
+on a sample of --row-sample rows and its rate is extrapolated to --rows.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import load_data_to_postgres as loader
+
+
+def make_orders(rows, seed=42):
+    """Build a synthetic processed orders frame with the fato_pedidos columns"""
+    rng = np.random.default_rng(seed)
+    created_at = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, rows), unit='min')
+    step = pd.to_timedelta(rng.integers(10, 24 * 60, rows), unit='min')
+    return pd.DataFrame({
+        'user_id': rng.integers(1001, 1005, rows),
+        'created_at': created_at,
+        'items': rng.choice(['Laptop, Mouse', 'Headphones', 'Monitor, Keyboard', 'Smartphone'], rows),
+        'total': rng.integers(1000, 500000, rows) / 100,
+        'payment_status': rng.choice(['Paid', 'Awaiting'], rows),
+        'payment_method': rng.choice(['Credit Card', 'PayPal', 'Debit Card', 'Apple Pay'], rows),
+        'payment_date': created_at + step,
+        'shipping_status': rng.choice(['Awaiting', 'Preparing', 'Sent', 'Delivered'], rows),
+        'shipping_status_date_awaiting_payment': created_at,
+        'shipping_status_date_preparing': created_at + step,
+        'shipping_status_date_sent': created_at + 2 * step,
+        'shipping_status_date_delivered': created_at + 3 * step,
+    })
+
+
+def time_load(conn, orders_file, bulk, batch_size):
+    loader.ORDERS_FILE = orders_file
+    start = time.perf_counter()
+    loaded = loader.load_orders_data(conn, None, bulk=bulk, batch_size=batch_size)
+    return loaded, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--row-sample', type=int, default=20_000,
+                        help='rows used to time the row-by-row path (0 = all rows)')
+    parser.add_argument('--batch-size', type=int, default=loader.COPY_BATCH_SIZE)
+    args = parser.parse_args()
+
+    conn = loader.get_connection()
+    if not conn:
+        sys.exit(1)
+
+    try:
+        loader.create_tables(conn)
+        with tempfile.TemporaryDirectory() as tmp:
+            orders_df = make_orders(args.rows)
+            full_file = os.path.join(tmp, 'orders_full.csv')
+            orders_df.to_csv(full_file, index=False)
+
+            # The fact table references user_id, so make sure the synthetic users exist
+            cursor = conn.cursor()
+            cursor.execute("""
+            INSERT INTO dim_usuarios (user_id, name, entry_date, entry_time, email, cpf)
+            SELECT id, 'Bench User', DATE '2024-01-01', TIME '00:00', 'bench@example.com', '00000000000'
+            FROM generate_series(1001, 1004) AS id
+            ON CONFLICT (user_id) DO NOTHING
+            """)
+            conn.commit()
+
+            # Calendar covering the synthetic order dates, so no order is rejected
+            loader.ORDERS_FILE = full_file
+            loader.generate_time_dimension(conn)
+
+            loaded, copy_elapsed = time_load(conn, full_file, True, args.batch_size)
+            copy_rate = loaded / copy_elapsed
+
+            sample = args.row_sample or args.rows
+            sample_file = os.path.join(tmp, 'orders_sample.csv')
+            orders_df.head(sample).to_csv(sample_file, index=False)
+            sampled, row_elapsed = time_load(conn, sample_file, False, args.batch_size)
+            row_rate = sampled / row_elapsed
+
+        print()
+        print(f"{'mode':<10}{'rows':>12}{'seconds':>12}{'rows/s':>14}")
+        print(f"{'copy':<10}{loaded:>12,}{copy_elapsed:>12.2f}{copy_rate:>14,.0f}")
+        print(f"{'row':<10}{sampled:>12,}{row_elapsed:>12.2f}{row_rate:>14,.0f}")
+        print(f"Estimated row-by-row time for {args.rows:,} rows: {args.rows / row_rate:,.0f}s")
+        print(f"Speedup: {copy_rate / row_rate:,.1f}x")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,353 @@
+"""Benchmark: the whole pipeline on generated data, stage by stage.
+
+Generates a seeded dataset with generate_data.py into a scratch working
+directory, then runs every stage in a fresh interpreter there, so each peak
+RSS belongs to that stage alone:
+
+    process_user_data, process_product_data, process_order_data, generate_reports,
+    create_tables, generate_time_dimension, load_users_data, load_products_data,
+    load_orders_data
+
+or, with --stages stream_to_postgres, the streaming mode that goes from the raw
+files to PostgreSQL without processed files (it needs --sink postgres). Run it
+with --reset-db and compare its wall time with the sum of the process and load
+stages.
+
+Each stage reports wall time, CPU time and peak RSS (the baseline is the peak
+right after imports). The load stages write either to PostgreSQL (--sink
+postgres, with the --db-* options) or to a dry-run sink that answers the
+loader's lookups from the processed files and counts the COPY bytes instead of
+sending them, so the loader's in-memory work is still measured. The dry-run
+sink skips load_users_data and load_products_data, which go through to_sql.
+
+    python benchmarks/bench_pipeline.py --orders 1000000 --output results.json
+    python benchmarks/bench_pipeline.py --orders 1000000 --sink postgres --db-name seven --reset-db
+
+Results (dataset sizes, per-stage measurements, git revision and library
+versions) are printed and, with --output, written as JSON so runs can be
+compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from generate_data import DIRTY_RATE, write_dataset
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROCESS_STAGES = ['process_user_data', 'process_product_data', 'process_order_data', 'generate_reports']
+LOAD_STAGES = ['create_tables', 'generate_time_dimension', 'load_users_data', 'load_products_data',
+               'load_orders_data']
+
+STREAM_STAGES = ['stream_to_postgres']
+
+# Stages that load through pandas.to_sql and need a real database
+TO_SQL_STAGES = {'load_users_data', 'load_products_data', 'stream_to_postgres'}
+
+# Tables dropped by --reset-db, dependents first
+LOADER_TABLES = ['rollup_produtos', 'rollup_pedidos_mes', 'rollup_receita_pagamento', 'rollup_pedidos_status',
+                 'rollup_ticket_cliente', 'itens_pedido', 'fato_pedidos', 'dim_tempo', 'dim_produtos_historico',
+                 'dim_produtos', 'dim_usuarios_historico', 'dim_usuarios']
+
+
+def peak_kb():
+    # VmHWM is read instead of ru_maxrss, which Linux carries over from the parent across exec
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith('VmHWM'))
+
+
+class DryRunCursor:
+    """Cursor that answers the loader's lookups locally and only counts what COPY would send"""
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.sql = None
+        self.params = None
+
+    def execute(self, sql, params=None):
+        self.sql, self.params = sql, params
+
+    def fetchone(self):
+        # Empty tables: MAX(...) lookups return NULL, so every stage does a full load
+        if 'FROM dim_tempo' in self.sql:
+            return (None, 0)
+        return (None,)
+
+    def fetchall(self):
+        if 'FROM dim_tempo' in self.sql:
+            return self.sink.calendar()
+        if 'FROM dim_produtos' in self.sql:
+            return self.sink.products()
+        if 'FROM dim_usuarios' in self.sql:
+            return self.sink.users()
+        if 'generate_series' in self.sql:
+            return self.sink.next_ids(self.params[0])
+        return []
+
+    def copy_expert(self, sql, buffer):
+        data = buffer.getvalue()
+        self.sink.copy_bytes += len(data.encode('utf-8') if isinstance(data, str) else data)
+        if sql.startswith('COPY dim_tempo '):
+            self.sink.save_calendar(data)
+
+    def close(self):
+        pass
+
+
+class DryRunConnection:
+    """psycopg2-like connection backed by DryRunCursor; commits and rollbacks do nothing"""
+
+    def __init__(self, loader, state_dir):
+        self.loader = loader
+        self.state_dir = state_dir
+        self.copy_bytes = 0
+        self.last_id = 0
+
+    def cursor(self):
+        return DryRunCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+    @property
+    def calendar_file(self):
+        return os.path.join(self.state_dir, 'dry_run_dim_tempo.csv')
+
+    def save_calendar(self, data):
+        # The time dimension stage keeps its rows so the orders stage can look dates up
+        with open(self.calendar_file, 'w', encoding='utf-8') as f:
+            f.write(data)
+
+    def calendar(self):
+        if not os.path.exists(self.calendar_file):
+            return []
+        calendar_df = pd.read_csv(self.calendar_file, header=None, usecols=[0, 1], names=['tempo_id', 'data'])
+        return list(zip(pd.to_datetime(calendar_df['data']).dt.date, calendar_df['tempo_id']))
+
+    def products(self):
+        products_df = self.loader.read_processed_file(self.loader.PRODUCTS_FILE, 'dim_produtos',
+                                                      columns=['name', 'product_id'])
+        return list(products_df[['name', 'product_id']].itertuples(index=False, name=None))
+
+    def users(self):
+        # Every processed user counts as loaded, so orders are only rejected for the other constraints
+        users_df = self.loader.read_processed_file(self.loader.USERS_FILE, 'dim_users', columns=['user_id'])
+        return [(user_id,) for user_id in users_df['user_id'].dropna()]
+
+    def next_ids(self, count):
+        ids = [(self.last_id + i,) for i in range(1, count + 1)]
+        self.last_id += count
+        return ids
+
+
+def configure_loader(loader, workdir):
+    # The loader reads the files the DAG writes inside the scratch working directory
+    data_dir = os.path.join(workdir, 'data', 'desafio', 'processed')
+    rejects_dir = os.path.join(workdir, 'data', 'desafio', 'rejects')
+    loader.DATA_DIR = data_dir
+    loader.USERS_FILE = os.path.join(data_dir, 'dim_users.csv')
+    loader.PRODUCTS_FILE = os.path.join(data_dir, 'dim_produtos.csv')
+    loader.ORDERS_FILE = os.path.join(data_dir, 'fato_orders.csv')
+    loader.REJECTS_DIR = rejects_dir
+    loader.USERS_REJECTS_FILE = os.path.join(rejects_dir, 'users_rejected.csv')
+    loader.PRODUCTS_REJECTS_FILE = os.path.join(rejects_dir, 'products_rejected.csv')
+    loader.ORDERS_REJECTS_FILE = os.path.join(rejects_dir, 'orders_rejected.csv')
+    loader.ORDER_ITEMS_UNRESOLVED_FILE = os.path.join(rejects_dir, 'order_items_unresolved.csv')
+    loader.ORDER_ITEMS_REJECTS_FILE = os.path.join(rejects_dir, 'order_items_rejected.csv')
+    loader.LOADER_FINGERPRINTS_DIR = fingerprints_dir(workdir)
+
+
+def fingerprints_dir(workdir):
+    # Local index of the loaded order fingerprints (SEVEN_FINGERPRINT_INDEX=1)
+    return os.path.join(workdir, 'data', 'desafio', 'state', 'fingerprints', 'orders')
+
+
+def run_load_stage(loader, stage, conn, engine):
+    if stage == 'create_tables':
+        return loader.create_tables(conn)
+    if stage == 'generate_time_dimension':
+        calendar_df = loader.generate_time_dimension(conn)
+        return None if calendar_df is None else len(calendar_df)
+    if stage == 'load_users_data':
+        return loader.load_users_data(engine)
+    if stage == 'load_products_data':
+        return loader.load_products_data(engine)
+    return loader.load_orders_data(conn, engine)
+
+
+def child_main(args):
+    """Run one stage in this interpreter and print its measurements as the last output line"""
+    sys.path.insert(0, ROOT_DIR)
+    workdir = os.getcwd()
+    if args.stage in PROCESS_STAGES:
+        import steps.pipeline_tasks as pipeline
+        stage = getattr(pipeline, args.stage)
+        conn = engine = None
+    elif args.stage in STREAM_STAGES:
+        import load_data_to_postgres as loader
+        import stream_to_postgres as streaming
+        configure_loader(loader, workdir)
+        streaming.RAW_DIR = os.path.join(workdir, 'data', 'desafio', 'raw')
+        loader.DB_PARAMS.update(dbname=args.db_name, user=args.db_user, password=args.db_password,
+                                host=args.db_host, port=str(args.db_port))
+        engine = loader.get_engine()
+        conn = None
+        stage = lambda: streaming.run_streaming(engine)
+    else:
+        import load_data_to_postgres as loader
+        configure_loader(loader, workdir)
+        if args.sink == 'dry-run':
+            conn, engine = DryRunConnection(loader, workdir), None
+        else:
+            loader.DB_PARAMS.update(dbname=args.db_name, user=args.db_user, password=args.db_password,
+                                    host=args.db_host, port=str(args.db_port))
+            engine = loader.get_engine(pool_size=2)
+            conn = engine.raw_connection()
+        stage = lambda: run_load_stage(loader, args.stage, conn, engine)
+
+    baseline = peak_kb()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = stage()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    measurement = {'wall_s': wall, 'cpu_s': cpu, 'baseline_kb': baseline, 'peak_kb': peak_kb(),
+                   'result': None if result is None else str(result)}
+    if isinstance(conn, DryRunConnection):
+        measurement['sink_bytes'] = conn.copy_bytes
+    elif conn is not None:
+        conn.close()
+    if engine is not None:
+        engine.dispose()
+    print(json.dumps(measurement))
+
+
+def child_args(args):
+    return ['--sink', args.sink, '--db-name', args.db_name, '--db-user', args.db_user,
+            '--db-password', args.db_password, '--db-host', args.db_host, '--db-port', str(args.db_port)]
+
+
+def measure(workdir, stage, args):
+    if args.sink == 'dry-run' and stage in TO_SQL_STAGES:
+        return {'status': 'skipped', 'reason': 'to_sql needs a database'}
+    command = [sys.executable, os.path.abspath(__file__), '--run-stage', stage] + child_args(args)
+    completed = subprocess.run(command, cwd=workdir, capture_output=True, text=True)
+    if completed.returncode != 0:
+        # The exception line is the last 'SomethingError: message' line of the traceback
+        error = [line for line in completed.stderr.splitlines()
+                 if re.match(r'[\w.]*(Error|Exception|Violation)\b.*: ', line)]
+        return {'status': 'error', 'error': error[-1] if error else f'exit status {completed.returncode}',
+                'stderr': completed.stderr[-4000:]}
+    *output, last_line = completed.stdout.strip().splitlines()
+    measurement = json.loads(last_line)
+    # The loader reports some failures only in its output, so it is kept with the measurement
+    measurement['output'] = output
+    measurement['status'] = 'ok'
+    return measurement
+
+
+def reset_database(args, workdir):
+    import psycopg2
+    conn = psycopg2.connect(dbname=args.db_name, user=args.db_user, password=args.db_password,
+                            host=args.db_host, port=args.db_port)
+    with conn, conn.cursor() as cursor:
+        for table in LOADER_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+    conn.close()
+    # The local fingerprint index mirrors fato_pedidos, so it goes with it
+    shutil.rmtree(fingerprints_dir(workdir), ignore_errors=True)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import numpy
+    import pyarrow
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'pandas': pd.__version__, 'numpy': numpy.__version__, 'pyarrow': pyarrow.__version__}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=None)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dirty-rate', type=float, default=DIRTY_RATE)
+    parser.add_argument('--stages', nargs='+', choices=PROCESS_STAGES + LOAD_STAGES + STREAM_STAGES,
+                        default=PROCESS_STAGES + LOAD_STAGES)
+    parser.add_argument('--sink', choices=['dry-run', 'postgres'], default='dry-run')
+    parser.add_argument('--db-name', default='postgres')
+    parser.add_argument('--db-user', default='postgres')
+    parser.add_argument('--db-password', default='postgres')
+    parser.add_argument('--db-host', default='localhost')
+    parser.add_argument('--db-port', type=int, default=5432)
+    parser.add_argument('--reset-db', action='store_true', help='drop the loader tables before the load stages')
+    parser.add_argument('--workdir', default=None, help='keep the generated data here instead of a temp dir')
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--run-stage', dest='stage', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        child_main(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workdir = args.workdir or tmp_dir
+        start = time.perf_counter()
+        files = write_dataset(os.path.join(workdir, 'data', 'desafio', 'raw'), args.orders, args.users,
+                              args.products, args.seed, args.dirty_rate)
+        generate_s = time.perf_counter() - start
+        for name, info in files.items():
+            print(f"{name:<18}{info['rows']:>14,} rows{info['bytes'] / 1024 ** 2:>10.1f} MB")
+        print(f"Generated in {generate_s:.1f}s\n")
+
+        if args.sink == 'postgres' and args.reset_db:
+            reset_database(args, workdir)
+
+        print(f"{'stage':<26}{'status':>8}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'baseline MB':>13}")
+        stages = {}
+        for stage in args.stages:
+            stages[stage] = result = measure(workdir, stage, args)
+            if result['status'] == 'ok':
+                print(f"{stage:<26}{'ok':>8}{result['wall_s']:>10.2f}{result['cpu_s']:>10.2f}"
+                      f"{result['peak_kb'] / 1024:>10.1f}{result['baseline_kb'] / 1024:>13.1f}")
+            else:
+                print(f"{stage:<26}{result['status']:>8}  {result.get('reason') or result.get('error')}")
+
+    results = {
+        'meta': {'git_revision': git_revision(), 'timestamp': datetime.now(timezone.utc).isoformat(),
+                 'environment': environment(), 'args': {k: v for k, v in vars(args).items() if k not in ('stage', 'db_password')}},
+        'dataset': {'files': files, 'generate_s': generate_s},
+        'stages': stages,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if any(result['status'] == 'error' for result in stages.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark: peak memory of process_order_data, one-shot vs. chunked.
+
+Each measurement runs in a fresh interpreter inside a scratch working
+directory with a synthetic data/desafio/raw/pedidos_raw.csv, and reports the
+interpreter's peak RSS (the baseline column is the peak right after imports).
+
+    python benchmarks/bench_process_memory.py --rows 200000 800000 --chunksize 50000
+
+Exits with status 1 if the chunked peak grows by more than --tolerance
+between the smallest and largest input.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from bench_load_orders import make_orders
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# VmHWM is read instead of ru_maxrss, which Linux carries over from the parent across exec
+CHILD = """
+import json, sys
+sys.path.insert(0, {root!r})
+def peak_kb():
+    with open('/proc/self/status') as status:
+        return next(int(line.split()[1]) for line in status if line.startswith('VmHWM'))
+from steps.pipeline_tasks import process_order_data
+baseline = peak_kb()
+process_order_data(chunksize={chunksize!r})
+print(json.dumps({{'baseline_kb': baseline, 'peak_kb': peak_kb()}}))
+"""
+
+
+def measure(workdir, chunksize):
+    code = CHILD.format(root=ROOT_DIR, chunksize=chunksize)
+    output = subprocess.run([sys.executable, '-c', code], cwd=workdir, check=True,
+                            capture_output=True, text=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['baseline_kb'] / 1024, result['peak_kb'] / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[200_000, 800_000])
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative growth of the chunked peak across input sizes')
+    args = parser.parse_args()
+
+    print(f"{'rows':>12}{'file MB':>10}{'baseline MB':>14}{'one-shot MB':>14}{'chunked MB':>13}")
+    chunked_peaks = []
+    for rows in sorted(args.rows):
+        with tempfile.TemporaryDirectory() as workdir:
+            raw_dir = os.path.join(workdir, 'data', 'desafio', 'raw')
+            os.makedirs(raw_dir)
+            raw_file = os.path.join(raw_dir, 'pedidos_raw.csv')
+            make_orders(rows).to_csv(raw_file, index=False, date_format='%Y-%m-%d %H:%M')
+            file_mb = os.path.getsize(raw_file) / 1024 ** 2
+
+            baseline, one_shot = measure(workdir, None)
+            _, chunked = measure(workdir, args.chunksize)
+            chunked_peaks.append(chunked)
+        print(f"{rows:>12,}{file_mb:>10.1f}{baseline:>14.1f}{one_shot:>14.1f}{chunked:>13.1f}")
+
+    growth = (chunked_peaks[-1] - chunked_peaks[0]) / chunked_peaks[0]
+    print(f"Chunked peak growth across sizes: {growth:.0%} (tolerance {args.tolerance:.0%})")
+    if growth > args.tolerance:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Benchmark: reading the processed orders layer as CSV vs. Parquet.
+
+Times the two reads the pipeline actually does: the report columns used by
+generate_reports, and the full fact columns (with date parsing) used by
+load_orders_data. No database is needed.
+
+    python benchmarks/bench_processed_format.py --rows 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_load_orders import make_orders
+from load_data_to_postgres import ORDERS_COLUMNS, ORDERS_DATE_COLUMNS
+from steps.processed_layer import ProcessedWriter, processed_path, read_processed
+
+REPORT_COLUMNS = ['created_at', 'total', 'payment_method', 'shipping_status']
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    orders_df = make_orders(args.rows)
+    print(f"{'format':<10}{'file MB':>10}{'write s':>10}{'report read s':>16}{'load read s':>14}")
+    with tempfile.TemporaryDirectory() as processed_dir:
+        for fmt in ('csv', 'parquet'):
+            def write():
+                with ProcessedWriter(processed_dir, 'fato_orders', fmt) as writer:
+                    writer.write(orders_df)
+            write_s = timed(write)
+            size_mb = os.path.getsize(processed_path(processed_dir, 'fato_orders', fmt)) / 1024 ** 2
+            report_s = timed(lambda: read_processed(processed_dir, 'fato_orders', REPORT_COLUMNS, fmt,
+                                                    parse_dates=['created_at']))
+            load_s = timed(lambda: read_processed(processed_dir, 'fato_orders', ORDERS_COLUMNS, fmt,
+                                                  parse_dates=ORDERS_DATE_COLUMNS))
+            print(f"{fmt:<10}{size_mb:>10.1f}{write_s:>10.2f}{report_s:>16.2f}{load_s:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark: reading the raw files with inferred dtypes vs. the schema registry.
+
+Generates a dataset with generate_data.py and reads each raw file twice: the
+way the pipeline used to (pandas infers every column, dates parsed with
+format inference) and with steps/schemas.py (categoricals, 32-bit IDs,
+explicit datetime formats). Reports read + parse time and the in-memory size
+of the resulting frame (memory_usage(deep=True)).
+
+    python benchmarks/bench_schemas.py --orders 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from generate_data import write_dataset
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.schemas import csv_dtypes, datetime_columns, parse_datetimes
+
+RAW_FILES = ['user_raw', 'produtos_raw', 'pedidos_raw']
+
+
+def read_inferred(path, name):
+    df = pd.read_csv(path)
+    for col in datetime_columns(name):
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def read_registry(path, name):
+    return parse_datetimes(pd.read_csv(path, dtype=csv_dtypes(name)), name)
+
+
+def measure(read, path, name, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read(path, name)
+        timings.append(time.perf_counter() - start)
+    return min(timings), df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'file':<14}{'rows':>12}{'inferred s':>12}{'registry s':>12}"
+          f"{'inferred MB':>13}{'registry MB':>13}{'memory':>9}")
+    with tempfile.TemporaryDirectory() as raw_dir:
+        files = write_dataset(raw_dir, args.orders)
+        for name in RAW_FILES:
+            path = os.path.join(raw_dir, f'{name}.csv')
+            inferred_s, inferred_mb = measure(read_inferred, path, name, args.repeat)
+            registry_s, registry_mb = measure(read_registry, path, name, args.repeat)
+            print(f"{name:<14}{files[f'{name}.csv']['rows']:>12,}{inferred_s:>12.2f}{registry_s:>12.2f}"
+                  f"{inferred_mb:>13.1f}{registry_mb:>13.1f}{inferred_mb / registry_mb:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Benchmark: e-mail and CPF validators, original apply/regex vs. vectorized.
+
+The original CPF validator only checks the length; the cpf+mod11 row adds a
+per-row check-digit apply to it, which is the like-for-like comparison.
+
+    python benchmarks/bench_validators.py --rows 1000000
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.b_clean_trasform import validate_clean_cpf_series, validate_clean_email_series
+
+
+def legacy_validate_clean_email_series(emails_series):
+    """Original implementation: re.match inside Series.apply"""
+    padrao = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    return emails_series.apply(lambda email: email.lower().strip() if re.match(padrao, str(email)) else None)
+
+
+def legacy_validate_clean_cpf_series(cpf_series):
+    """Original implementation: length check only, drops invalid rows"""
+    cpf_series = cpf_series.astype(str).str.replace(r'\D', '', regex=True).str.strip()
+    return cpf_series[cpf_series.str.len() == 11]
+
+
+def cpf_check_digits_ok(cpf):
+    """Per-row mod-11 check, what adding check digits to the original approach would cost"""
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    digits = [int(c) for c in cpf]
+    d1 = sum(d * w for d, w in zip(digits[:9], range(10, 1, -1))) * 10 % 11 % 10
+    d2 = sum(d * w for d, w in zip(digits[:10], range(11, 1, -1))) * 10 % 11 % 10
+    return digits[9] == d1 and digits[10] == d2
+
+
+def legacy_validate_cpf_with_check_digits(cpf_series):
+    cpf_series = legacy_validate_clean_cpf_series(cpf_series)
+    return cpf_series[cpf_series.apply(cpf_check_digits_ok)]
+
+
+def make_users(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    local = pd.Series(rng.integers(0, 10 ** 8, rows)).astype(str)
+    emails = ('User.' + local + '@Example.com').where(rng.random(rows) > 0.1, 'invalid_' + local)
+    digits = rng.integers(0, 10, (rows, 11)).astype(str)
+    cpfs = pd.Series([f"{''.join(d[:3])}.{''.join(d[3:6])}.{''.join(d[6:9])}-{''.join(d[9:])}" for d in digits])
+    return emails, cpfs
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    emails, cpfs = make_users(args.rows)
+    print(f"{'validator':<12}{'legacy s':>12}{'vectorized s':>15}{'speedup':>10}")
+    for name, legacy, vectorized, values in (
+        ('e-mail', legacy_validate_clean_email_series, validate_clean_email_series, emails),
+        ('cpf', legacy_validate_clean_cpf_series, validate_clean_cpf_series, cpfs),
+        ('cpf+mod11', legacy_validate_cpf_with_check_digits, validate_clean_cpf_series, cpfs),
+    ):
+        legacy_s = timed(legacy, values)
+        vectorized_s = timed(vectorized, values)
+        print(f"{name:<12}{legacy_s:>12.2f}{vectorized_s:>15.2f}{legacy_s / vectorized_s:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
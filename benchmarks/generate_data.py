@@ -0,0 +1,237 @@
+"""Seeded synthetic raw data: user_raw.csv, produtos_raw.csv and pedidos_raw.csv.
+
+Everything is generated with NumPy, one chunk of orders at a time, so 50M
+orders can be written without holding them in memory. A fraction of the users
+(--dirty-rate) gets dirty e-mails and CPFs the cleaning step has to reject or
+normalise, and a few rows have missing fields; --dirty-rate 0 gives users that
+all load. Order items are drawn from the
+generated product names, plus a few unknown names.
+
+    python benchmarks/generate_data.py --orders 1000000 --out /tmp/seven/data/desafio/raw
+
+The same --seed and sizes always produce the same files.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from steps.b_clean_trasform import CPF_WEIGHTS_1, CPF_WEIGHTS_2
+
+DIRTY_RATE = 0.05
+MISSING_RATE = 0.005
+UNKNOWN_ITEM_RATE = 0.01
+ORDERS_CHUNK_ROWS = 1_000_000
+ORDERS_START = pd.Timestamp('2024-01-01')
+ORDERS_DAYS = 540
+
+FIRST_NAMES = np.array(['carlos', 'ana', 'marcos', 'juliana', 'fernanda', 'pedro', 'lucas', 'mariana',
+                        'beatriz', 'rafael', 'camila', 'gabriel', 'larissa', 'thiago', 'patricia', 'bruno'])
+LAST_NAMES = np.array(['silva', 'oliveira', 'souza', 'santos', 'costa', 'pereira', 'lima', 'ferreira',
+                       'almeida', 'ribeiro', 'carvalho', 'gomes', 'martins', 'rocha', 'barbosa', 'dias'])
+EMAIL_DOMAINS = np.array(['example.com', 'mail.com', 'empresa.com.br', 'email.net'])
+PRODUCT_ADJECTIVES = ['Wireless', 'Mechanical', 'Gaming', 'Portable', 'Bluetooth', 'Ergonomic', 'Compact', 'Smart']
+PRODUCT_NOUNS = ['Mouse', 'Keyboard', 'Monitor', 'Laptop', 'Headphones', 'Speaker', 'Charger', 'Webcam',
+                 'Smartphone', 'Tablet', 'Microphone', 'Router']
+UNKNOWN_ITEMS = np.array(['Gift Card', 'Extended Warranty', 'Mystery Box'])
+PAYMENT_METHODS = np.array(['Credit Card', 'Debit Card', 'PayPal', 'Apple Pay', 'Pix', 'Boleto'])
+PAYMENT_STATUSES = np.array(['Paid', 'Awaiting', 'Refused'])
+SHIPPING_STATUSES = np.array(['Awaiting', 'Preparing', 'Sent', 'Delivered'])
+
+
+def _rng(seed, stream, chunk=0):
+    # One independent stream per file (and per chunk of orders)
+    return np.random.default_rng([seed, stream, chunk])
+
+
+def _digits_to_str(digits):
+    return pd.Series((digits + ord('0')).astype(np.uint32).view(f'<U{digits.shape[1]}').ravel())
+
+
+def make_cpfs(rows, rng, dirty_rate=DIRTY_RATE):
+    """CPFs with valid mod-11 check digits, formatted or not; dirty_rate of them are invalid"""
+    digits = rng.integers(0, 10, (rows, 11))
+    digits[:, 9] = (digits[:, :9] @ CPF_WEIGHTS_1) * 10 % 11 % 10
+    digits[:, 10] = (digits[:, :10] @ CPF_WEIGHTS_2) * 10 % 11 % 10
+
+    # Dirty kinds: wrong check digit, all digits equal, one digit missing, letters
+    kind = np.where(rng.random(rows) < dirty_rate, rng.integers(1, 5, rows), 0)
+    digits[kind == 1, 10] = (digits[kind == 1, 10] + 1) % 10
+    digits[kind == 2] = digits[kind == 2, :1]
+
+    plain = _digits_to_str(digits)
+    formatted = plain.str[:3] + '.' + plain.str[3:6] + '.' + plain.str[6:9] + '-' + plain.str[9:]
+    cpfs = formatted.where(rng.random(rows) < 0.7, plain)
+    cpfs = cpfs.where(kind != 3, formatted.str[1:])
+    return cpfs.where(kind != 4, 'abc.def.ghi-jk')
+
+
+def make_emails(first, last, user_ids, rng, dirty_rate=DIRTY_RATE):
+    """E-mails built from the names; dirty_rate of them are padded/upper case or malformed"""
+    rows = len(user_ids)
+    local = pd.Series(first) + '.' + pd.Series(last) + pd.Series(user_ids % 97).astype(str)
+    domain = pd.Series(rng.choice(EMAIL_DOMAINS, rows))
+    emails = local + '@' + domain
+
+    # Dirty kinds: padded upper case (valid once cleaned), no '@', no TLD, two '@'
+    kind = np.where(rng.random(rows) < dirty_rate, rng.integers(1, 5, rows), 0)
+    emails = emails.where(kind != 1, '  ' + emails.str.upper() + ' ')
+    emails = emails.where(kind != 2, local + domain)
+    emails = emails.where(kind != 3, local + '@' + domain.str.split('.').str[0])
+    return emails.where(kind != 4, local + '@@' + domain)
+
+
+def make_users(rows, seed=42, dirty_rate=DIRTY_RATE):
+    rng = _rng(seed, 1)
+    user_ids = np.arange(1001, 1001 + rows)
+    first = rng.choice(FIRST_NAMES, rows)
+    last = rng.choice(LAST_NAMES, rows)
+    entry = ORDERS_START - pd.to_timedelta(rng.integers(0, 365 * 24 * 60, rows), unit='min')
+    users = pd.DataFrame({
+        'user_id': user_ids,
+        'name': pd.Series(first) + ' ' + pd.Series(last),
+        'entry_date': entry.strftime('%Y-%m-%d'),
+        'entry_time': entry.strftime('%H:%M'),
+        'update_date': (entry + pd.to_timedelta(rng.integers(0, 400, rows), unit='D')).strftime('%Y-%m-%d'),
+        'e-mail': make_emails(first, last, user_ids, rng, dirty_rate),
+        'cpf': make_cpfs(rows, rng, dirty_rate),
+    })
+    # A few rows with a missing field, dropped by the cleaning step; a dirty_rate of 0 keeps every user
+    users.loc[rng.random(rows) < min(MISSING_RATE, dirty_rate), 'update_date'] = None
+    return users
+
+
+def make_products(rows, seed=42):
+    rng = _rng(seed, 2)
+    i = np.arange(rows)
+    combos = len(PRODUCT_ADJECTIVES) * len(PRODUCT_NOUNS)
+    names = (pd.Series(np.array(PRODUCT_ADJECTIVES)[i % len(PRODUCT_ADJECTIVES)]) + ' '
+             + pd.Series(np.array(PRODUCT_NOUNS)[(i // len(PRODUCT_ADJECTIVES)) % len(PRODUCT_NOUNS)]))
+    names = names.where(i < combos, names + ' ' + pd.Series(i // combos + 1).astype(str))
+    created = ORDERS_START - pd.to_timedelta(rng.integers(0, 365, rows), unit='D')
+    return pd.DataFrame({
+        'product_id': 101 + i,
+        'name': names,
+        'price': rng.integers(500, 500_000, rows) / 100,
+        'stock': rng.integers(0, 1000, rows),
+        'created_at': created.strftime('%Y-%m-%d'),
+        'description': ('a ' + names.str.lower() + ' for everyday use').to_numpy(),
+    })
+
+
+def make_raw_orders(rows, user_ids, products, seed=42, chunk=0, start_row=0, total_rows=None):
+    """One chunk of raw orders; created_at grows with the row number across chunks"""
+    rng = _rng(seed, 3, chunk)
+    total_rows = total_rows or rows
+
+    # Orders spread over ORDERS_DAYS, in roughly increasing time, from a skewed set of customers
+    position = (start_row + np.arange(rows)) / total_rows
+    minutes = position * ORDERS_DAYS * 24 * 60 + rng.integers(0, 180, rows)
+    created_at = ORDERS_START + pd.to_timedelta(minutes.astype(np.int64), unit='min')
+    users = user_ids[(rng.random(rows) ** 2 * len(user_ids)).astype(np.int64)]
+
+    # One to three items per order; the total is the sum of their prices
+    names = products['name'].to_numpy(dtype=object)
+    prices = products['price'].to_numpy()
+    picked = rng.integers(0, len(products), (rows, 3))
+    count = rng.integers(1, 4, rows)
+    first = pd.Series(names[picked[:, 0]])
+    first = first.where(rng.random(rows) >= UNKNOWN_ITEM_RATE, rng.choice(UNKNOWN_ITEMS, rows))
+    items = (first
+             + np.where(count >= 2, ', ' + pd.Series(names[picked[:, 1]]), '')
+             + np.where(count >= 3, ', ' + pd.Series(names[picked[:, 2]]), ''))
+    total = (prices[picked] * (np.arange(3) < count[:, None])).sum(axis=1).round(2)
+
+    # As in the sample file, every shipping date is filled (planned dates after the current status);
+    # only orders that aren't paid miss payment_date, and the cleaning step drops them
+    step = pd.to_timedelta(rng.integers(10, 48 * 60, rows), unit='min')
+    payment_status = rng.choice(PAYMENT_STATUSES, rows, p=[0.85, 0.1, 0.05])
+    shipping_level = np.where(payment_status == 'Paid', rng.integers(1, 4, rows), 0)
+    return pd.DataFrame({
+        'user_id': users,
+        'created_at': created_at,
+        'items': items,
+        'total': total,
+        'payment_status': payment_status,
+        'payment_method': rng.choice(PAYMENT_METHODS, rows),
+        'payment_date': pd.Series(created_at + step).where(payment_status == 'Paid'),
+        'shipping_status': SHIPPING_STATUSES[shipping_level],
+        'shipping_status_date_awaiting_payment': created_at,
+        'shipping_status_date_preparing': created_at + step,
+        'shipping_status_date_sent': created_at + 2 * step,
+        'shipping_status_date_delivered': created_at + 3 * step,
+    })
+
+
+def _format_minutes(values):
+    # 'YYYY-MM-DDTHH:MM' from NumPy, with the 'T' swapped for a space in the code-point matrix
+    text = np.datetime_as_string(values.astype('datetime64[m]'), unit='m')
+    codes = text.view(np.uint32).reshape(len(text), -1).copy()
+    codes[:, 10] = ord(' ')
+    return codes.view(text.dtype).ravel()
+
+
+def write_orders_csv(orders_df, out, header=True):
+    """Write orders with Arrow's CSV writer; pandas' to_csv date_format is per-value strftime"""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    arrays = []
+    for col in orders_df.columns:
+        values = orders_df[col].to_numpy()
+        if np.issubdtype(values.dtype, np.datetime64):
+            arrays.append(pa.array(_format_minutes(values), mask=np.isnat(values)))
+        else:
+            arrays.append(pa.array(values))
+    table = pa.Table.from_arrays(arrays, names=list(orders_df.columns))
+    pa_csv.write_csv(table, out, pa_csv.WriteOptions(include_header=header))
+
+
+def write_dataset(raw_dir, orders, users=None, products=500, seed=42, dirty_rate=DIRTY_RATE,
+                  chunk_rows=ORDERS_CHUNK_ROWS):
+    """Write the three raw files and return {file name: {'rows': n, 'bytes': size}}"""
+    users = users or max(1000, orders // 20)
+    os.makedirs(raw_dir, exist_ok=True)
+    users_df = make_users(users, seed, dirty_rate)
+    products_df = make_products(products, seed)
+    users_df.to_csv(os.path.join(raw_dir, 'user_raw.csv'), index=False)
+    products_df.to_csv(os.path.join(raw_dir, 'produtos_raw.csv'), index=False)
+
+    orders_path = os.path.join(raw_dir, 'pedidos_raw.csv')
+    user_ids = users_df['user_id'].to_numpy()
+    with open(orders_path, 'wb') as out:
+        for chunk, start in enumerate(range(0, orders, chunk_rows)):
+            rows = min(chunk_rows, orders - start)
+            orders_df = make_raw_orders(rows, user_ids, products_df, seed, chunk, start, orders)
+            write_orders_csv(orders_df, out, header=chunk == 0)
+
+    sizes = {'user_raw.csv': users, 'produtos_raw.csv': products, 'pedidos_raw.csv': orders}
+    return {name: {'rows': rows, 'bytes': os.path.getsize(os.path.join(raw_dir, name))}
+            for name, rows in sizes.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=None, help='default: orders / 20, at least 1000')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--dirty-rate', type=float, default=DIRTY_RATE)
+    parser.add_argument('--chunk-rows', type=int, default=ORDERS_CHUNK_ROWS)
+    parser.add_argument('--out', default=os.path.join('data', 'desafio', 'raw'))
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = write_dataset(args.out, args.orders, args.users, args.products, args.seed, args.dirty_rate,
+                          args.chunk_rows)
+    for name, info in files.items():
+        print(f"{name:<18}{info['rows']:>14,} rows{info['bytes'] / 1024 ** 2:>10.1f} MB")
+    print(f"Generated in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
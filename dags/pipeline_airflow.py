@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
-from steps.b_clean_trasform import validate_clean_email_series, validate_clean_cpf_series
+from importlib import import_module
 from airflow import DAG
 from airflow.operators.python import PythonOperator
-import pandas as pd
-from io import StringIO
-import re
 import os
 
+# The scheduler re-parses this file every few seconds, so it only builds the DAG skeleton: the task
+# callables live in steps.pipeline_tasks, which imports pandas and the cleaning code, and is only
+# imported when a task runs. Keep heavy imports out of this module (test_dag_parse_budget checks it).
+TASKS_MODULE = 'steps.pipeline_tasks'
+
 # Define default arguments for the DAG
 default_args = {
     'owner': 'airflow',
@@ -18,102 +20,35 @@ default_args = {
     'retry_delay': timedelta(minutes=5),
 }
 
-# Task functions
-def process_user_data(**kwargs):
-    """Process and clean user data"""
-    # In a real scenario, you would read from a file or database
-    # For this example, we'll assume the file exists in a data directory
-    data_dir = os.path.join('data', 'desafio', 'raw')
-    user_file_path = os.path.join(data_dir, 'user_raw.csv')
-    
-    # Read the user data
-    user_raw = pd.read_csv(user_file_path, sep=",", encoding="utf-8")
-    user_raw.dropna(inplace=True)
-    
-    # Clean and standardize data
-    user_raw['name'] = user_raw['name'].str.title()
-    user_raw['e-mail'] = validate_clean_email_series(user_raw['e-mail'])
-    user_raw['cpf'] = validate_clean_cpf_series(user_raw['cpf'])
-    
-    # Save processed data
-    processed_dir = os.path.join('data', 'desafio', 'processed')
-    os.makedirs(processed_dir, exist_ok=True)
-    user_raw.to_csv(os.path.join(processed_dir, 'dim_users.csv'), index=False)
-    
-    return "User data processing completed"
+# Date partitions: in the DAG every task reads and writes the ds=YYYY-MM-DD subdirectory of the raw,
+# processed and reports directories. Each run maps the tasks over the partitions of its lookback window
+# (params.lookback_days, default 1: just the run's ds), so a backfill is one run with a wide window or many
+# runs, MAX_ACTIVE_RUNS at a time. Mapped instances take slots of PROCESSING_POOL and at most
+# PARTITION_CONCURRENCY instances of each task run at once.
+PROCESSING_POOL = os.environ.get('SEVEN_PROCESSING_POOL', 'default_pool')
+PARTITION_CONCURRENCY = int(os.environ.get('SEVEN_PARTITION_CONCURRENCY', '4'))
+MAX_ACTIVE_RUNS = int(os.environ.get('SEVEN_MAX_ACTIVE_RUNS', '4'))
 
-def process_product_data(**kwargs):
-    """Process and clean product data"""
-    data_dir = os.path.join('data', 'desafio', 'raw')
-    product_file_path = os.path.join(data_dir, 'produtos_raw.csv')
-    
-    # Read the product data
-    produtos_raw = pd.read_csv(product_file_path, sep=",", encoding="utf-8")
-    produtos_raw.dropna(inplace=True)
-    
-    # Clean and standardize data
-    produtos_raw['name'] = produtos_raw['name'].str.title()
-    produtos_raw['description'] = produtos_raw['description'].str.capitalize()
-    
-    # Save processed data
-    processed_dir = os.path.join('data', 'desafio', 'processed')
-    os.makedirs(processed_dir, exist_ok=True)
-    produtos_raw.to_csv(os.path.join(processed_dir, 'dim_produtos.csv'), index=False)
-    
-    return "Product data processing completed"
+# Each partition is loaded into PostgreSQL by a mapped instance taking a slot of LOAD_POOL. Partition loads
+# share dim_tempo and the rollup rows of their months, so by default they run one at a time
+LOAD_POOL = os.environ.get('SEVEN_LOAD_POOL', 'default_pool')
+LOAD_CONCURRENCY = int(os.environ.get('SEVEN_LOAD_CONCURRENCY', '1'))
 
-def process_order_data(**kwargs):
-    """Process and clean order data"""
-    data_dir = os.path.join('data', 'desafio', 'raw')
-    order_file_path = os.path.join(data_dir, 'pedidos_raw.csv')
-    
-    # Read the order data
-    pedidos_raw = pd.read_csv(order_file_path, sep=",", encoding="utf-8")
-    pedidos_raw.dropna(inplace=True)
-    
-    # Convert date columns to datetime
-    date_columns = [col for col in pedidos_raw.columns if 'date' in col]
-    for col in date_columns:
-        pedidos_raw[col] = pd.to_datetime(pedidos_raw[col], errors='coerce')
-    
-    # Save processed data
-    processed_dir = os.path.join('data', 'desafio', 'processed')
-    os.makedirs(processed_dir, exist_ok=True)
-    pedidos_raw.to_csv(os.path.join(processed_dir, 'fato_orders.csv'), index=False)
-    
-    return "Order data processing completed"
+def task_callable(name):
+    """Callable for a task that imports TASKS_MODULE and runs its function name only when the task executes"""
+    def run(*args, **kwargs):
+        return getattr(import_module(TASKS_MODULE), name)(*args, **kwargs)
+    run.__name__ = run.__qualname__ = name
+    return run
 
-def generate_reports(**kwargs):
-    """Generate business reports from processed data"""
-    processed_dir = os.path.join('data', 'desafio', 'processed')
-    
-    # Load processed data
-    users = pd.read_csv(os.path.join(processed_dir, 'dim_users.csv'))
-    products = pd.read_csv(os.path.join(processed_dir, 'dim_produtos.csv'))
-    orders = pd.read_csv(os.path.join(processed_dir, 'fato_orders.csv'))
-    
-    # Convert date columns to datetime
-    orders['created_at'] = pd.to_datetime(orders['created_at'])
-    
-    # Generate reports
-    # 1. Orders by month
-    orders_by_month = orders.groupby(orders['created_at'].dt.to_period('M')).size().reset_index(name='count')
-    
-    # 2. Revenue by payment method
-    revenue_by_payment = orders.groupby('payment_method')['total'].sum().reset_index()
-    
-    # 3. Orders by shipping status
-    orders_by_status = orders.groupby('shipping_status').size().reset_index(name='count')
-    
-    # Save reports
-    reports_dir = os.path.join('data', 'desafio', 'reports')
-    os.makedirs(reports_dir, exist_ok=True)
-    
-    orders_by_month.to_csv(os.path.join(reports_dir, 'orders_by_month.csv'), index=False)
-    revenue_by_payment.to_csv(os.path.join(reports_dir, 'revenue_by_payment.csv'), index=False)
-    orders_by_status.to_csv(os.path.join(reports_dir, 'orders_by_status.csv'), index=False)
-    
-    return "Reports generated successfully"
+# Task functions
+list_partitions = task_callable('list_partitions')
+process_user_data = task_callable('process_user_data')
+process_product_data = task_callable('process_product_data')
+process_order_data = task_callable('process_order_data')
+generate_reports = task_callable('generate_reports')
+fold_reports = task_callable('fold_reports')
+load_partition = task_callable('load_partition')
 
 # Create the DAG
 with DAG(
@@ -122,32 +57,57 @@ with DAG(
     description='ETL pipeline for Seven Inc data',
     schedule_interval=timedelta(days=1),
     catchup=False,
+    max_active_runs=MAX_ACTIVE_RUNS,
+    params={'lookback_days': 1},
 ) as dag:
     
     # Define tasks
-    process_users_task = PythonOperator(
+    list_partitions_task = PythonOperator(
+        task_id='list_partitions',
+        python_callable=list_partitions,
+    )
+    
+    # One mapped instance per partition; an empty list skips them
+    partitions = list_partitions_task.output
+    mapped_args = {'pool': PROCESSING_POOL, 'max_active_tis_per_dag': PARTITION_CONCURRENCY}
+    
+    process_users_task = PythonOperator.partial(
         task_id='process_user_data',
         python_callable=process_user_data,
-        provide_context=True,
-    )
+        **mapped_args,
+    ).expand(op_kwargs=partitions)
     
-    process_products_task = PythonOperator(
+    process_products_task = PythonOperator.partial(
         task_id='process_product_data',
         python_callable=process_product_data,
-        provide_context=True,
-    )
+        **mapped_args,
+    ).expand(op_kwargs=partitions)
     
-    process_orders_task = PythonOperator(
+    process_orders_task = PythonOperator.partial(
         task_id='process_order_data',
         python_callable=process_order_data,
-        provide_context=True,
-    )
+        **mapped_args,
+    ).expand(op_kwargs=partitions)
     
-    generate_reports_task = PythonOperator(
+    generate_reports_task = PythonOperator.partial(
         task_id='generate_reports',
         python_callable=generate_reports,
-        provide_context=True,
+        **mapped_args,
+    ).expand(op_kwargs=partitions)
+    
+    # The history-wide reports fold every partition's aggregates, once this run's partitions are done
+    fold_reports_task = PythonOperator(
+        task_id='fold_reports',
+        python_callable=fold_reports,
     )
     
+    load_partition_task = PythonOperator.partial(
+        task_id='load_partition',
+        python_callable=load_partition,
+        pool=LOAD_POOL,
+        max_active_tis_per_dag=LOAD_CONCURRENCY,
+    ).expand(op_kwargs=partitions)
+    
     # Define task dependencies
-    [process_users_task, process_products_task, process_orders_task] >> generate_reports_task
\ No newline at end of file
+    [process_users_task, process_products_task, process_orders_task] >> generate_reports_task >> fold_reports_task
+    [process_users_task, process_products_task, process_orders_task] >> load_partition_task
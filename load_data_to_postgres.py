@@ -1,9 +1,19 @@
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import psycopg2
-import datetime
+from io import StringIO
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import numpy as np
+from steps.fingerprints import FINGERPRINTS_DIR, FingerprintIndex, order_fingerprints, row_hashes
+from steps.instrumentation import file_size, instrumented, record
+from steps.manifest import MANIFEST_DIR, SKIP_UNCHANGED, StageManifest
+from steps.processed_layer import PROCESSED_FORMAT, processed_path, read_processed
+from steps.schemas import csv_dtypes, parse_datetimes
+from steps.validation import CONSTRAINTS, validate
 
 # Database connection parameters
 # These should be configured according to your PostgreSQL setup
@@ -19,9 +29,96 @@ DB_PARAMS = {
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, 'data', 'desafio', 'processed')
 
-USERS_FILE = os.path.join(DATA_DIR, 'user_processed.csv')
-PRODUCTS_FILE = os.path.join(DATA_DIR, 'produtos_processed.csv')
-ORDERS_FILE = os.path.join(DATA_DIR, 'pedidos_processed.csv')
+# The processed files written by the DAG and local_process.py
+USERS_FILE = os.path.join(DATA_DIR, 'dim_users.csv')
+PRODUCTS_FILE = os.path.join(DATA_DIR, 'dim_produtos.csv')
+ORDERS_FILE = os.path.join(DATA_DIR, 'fato_orders.csv')
+
+# Rows that cannot be loaded are quarantined here, with a reject_reason code, instead of reaching the database
+REJECTS_DIR = os.path.join(BASE_DIR, 'data', 'desafio', 'rejects')
+USERS_REJECTS_FILE = os.path.join(REJECTS_DIR, 'users_rejected.csv')
+PRODUCTS_REJECTS_FILE = os.path.join(REJECTS_DIR, 'products_rejected.csv')
+ORDERS_REJECTS_FILE = os.path.join(REJECTS_DIR, 'orders_rejected.csv')
+ORDER_ITEMS_UNRESOLVED_FILE = os.path.join(REJECTS_DIR, 'order_items_unresolved.csv')
+ORDER_ITEMS_REJECTS_FILE = os.path.join(REJECTS_DIR, 'order_items_rejected.csv')
+
+# Incremental mode: processed files hold only the run's delta, dimensions are upserted
+# and orders already in fato_pedidos (by created_at watermark) are skipped
+INCREMENTAL = os.environ.get('SEVEN_INCREMENTAL', '0') == '1'
+
+# Connection pool shared by all loader stages, and threads loading the dimensions
+LOADER_POOL_SIZE = int(os.environ.get('SEVEN_LOADER_POOL_SIZE', '4'))
+LOADER_WORKERS = int(os.environ.get('SEVEN_LOADER_WORKERS', '3'))
+
+# Create fato_pedidos range-partitioned by created_at month, with partitions created on demand
+PARTITION_ORDERS = os.environ.get('SEVEN_PARTITION_ORDERS', '0') == '1'
+
+# Partitioned fato_pedidos only: reload the months present in the orders file, replacing their partitions
+REPLACE_MONTHS = os.environ.get('SEVEN_REPLACE_MONTHS', '0') == '1'
+
+# Heap fato_pedidos only: drop its secondary indexes and foreign keys during a bulk load and rebuild them after
+DEFER_ORDER_INDEXES = os.environ.get('SEVEN_DEFER_ORDER_INDEXES', '0') == '1'
+
+# Manifest of the last successful load of each processed file (SEVEN_SKIP_UNCHANGED=1 skips unchanged files)
+LOADER_MANIFEST_DIR = os.path.join(BASE_DIR, MANIFEST_DIR)
+
+# Orders already loaded are recognized by their fingerprint, unique in fato_pedidos. SEVEN_FINGERPRINT_INDEX=1
+# also keeps the loaded fingerprints in a local on-disk index, so re-sent orders are dropped without a query;
+# delete that directory whenever the warehouse is reset
+FINGERPRINT_INDEX = os.environ.get('SEVEN_FINGERPRINT_INDEX', '0') == '1'
+LOADER_FINGERPRINTS_DIR = os.path.join(BASE_DIR, FINGERPRINTS_DIR)
+
+# Dimensions only write new or changed rows, detected by a hash of these business columns kept in row_hash.
+# SEVEN_DIMENSION_SCD2=1 also keeps every version in <dimension>_historico, with valid_from/valid_to
+DIMENSION_HASH_COLUMNS = {
+    'dim_usuarios': ['name', 'entry_date', 'entry_time', 'update_date', 'email', 'cpf'],
+    'dim_produtos': ['name', 'price', 'stock', 'created_at', 'description'],
+}
+DIMENSION_SCD2 = os.environ.get('SEVEN_DIMENSION_SCD2', '0') == '1'
+
+# Rows per INSERT ... ON CONFLICT statement when upserting dimensions
+UPSERT_CHUNKSIZE = 1_000
+
+# Number of rows sent per COPY ... FROM STDIN round trip in bulk mode
+COPY_BATCH_SIZE = 100_000
+
+# Columns of fato_pedidos that come straight from the processed orders file
+ORDERS_COLUMNS = [
+    'user_id', 'created_at', 'items', 'total',
+    'payment_status', 'payment_method', 'payment_date', 'shipping_status',
+    'shipping_status_date_awaiting_payment', 'shipping_status_date_preparing',
+    'shipping_status_date_sent', 'shipping_status_date_delivered'
+]
+
+# Columns of itens_pedido, in COPY order
+ORDER_ITEMS_COLUMNS = ['pedido_id', 'product_id', 'tempo_id', 'item_name', 'quantity']
+
+ORDERS_DATE_COLUMNS = [
+    'created_at', 'payment_date',
+    'shipping_status_date_awaiting_payment', 'shipping_status_date_preparing',
+    'shipping_status_date_sent', 'shipping_status_date_delivered'
+]
+
+# Function to get a processed file of a date partition, written by the DAG under processed/ds=YYYY-MM-DD,
+# or the reject report of its load under rejects/ds=YYYY-MM-DD; without a partition the flat layout is used
+def partition_file(csv_file, partition=None):
+    if not partition:
+        return csv_file
+    return os.path.join(os.path.dirname(csv_file), f'ds={partition}', os.path.basename(csv_file))
+
+# Function to read a processed file with the registry's dtypes, from the Parquet layer when it is enabled
+def read_processed_file(csv_file, name, columns=None, parse_dates=None):
+    record(bytes_read=file_size(processed_file_path(csv_file, name)))
+    if PROCESSED_FORMAT == 'parquet':
+        return read_processed(os.path.dirname(csv_file), name, columns=columns, fmt='parquet')
+    df = pd.read_csv(csv_file, usecols=columns, dtype=csv_dtypes(name, columns))
+    return parse_datetimes(df, name, parse_dates) if parse_dates is not None else df
+
+# Function to get the path read_processed_file actually reads
+def processed_file_path(csv_file, name):
+    if PROCESSED_FORMAT == 'parquet':
+        return processed_path(os.path.dirname(csv_file), name, 'parquet')
+    return csv_file
 
 # Function to create database connection
 def get_connection():
@@ -39,12 +136,239 @@ def get_connection():
         return None
 
 # Function to create SQLAlchemy engine
-def get_engine():
-    connection_string = f"postgresql://{DB_PARAMS['user']}:{DB_PARAMS['password']}@{DB_PARAMS['host']}:{DB_PARAMS['port']}/{DB_PARAMS['dbname']}"
-    return create_engine(connection_string)
+# The engine's bounded pool also hands out the raw psycopg2 connections (engine.raw_connection())
+def get_engine(pool_size=LOADER_POOL_SIZE):
+    connection_string = f"postgresql+psycopg2://{DB_PARAMS['user']}:{DB_PARAMS['password']}@{DB_PARAMS['host']}:{DB_PARAMS['port']}/{DB_PARAMS['dbname']}"
+    return create_engine(connection_string, pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+
+# Columns of fato_pedidos; the primary key and partitioning are added by orders_table_sql
+ORDERS_TABLE_COLUMNS_SQL = """
+            pedido_id SERIAL,
+            user_id INTEGER NOT NULL,
+            product_id INTEGER,
+            tempo_id INTEGER,
+            created_at TIMESTAMP NOT NULL,
+            items TEXT NOT NULL,
+            total DECIMAL(10, 2) NOT NULL,
+            payment_status VARCHAR(50) NOT NULL,
+            payment_method VARCHAR(50) NOT NULL,
+            payment_date TIMESTAMP,
+            shipping_status VARCHAR(50) NOT NULL,
+            shipping_status_date_awaiting_payment TIMESTAMP,
+            shipping_status_date_preparing TIMESTAMP,
+            shipping_status_date_sent TIMESTAMP,
+            shipping_status_date_delivered TIMESTAMP,
+            fingerprint BIGINT"""
+
+# Unique fingerprint of fato_pedidos; created_at is part of the fingerprint and, being the partition key,
+# has to be part of a unique index of the partitioned table. Orders loaded before it have a NULL fingerprint
+ORDERS_FINGERPRINT_INDEX_SQL = """
+        ALTER TABLE fato_pedidos ADD COLUMN IF NOT EXISTS fingerprint BIGINT;
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_fato_pedidos_fingerprint ON fato_pedidos (fingerprint, created_at);
+"""
+
+ORDER_ITEMS_TABLE_SQL = """
+        -- Create bridge table with one row per product in each order
+        CREATE TABLE IF NOT EXISTS itens_pedido (
+            item_id SERIAL PRIMARY KEY,
+            pedido_id INTEGER NOT NULL,
+            product_id INTEGER,
+            tempo_id INTEGER,
+            item_name VARCHAR(100) NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            
+            -- Foreign key constraints
+            {pedido_fk}FOREIGN KEY (product_id) REFERENCES dim_produtos(product_id),
+            FOREIGN KEY (tempo_id) REFERENCES dim_tempo(tempo_id)
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_itens_pedido_product_id ON itens_pedido(product_id);
+        CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido_id ON itens_pedido(pedido_id);
+        CREATE INDEX IF NOT EXISTS idx_dim_tempo_ano ON dim_tempo(ano);
+"""
+
+# Secondary indexes of fato_pedidos, as defined in modelagem_fisica.sql
+ORDERS_INDEXES = {
+    'idx_fato_pedidos_user_id': 'user_id',
+    'idx_fato_pedidos_product_id': 'product_id',
+    'idx_fato_pedidos_tempo_id': 'tempo_id',
+    'idx_fato_pedidos_payment_method': 'payment_method',
+    'idx_fato_pedidos_shipping_status': 'shipping_status',
+}
+
+# Foreign keys of fato_pedidos, with the names PostgreSQL gives unnamed inline constraints
+ORDERS_FOREIGN_KEYS = {
+    'fato_pedidos_user_id_fkey': ('user_id', 'dim_usuarios'),
+    'fato_pedidos_product_id_fkey': ('product_id', 'dim_produtos'),
+    'fato_pedidos_tempo_id_fkey': ('tempo_id', 'dim_tempo'),
+}
+
+# Function to build the fato_pedidos DDL, as a heap or range-partitioned by created_at month
+def orders_table_sql(partitioned):
+    foreign_keys = ",\n".join(
+        f"            CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {table}({column})"
+        for name, (column, table) in ORDERS_FOREIGN_KEYS.items()
+    )
+    if partitioned:
+        # The partition key has to be part of the primary key
+        return (f"CREATE TABLE IF NOT EXISTS fato_pedidos ({ORDERS_TABLE_COLUMNS_SQL},\n"
+                f"            PRIMARY KEY (pedido_id, created_at),\n{foreign_keys}\n"
+                f"        ) PARTITION BY RANGE (created_at)")
+    return (f"CREATE TABLE IF NOT EXISTS fato_pedidos ({ORDERS_TABLE_COLUMNS_SQL},\n"
+            f"            PRIMARY KEY (pedido_id),\n{foreign_keys}\n        )")
+
+# Functions to drop and (re)build the secondary indexes and foreign keys of fato_pedidos
+def create_order_indexes(cursor):
+    for name, column in ORDERS_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON fato_pedidos({column})")
+
+def drop_order_constraints(cursor):
+    for name in ORDERS_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    for name in ORDERS_FOREIGN_KEYS:
+        cursor.execute(f"ALTER TABLE fato_pedidos DROP CONSTRAINT IF EXISTS {name}")
+
+def create_order_constraints(cursor):
+    create_order_indexes(cursor)
+    # Adding a foreign key checks every row in one query instead of a trigger call per copied row
+    for name, (column, table) in ORDERS_FOREIGN_KEYS.items():
+        cursor.execute(f"ALTER TABLE fato_pedidos ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {table}({column})")
+
+# Rollup tables for the queries.sql aggregates, keyed by month (ano, mes of dim_tempo) and a dimension.
+# Every order rollup keeps the order count and the revenue, so averages come from SUM/SUM
+ORDER_ROLLUPS = {
+    'rollup_pedidos_mes': {},
+    'rollup_receita_pagamento': {'payment_method': 'VARCHAR(50)'},
+    'rollup_pedidos_status': {'shipping_status': 'VARCHAR(50)'},
+    'rollup_ticket_cliente': {'user_id': 'INTEGER'},
+}
+ORDER_ROLLUP_MEASURES = ['total_pedidos', 'receita_total']
+
+# Product quantities come from the itens_pedido bridge rows
+PRODUCT_ROLLUP = 'rollup_produtos'
+PRODUCT_ROLLUP_MEASURES = ['quantidade_total']
+
+# Function to build the DDL of every rollup table
+def rollup_tables_sql():
+    statements = []
+    for table, keys in ORDER_ROLLUPS.items():
+        key_columns = ''.join(f"            {column} {sql_type} NOT NULL,\n" for column, sql_type in keys.items())
+        statements.append(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            ano INTEGER NOT NULL,
+            mes INTEGER NOT NULL,
+{key_columns}            total_pedidos BIGINT NOT NULL,
+            receita_total DECIMAL(16, 2) NOT NULL,
+            PRIMARY KEY ({', '.join(['ano', 'mes'] + list(keys))})
+        );""")
+    statements.append(f"""
+        CREATE TABLE IF NOT EXISTS {PRODUCT_ROLLUP} (
+            ano INTEGER NOT NULL,
+            mes INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            quantidade_total BIGINT NOT NULL,
+            PRIMARY KEY (ano, mes, product_id)
+        );""")
+    return '\n'.join(statements)
+
+# Function to build the DDL of the row_hash columns and of the SCD2 history of every dimension.
+# A history table has the dimension's columns plus the validity of each version; the open version
+# (valid_to NULL) is unique per key. Tables created before row_hash get the column here
+def dimension_history_sql():
+    statements = []
+    for table in DIMENSION_HASH_COLUMNS:
+        key = CONSTRAINTS[table]['key']
+        statements.append(f"""
+        ALTER TABLE {table} ADD COLUMN IF NOT EXISTS row_hash BIGINT;
+        CREATE TABLE IF NOT EXISTS {table}_historico (
+            LIKE {table},
+            valid_from TIMESTAMP NOT NULL,
+            valid_to TIMESTAMP,
+            PRIMARY KEY ({key}, valid_from)
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_historico_atual ON {table}_historico ({key}) WHERE valid_to IS NULL;""")
+    return '\n'.join(statements)
+
+# Function to fill the rollups from the tables already loaded; only empty rollups are filled,
+# so existing databases get their history once and later loads apply deltas
+def backfill_rollups(cursor, only_empty=True):
+    for table, keys in ORDER_ROLLUPS.items():
+        group = ', '.join(['ano', 'mes'] + list(keys))
+        cursor.execute(f"""
+            INSERT INTO {table} ({group}, total_pedidos, receita_total)
+            SELECT {group}, COUNT(*), SUM(total)
+            FROM (SELECT EXTRACT(YEAR FROM created_at)::int AS ano, EXTRACT(MONTH FROM created_at)::int AS mes, *
+                  FROM fato_pedidos) o
+            WHERE {'NOT EXISTS (SELECT 1 FROM ' + table + ')' if only_empty else 'TRUE'}
+            GROUP BY {group}
+        """)
+    cursor.execute(f"""
+        INSERT INTO {PRODUCT_ROLLUP} (ano, mes, product_id, quantidade_total)
+        SELECT t.ano, EXTRACT(MONTH FROM t.data)::int, i.product_id, SUM(i.quantity)
+        FROM itens_pedido i JOIN dim_tempo t ON t.tempo_id = i.tempo_id
+        WHERE i.product_id IS NOT NULL
+          AND {'NOT EXISTS (SELECT 1 FROM ' + PRODUCT_ROLLUP + ')' if only_empty else 'TRUE'}
+        GROUP BY t.ano, EXTRACT(MONTH FROM t.data), i.product_id
+    """)
+
+# Function to recompute every rollup from scratch
+def rebuild_rollups(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"TRUNCATE {', '.join(list(ORDER_ROLLUPS) + [PRODUCT_ROLLUP])}")
+    backfill_rollups(cursor, only_empty=False)
+    conn.commit()
+
+# Function to add a delta to a rollup: COPY into a temporary table, then one upsert that sums the measures
+def upsert_rollup(cursor, table, delta_df, keys, measures):
+    columns = keys + measures
+    staging = f"stg_{table}"
+    cursor.execute(f"CREATE TEMP TABLE {staging} (LIKE {table}) ON COMMIT DROP")
+    copy_dataframe(cursor, delta_df[columns], staging, columns, batch_size=max(len(delta_df), 1))
+    updates = ', '.join(f"{m} = {table}.{m} + EXCLUDED.{m}" for m in measures)
+    cursor.execute(f"""
+        INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM {staging}
+        ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {updates}
+    """)
+
+# Function to apply the orders and items just loaded to the rollups, in the load's transaction
+def update_rollups(cursor, orders_df, items_df):
+    orders = orders_df.assign(ano=orders_df['created_at'].dt.year, mes=orders_df['created_at'].dt.month)
+    for table, keys in ORDER_ROLLUPS.items():
+        group = ['ano', 'mes'] + list(keys)
+        # observed=True: categorical keys only produce the groups present in the delta
+        delta = (orders.groupby(group, observed=True)
+                 .agg(total_pedidos=('total', 'size'), receita_total=('total', 'sum')))
+        upsert_rollup(cursor, table, delta.reset_index(), group, ORDER_ROLLUP_MEASURES)
+    
+    items = items_df[items_df['product_id'].notna()].merge(orders[['pedido_id', 'ano', 'mes']], on='pedido_id')
+    delta = items.groupby(['ano', 'mes', 'product_id']).agg(quantidade_total=('quantity', 'sum'))
+    upsert_rollup(cursor, PRODUCT_ROLLUP, delta.reset_index(), ['ano', 'mes', 'product_id'], PRODUCT_ROLLUP_MEASURES)
+
+# Function to remove the rollup rows of months that are about to be reloaded
+def clear_rollup_months(cursor, months):
+    if len(months) == 0:
+        return
+    values = ', '.join(f"({month.year}, {month.month})" for month in months)
+    for table in list(ORDER_ROLLUPS) + [PRODUCT_ROLLUP]:
+        cursor.execute(f"DELETE FROM {table} WHERE (ano, mes) IN ({values})")
+
+# Function to check an existing fato_pedidos has the layout asked for: CREATE TABLE IF NOT EXISTS leaves a plain
+# table plain, and the partitioned load would then fail on ATTACH PARTITION
+def check_orders_layout(cursor, partitioned):
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('fato_pedidos')")
+    row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return
+    if (row[0] == 'p') != partitioned:
+        existing, requested = ('plain', 'partitioned') if partitioned else ('partitioned', 'plain')
+        raise RuntimeError(f"fato_pedidos already exists as a {existing} table but SEVEN_PARTITION_ORDERS="
+                           f"{int(partitioned)} expects a {requested} one; migrate the table to a {requested} "
+                           f"fato_pedidos or set SEVEN_PARTITION_ORDERS={int(not partitioned)}")
 
 # Function to create tables if they don't exist
-def create_tables(conn):
+@instrumented
+def create_tables(conn, partitioned=None):
+    partitioned = PARTITION_ORDERS if partitioned is None else partitioned
     try:
         cursor = conn.cursor()
         
@@ -58,7 +382,8 @@ def create_tables(conn):
             entry_time TIME NOT NULL,
             update_date DATE,
             email VARCHAR(100) NOT NULL,
-            cpf VARCHAR(14) NOT NULL
+            cpf VARCHAR(14) NOT NULL,
+            row_hash BIGINT
         );
 
         -- Create dimension table for products
@@ -68,7 +393,8 @@ def create_tables(conn):
             price DECIMAL(10, 2) NOT NULL,
             stock INTEGER NOT NULL,
             created_at DATE NOT NULL,
-            description TEXT
+            description TEXT,
+            row_hash BIGINT
         );
 
         -- Create dimension table for time
@@ -83,199 +409,665 @@ def create_tables(conn):
             semestre INTEGER NOT NULL CHECK (semestre BETWEEN 1 AND 2),
             ano INTEGER NOT NULL
         );
-
-        -- Create fact table for orders
-        CREATE TABLE IF NOT EXISTS fato_pedidos (
-            pedido_id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            product_id INTEGER,
-            tempo_id INTEGER,
-            created_at TIMESTAMP NOT NULL,
-            items TEXT NOT NULL,
-            total DECIMAL(10, 2) NOT NULL,
-            payment_status VARCHAR(50) NOT NULL,
-            payment_method VARCHAR(50) NOT NULL,
-            payment_date TIMESTAMP,
-            shipping_status VARCHAR(50) NOT NULL,
-            shipping_status_date_awaiting_payment TIMESTAMP,
-            shipping_status_date_preparing TIMESTAMP,
-            shipping_status_date_sent TIMESTAMP,
-            shipping_status_date_delivered TIMESTAMP,
-            
-            -- Foreign key constraints
-            FOREIGN KEY (user_id) REFERENCES dim_usuarios(user_id),
-            FOREIGN KEY (product_id) REFERENCES dim_produtos(product_id),
-            FOREIGN KEY (tempo_id) REFERENCES dim_tempo(tempo_id)
-        );
         """)
         
+        cursor.execute(dimension_history_sql())
+        
+        check_orders_layout(cursor, partitioned)
+        cursor.execute(orders_table_sql(partitioned))
+        cursor.execute(ORDERS_FINGERPRINT_INDEX_SQL)
+        
+        # A partitioned fato_pedidos has no primary key on pedido_id alone, so the bridge table can't reference it;
+        # pedido_id still comes from the table's sequence and stays unique
+        pedido_fk = '' if partitioned else 'FOREIGN KEY (pedido_id) REFERENCES fato_pedidos(pedido_id),\n            '
+        cursor.execute(ORDER_ITEMS_TABLE_SQL.format(pedido_fk=pedido_fk))
+        create_order_indexes(cursor)
+        
+        cursor.execute(rollup_tables_sql())
+        backfill_rollups(cursor)
+        
         conn.commit()
         print("Tables created successfully")
-    except Exception as e:
+    except Exception:
         conn.rollback()
-        print(f"Error creating tables: {e}")
+        raise
+
+# Columns of dim_tempo, in COPY order
+TIME_COLUMNS = [
+    'tempo_id', 'data', 'dia_da_semana', 'eh_final_de_semana', 'eh_feriado',
+    'nome_mes', 'trimestre', 'semestre', 'ano'
+]
+
+# Days added before and after the order dates when building the calendar
+TIME_DIMENSION_MARGIN_DAYS = 30
+
+# Function to read the first and last order dates without parsing the whole file
+def get_order_date_bounds(orders_file):
+    created_at = read_processed_file(orders_file, 'fato_orders', columns=['created_at'])['created_at']
+    created_at = pd.to_datetime(created_at, format='ISO8601')
+    return created_at.min().normalize(), created_at.max().normalize()
+
+# Function to build the calendar rows for a date range with vectorized date parts
+def build_time_dimension(start_date, end_date, first_tempo_id=1):
+    dates = pd.date_range(start_date, end_date, freq='D')
+    month = dates.month
+    return pd.DataFrame({
+        'tempo_id': np.arange(first_tempo_id, first_tempo_id + len(dates)),
+        'data': dates,
+        'dia_da_semana': dates.day_name(),
+        'eh_final_de_semana': dates.dayofweek >= 5,  # 5 = Saturday, 6 = Sunday
+        'eh_feriado': False,  # Simplified, would need a holiday calendar
+        'nome_mes': dates.month_name(),
+        'trimestre': dates.quarter,
+        'semestre': np.where(month <= 6, 1, 2),
+        'ano': dates.year,
+    })
 
 # Function to generate time dimension data
-def generate_time_dimension(conn):
+@instrumented
+def generate_time_dimension(conn, partition=None):
     try:
         cursor = conn.cursor()
+        min_date, max_date = get_order_date_bounds(partition_file(ORDERS_FILE, partition))
         
-        # Check if dim_tempo already has data
-        cursor.execute("SELECT COUNT(*) FROM dim_tempo")
-        count = cursor.fetchone()[0]
+        # A backfilled partition may be older than the calendar, which is then extended on both sides
+        if partition:
+            calendar_df = extend_time_dimension(cursor, min_date, max_date)
+            conn.commit()
+            record(rows_out=len(calendar_df))
+            return calendar_df
         
-        if count > 0:
-            print("Time dimension already populated")
-            return
+        # Only dates after the current end of the calendar are added
+        cursor.execute("SELECT MAX(data), COALESCE(MAX(tempo_id), 0) FROM dim_tempo")
+        last_date, last_tempo_id = cursor.fetchone()
         
-        # Get all unique dates from the orders data
-        orders_df = pd.read_csv(ORDERS_FILE, parse_dates=['created_at'])
-        dates = pd.to_datetime(orders_df['created_at']).dt.date.unique()
+        margin = pd.Timedelta(days=TIME_DIMENSION_MARGIN_DAYS)
+        start_date = min_date - margin if last_date is None else pd.Timestamp(last_date) + pd.Timedelta(days=1)
+        end_date = max_date + margin
         
-        # Add a few days before and after for good measure
-        min_date = min(dates) - datetime.timedelta(days=30)
-        max_date = max(dates) + datetime.timedelta(days=30)
+        if start_date > end_date:
+            print("Time dimension already populated")
+            return
         
-        # Generate all dates in the range
-        all_dates = [min_date + datetime.timedelta(days=x) for x in range((max_date - min_date).days + 1)]
+        calendar_df = build_time_dimension(start_date, end_date, last_tempo_id + 1)
         
-        # Insert time dimension data
-        for i, date in enumerate(all_dates, 1):
-            dt = datetime.datetime.combine(date, datetime.time.min)
-            
-            # Extract date components
-            day_of_week = dt.strftime('%A')
-            is_weekend = dt.weekday() >= 5  # 5 = Saturday, 6 = Sunday
-            is_holiday = False  # Simplified, would need a holiday calendar
-            month_name = dt.strftime('%B')
-            quarter = (dt.month - 1) // 3 + 1
-            semester = 1 if dt.month <= 6 else 2
-            year = dt.year
-            
-            cursor.execute("""
-            INSERT INTO dim_tempo (tempo_id, data, dia_da_semana, eh_final_de_semana, eh_feriado, nome_mes, trimestre, semestre, ano)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (data) DO NOTHING
-            """, (i, date, day_of_week, is_weekend, is_holiday, month_name, quarter, semester, year))
+        # Write the whole range in a single COPY
+        copy_dataframe(cursor, calendar_df, 'dim_tempo', TIME_COLUMNS, batch_size=len(calendar_df))
         
         conn.commit()
-        print(f"Time dimension populated with {len(all_dates)} dates")
-    except Exception as e:
+        record(rows_out=len(calendar_df))
+        print(f"Time dimension populated with {len(calendar_df)} dates")
+        return calendar_df
+    except Exception:
         conn.rollback()
-        print(f"Error generating time dimension: {e}")
+        raise
 
-# Function to load users data
-def load_users_data(engine):
-    try:
-        # Read users data
-        users_df = pd.read_csv(USERS_FILE)
-        
-        # Rename e-mail column to email to match database schema
-        users_df.rename(columns={'e-mail': 'email'}, inplace=True)
+# Function to make dim_tempo cover a date range plus the margin, before and after the dates it already has;
+# streamed orders arrive in chunks, so their overall range isn't known up front
+def extend_time_dimension(cursor, min_date, max_date, margin_days=TIME_DIMENSION_MARGIN_DAYS):
+    """Add the calendar days missing around min_date..max_date, returning the new rows"""
+    cursor.execute("SELECT MIN(data), MAX(data), COALESCE(MAX(tempo_id), 0) FROM dim_tempo")
+    first_date, last_date, last_tempo_id = cursor.fetchone()
+    
+    margin = pd.Timedelta(days=margin_days)
+    start_date, end_date = pd.Timestamp(min_date).normalize() - margin, pd.Timestamp(max_date).normalize() + margin
+    if first_date is None:
+        ranges = [(start_date, end_date)]
+    else:
+        day = pd.Timedelta(days=1)
+        ranges = [(start_date, pd.Timestamp(first_date) - day), (pd.Timestamp(last_date) + day, end_date)]
+    
+    calendars = []
+    for start, end in ranges:
+        if start <= end:
+            calendars.append(build_time_dimension(start, end, last_tempo_id + 1))
+            last_tempo_id += len(calendars[-1])
+    if not calendars:
+        return pd.DataFrame(columns=TIME_COLUMNS)
+    
+    calendar_df = pd.concat(calendars, ignore_index=True)
+    copy_dataframe(cursor, calendar_df, 'dim_tempo', TIME_COLUMNS, batch_size=len(calendar_df))
+    return calendar_df
+
+# Function to build a to_sql method that upserts on the table's primary key
+def upsert_method(key_column):
+    def method(table, conn, keys, data_iter):
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        if not rows:
+            return 0
+        stmt = pg_insert(table.table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={col: stmt.excluded[col] for col in keys if col != key_column}
+        )
+        return conn.execute(stmt).rowcount
+    return method
+
+# Function to quarantine the rows of a frame that would violate a constraint of table, returning the others
+def quarantine_invalid(df, table, rejects_file, keys=None, append=False):
+    valid_df, rejected_df = validate(df, table, keys)
+    record(rows_rejected=len(rejected_df))
+    write_rejects(rejected_df, rejects_file, append)
+    return valid_df
+
+# Function to drop the dimension rows whose row_hash matches the stored one, in one join through the key;
+# with scd2 the rows are compared with the open versions of the history instead
+def drop_unchanged_rows(cursor, df, table, scd2=False):
+    """Return the rows of df that are new or changed; the staging table is left for write_history"""
+    key = CONSTRAINTS[table]['key']
+    staging = f"stg_{table}_hash"
+    cursor.execute(f"CREATE TEMP TABLE {staging} ({key} INTEGER, row_hash BIGINT) ON COMMIT DROP")
+    copy_dataframe(cursor, df, staging, [key, 'row_hash'])
+    cursor.execute(f"ANALYZE {staging}")
+    stored, current = (f"{table}_historico", "AND d.valid_to IS NULL") if scd2 else (table, "")
+    cursor.execute(f"""
+        SELECT s.{key} FROM {staging} s
+        JOIN {stored} d ON d.{key} = s.{key} AND d.row_hash = s.row_hash {current}
+    """)
+    unchanged = [row[0] for row in cursor.fetchall()]
+    return df[~df[key].isin(unchanged)]
+
+# Function to close the open versions of changed rows and add their new versions to the history table
+def write_history(cursor, changed_df, table):
+    key = CONSTRAINTS[table]['key']
+    history = f"{table}_historico"
+    
+    # Database clock at full (microsecond) precision, so versions of a key written in the same second
+    # still get distinct (key, valid_from) primary keys
+    cursor.execute("SELECT clock_timestamp()::timestamp")
+    valid_from = cursor.fetchone()[0]
+    cursor.execute(f"""
+        UPDATE {history} h SET valid_to = %s
+        FROM stg_{table}_hash s
+        WHERE h.{key} = s.{key} AND h.valid_to IS NULL AND h.row_hash <> s.row_hash
+    """, (valid_from,))
+    # Copied as text, since copy_dataframe's date format would drop the microseconds
+    copy_dataframe(cursor, changed_df.assign(valid_from=valid_from.isoformat(sep=' ')), history,
+                   list(changed_df.columns) + ['valid_from'])
+
+# Function to write the new and changed rows of a dimension frame (with row_hash) in one transaction
+def write_dimension(engine, df, table, scd2=DIMENSION_SCD2):
+    """Upsert the rows of df that differ from the stored ones, returning how many were written"""
+    key = CONSTRAINTS[table]['key']
+    with engine.begin() as conn:
+        # Same transaction for the lookup, the history and the upsert
+        cursor = conn.connection.cursor()
+        changed_df = drop_unchanged_rows(cursor, df, table, scd2)
+        if scd2 and len(changed_df) > 0:
+            write_history(cursor, changed_df, table)
+        changed_df.to_sql(table, conn, if_exists='append', index=False,
+                          method=upsert_method(key), chunksize=UPSERT_CHUNKSIZE)
+    record(rows_out=len(changed_df))
+    return len(changed_df)
+
+# Function to upsert a frame of processed users into dim_usuarios; append_rejects adds to an earlier chunk's rejects
+# and a partition's rejects go to its own report
+def upsert_users(engine, users_df, append_rejects=False, partition=None):
+    # Rename e-mail column to email to match database schema
+    users_df = users_df.rename(columns={'e-mail': 'email'})
+    
+    # Convert date columns, then set aside rows a NOT NULL or length constraint would reject
+    parse_datetimes(users_df, 'dim_users')
+    users_df = quarantine_invalid(users_df, 'dim_usuarios', partition_file(USERS_REJECTS_FILE, partition),
+                                  append=append_rejects)
+    users_df['row_hash'] = row_hashes(users_df, DIMENSION_HASH_COLUMNS['dim_usuarios'])
+    users_df['entry_date'] = users_df['entry_date'].dt.date
+    users_df['update_date'] = users_df['update_date'].dt.date
+    
+    # Load new and changed rows to database
+    return write_dimension(engine, users_df, 'dim_usuarios')
+
+# Function to upsert a frame of processed products into dim_produtos, quarantining invalid rows like upsert_users
+def upsert_products(engine, products_df, append_rejects=False, partition=None):
+    # Convert date columns
+    products_df = parse_datetimes(products_df.copy(), 'dim_produtos')
+    products_df = quarantine_invalid(products_df, 'dim_produtos', partition_file(PRODUCTS_REJECTS_FILE, partition),
+                                     append=append_rejects)
+    products_df['row_hash'] = row_hashes(products_df, DIMENSION_HASH_COLUMNS['dim_produtos'])
+    products_df['created_at'] = products_df['created_at'].dt.date
+    
+    # Load new and changed rows to database
+    return write_dimension(engine, products_df, 'dim_produtos')
+
+# Function to load users data; failures propagate so a failed load can't pass for an empty one
+@instrumented
+def load_users_data(engine, partition=None):
+    # Read users data
+    users_df = read_processed_file(partition_file(USERS_FILE, partition), 'dim_users')
+    record(rows_in=len(users_df))
+    
+    loaded = upsert_users(engine, users_df, partition=partition)
+    print(f"Loaded {loaded} users records")
+    return loaded
+
+# Function to load products data; failures propagate like in load_users_data
+@instrumented
+def load_products_data(engine, partition=None):
+    # Read products data
+    products_df = read_processed_file(partition_file(PRODUCTS_FILE, partition), 'dim_produtos')
+    record(rows_in=len(products_df))
+    
+    loaded = upsert_products(engine, products_df, partition=partition)
+    print(f"Loaded {loaded} products records")
+    return loaded
+
+# Function to stream a DataFrame into a table with COPY ... FROM STDIN
+def copy_dataframe(cursor, df, table, columns, batch_size=COPY_BATCH_SIZE):
+    """Copy df[columns] into table in batches of batch_size rows, returning the row count"""
+    copy_sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    copied = 0
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
         
-        # Convert date columns
-        users_df['entry_date'] = pd.to_datetime(users_df['entry_date']).dt.date
-        users_df['update_date'] = pd.to_datetime(users_df['update_date']).dt.date
+        # Serialize the batch into an in-memory CSV buffer; NaN/NaT become unquoted empty fields (NULL)
+        buffer = StringIO()
+        batch.to_csv(buffer, columns=columns, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S')
+        record(bytes_written=buffer.tell())
+        buffer.seek(0)
         
-        # Load data to database
-        users_df.to_sql('dim_usuarios', engine, if_exists='append', index=False, method='multi')
-        print(f"Loaded {len(users_df)} users records")
-    except Exception as e:
-        print(f"Error loading users data: {e}")
+        cursor.copy_expert(copy_sql, buffer)
+        copied += len(batch)
+    return copied
 
-# Function to load products data
-def load_products_data(engine):
-    try:
-        # Read products data
-        products_df = pd.read_csv(PRODUCTS_FILE)
+# Function to fetch dim_tempo once as a date -> tempo_id lookup
+def fetch_time_lookup(cursor):
+    cursor.execute("SELECT data, tempo_id FROM dim_tempo")
+    rows = cursor.fetchall()
+    dates = pd.to_datetime([row[0] for row in rows])
+    return pd.Series([row[1] for row in rows], index=dates, dtype='int64')
+
+# Function to resolve tempo_id for every order in one vectorized map
+def assign_tempo_id(orders_df, time_lookup):
+    """Return (orders with tempo_id, orders whose date is outside dim_tempo)"""
+    tempo_id = orders_df['created_at'].dt.normalize().map(time_lookup)
+    missing = tempo_id.isna()
+    
+    rejected = orders_df[missing].copy()
+    rejected['reject_reason'] = 'date_outside_dim_tempo'
+    
+    orders_df = orders_df[~missing].copy()
+    orders_df['tempo_id'] = tempo_id[~missing].astype('int64')
+    return orders_df, rejected
+
+# Function to fetch the keys of dim_usuarios, which orders are checked against before they are written
+def fetch_user_keys(cursor):
+    cursor.execute("SELECT user_id FROM dim_usuarios")
+    return pd.Index([row[0] for row in cursor.fetchall()], dtype='int64')
+
+# Function to split orders into the ones that can be written, with tempo_id, and the quarantined ones
+def screen_orders(orders_df, user_keys, time_lookup):
+    """Return (orders to write, rejected orders); every rejected order has a reject_reason"""
+    orders_df, invalid_df = validate(orders_df, 'fato_pedidos', {'dim_usuarios': user_keys})
+    orders_df, outside_df = assign_tempo_id(orders_df, time_lookup)
+    rejected = [df for df in (invalid_df, outside_df) if len(df) > 0]
+    return orders_df, pd.concat(rejected) if rejected else outside_df
+
+# Function to open the local fingerprint index, or None when it is disabled
+def open_fingerprint_index(enabled=FINGERPRINT_INDEX):
+    return FingerprintIndex(LOADER_FINGERPRINTS_DIR) if enabled else None
+
+# Function to drop orders that were already loaded, adding the fingerprint column to the others
+def drop_loaded_orders(cursor, orders_df, fingerprint_index=None, check_loaded=True):
+    """Return (orders to write, number of duplicates dropped).
+
+    Orders repeated within the batch are always dropped. With check_loaded, so are orders in the local
+    fingerprint index and, in one join against the unique index, orders already in fato_pedidos.
+    """
+    orders_df = orders_df.assign(fingerprint=order_fingerprints(orders_df))
+    duplicate = orders_df['fingerprint'].duplicated()
+    if check_loaded and fingerprint_index is not None:
+        duplicate |= fingerprint_index.seen(orders_df['fingerprint'], orders_df['created_at'])
+    new_df = orders_df[~duplicate]
+    
+    if check_loaded and len(new_df) > 0:
+        # COPY the batch's fingerprints to a temporary table and look them up through the unique index;
+        # the created_at bounds restrict the lookup to the partitions the batch covers
+        cursor.execute("CREATE TEMP TABLE stg_fingerprints (fingerprint BIGINT, created_at TIMESTAMP) ON COMMIT DROP")
+        copy_dataframe(cursor, new_df, 'stg_fingerprints', ['fingerprint', 'created_at'])
+        cursor.execute("ANALYZE stg_fingerprints")
+        cursor.execute("""
+            SELECT s.fingerprint FROM stg_fingerprints s
+            JOIN fato_pedidos f ON f.fingerprint = s.fingerprint AND f.created_at = s.created_at
+            WHERE f.created_at BETWEEN %s AND %s
+        """, (new_df['created_at'].min(), new_df['created_at'].max()))
+        loaded = np.array([row[0] for row in cursor.fetchall()], dtype='int64')
+        new_df = new_df[~new_df['fingerprint'].isin(loaded)]
+    
+    duplicates = len(orders_df) - len(new_df)
+    record(rows_duplicate=duplicates)
+    if duplicates > 0:
+        print(f"Dropped {duplicates} orders already loaded")
+    return new_df, duplicates
+
+# Function to add the orders just committed to the local fingerprint index; replaced months start over
+def update_fingerprint_index(fingerprint_index, orders_df, replace_months=False):
+    if fingerprint_index is None:
+        return
+    if replace_months:
+        fingerprint_index.forget(orders_df['created_at'])
+    fingerprint_index.add(orders_df['fingerprint'], orders_df['created_at'])
+    fingerprint_index.commit()
+
+# Function to write rejected rows to the reject report; append adds them to the report of an earlier chunk.
+# The report is written even without rejects, so it always describes the latest run
+def write_rejects(rejected_df, rejects_file, append=False):
+    os.makedirs(os.path.dirname(rejects_file), exist_ok=True)
+    append = append and os.path.exists(rejects_file)
+    rejected_df.to_csv(rejects_file, index=False, mode='a' if append else 'w', header=not append)
+    if len(rejected_df) > 0:
+        print(f"Rejected {len(rejected_df)} records, see {rejects_file}")
+
+# Function to remove the reports of an earlier run, before this run writes or appends to them
+def clear_reports(*report_files):
+    for report_file in report_files:
+        if os.path.exists(report_file):
+            os.remove(report_file)
+
+# Function to reserve pedido_id values from the fact table sequence in one round trip
+def allocate_pedido_ids(cursor, count):
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence('fato_pedidos', 'pedido_id')) FROM generate_series(1, %s)",
+        (count,)
+    )
+    return np.array([row[0] for row in cursor.fetchall()], dtype='int64')
+
+# Function to fetch dim_produtos once as a normalized name -> product_id lookup
+def fetch_product_index(cursor):
+    cursor.execute("SELECT name, product_id FROM dim_produtos")
+    rows = cursor.fetchall()
+    names = pd.Series([row[0] for row in rows], dtype='object').str.strip().str.lower()
+    return pd.Series([row[1] for row in rows], index=names, dtype='int64')
+
+# Function to split each order's items text into one row per product
+def explode_order_items(orders_df, product_index):
+    """Return (item rows for itens_pedido, item rows whose name matches no product)"""
+    items = orders_df[['pedido_id', 'tempo_id', 'items']].copy()
+    items['item_name'] = items.pop('items').str.split(',')
+    items = items.explode('item_name')
+    items['item_name'] = items['item_name'].str.strip()
+    items = items[items['item_name'].notna() & (items['item_name'] != '')]
+    
+    # Repeated products in the same order become a quantity
+    items = (items.groupby(['pedido_id', 'tempo_id', 'item_name'], sort=False)
+             .size().reset_index(name='quantity'))
+    
+    # Unknown names are still loaded (product_id NULL) and listed in the unresolved report
+    items['product_id'] = items['item_name'].str.lower().map(product_index).astype('Int64')
+    unresolved = items[items['product_id'].isna()]
+    return items[ORDER_ITEMS_COLUMNS], unresolved
+
+# Function to insert orders one row at a time (original path, kept for comparison)
+def insert_orders_rowwise(cursor, orders_df):
+    # Replace NaN values with None for SQL compatibility
+    orders_df = orders_df.astype(object).where(orders_df.notna(), None)
+    
+    # Process each order
+    for _, row in orders_df.iterrows():
+        # Insert order data
+        cursor.execute("""
+        INSERT INTO fato_pedidos (
+            pedido_id, user_id, product_id, tempo_id, created_at, items, total, 
+            payment_status, payment_method, payment_date, shipping_status,
+            shipping_status_date_awaiting_payment, shipping_status_date_preparing,
+            shipping_status_date_sent, shipping_status_date_delivered, fingerprint
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (
+            row['pedido_id'], row['user_id'], None, row['tempo_id'], row['created_at'], row['items'], row['total'],
+            row['payment_status'], row['payment_method'], row['payment_date'], row['shipping_status'],
+            row['shipping_status_date_awaiting_payment'], row['shipping_status_date_preparing'],
+            row['shipping_status_date_sent'], row['shipping_status_date_delivered'], row['fingerprint']
+        ))
+    return len(orders_df)
+
+# Columns of fato_pedidos written by the bulk paths, in COPY order
+ORDERS_COPY_COLUMNS = ['pedido_id', 'tempo_id'] + ORDERS_COLUMNS + ['fingerprint']
+
+# Function to bulk insert orders with COPY
+def insert_orders_copy(cursor, orders_df, batch_size=COPY_BATCH_SIZE):
+    return copy_dataframe(cursor, orders_df, 'fato_pedidos', ORDERS_COPY_COLUMNS, batch_size)
+
+# Functions to name and bound the monthly partitions of fato_pedidos
+def partition_name(month):
+    return f"fato_pedidos_{month.year}_{month.month:02d}"
+
+def partition_bounds(month):
+    return month.start_time.strftime('%Y-%m-%d'), (month + 1).start_time.strftime('%Y-%m-%d')
+
+# Function to list the partitions fato_pedidos already has
+def fetch_order_partitions(cursor):
+    cursor.execute("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'fato_pedidos'::regclass
+    """)
+    return {row[0] for row in cursor.fetchall()}
+
+# Function to COPY orders into a partitioned fato_pedidos, one month at a time
+def insert_orders_partitioned(cursor, orders_df, batch_size=COPY_BATCH_SIZE, replace_months=False):
+    columns = ORDERS_COPY_COLUMNS
+    existing = fetch_order_partitions(cursor)
+    loaded = 0
+    for month, month_df in orders_df.groupby(orders_df['created_at'].dt.to_period('M'), sort=True):
+        name = partition_name(month)
         
-        # Convert date columns
-        products_df['created_at'] = pd.to_datetime(products_df['created_at']).dt.date
+        # Reloading a month only touches that month's partition and its items
+        if replace_months and name in existing:
+            cursor.execute(f"DELETE FROM itens_pedido WHERE pedido_id IN (SELECT pedido_id FROM {name})")
+            cursor.execute(f"DROP TABLE {name}")
+            existing.discard(name)
         
-        # Load data to database
-        products_df.to_sql('dim_produtos', engine, if_exists='append', index=False, method='multi')
-        print(f"Loaded {len(products_df)} products records")
-    except Exception as e:
-        print(f"Error loading products data: {e}")
+        if name in existing:
+            # A delta for a month that is already loaded goes through the parent and its indexes
+            loaded += copy_dataframe(cursor, month_df, 'fato_pedidos', columns, batch_size)
+            continue
+        
+        # New month: COPY into a bare table, then attach it, so its indexes are built and its
+        # foreign keys checked once, over this month only
+        start, end = partition_bounds(month)
+        cursor.execute(f"CREATE TABLE {name} (LIKE fato_pedidos INCLUDING DEFAULTS)")
+        loaded += copy_dataframe(cursor, month_df, name, columns, batch_size)
+        cursor.execute(f"ALTER TABLE fato_pedidos ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')")
+    return loaded
+
+# Function to bulk insert the order items bridge rows with COPY
+def insert_order_items(cursor, items_df, batch_size=COPY_BATCH_SIZE):
+    return copy_dataframe(cursor, items_df, 'itens_pedido', ORDER_ITEMS_COLUMNS, batch_size)
+
+# Function to write the order items that match no product to their report, a partition's to its own
+def write_unresolved_items(unresolved_df, append=False, partition=None):
+    unresolved_file = partition_file(ORDER_ITEMS_UNRESOLVED_FILE, partition)
+    os.makedirs(os.path.dirname(unresolved_file), exist_ok=True)
+    append = append and os.path.exists(unresolved_file)
+    unresolved_df.to_csv(unresolved_file, index=False, mode='a' if append else 'w', header=not append)
+    if len(unresolved_df) > 0:
+        print(f"{len(unresolved_df)} order items match no product, see {unresolved_file}")
+
+# Function to write orders whose tempo_id is resolved, with their items and rollup delta; the caller commits
+def write_orders(cursor, orders_df, product_index, bulk=True, batch_size=COPY_BATCH_SIZE,
+                 partitioned=PARTITION_ORDERS, defer_indexes=DEFER_ORDER_INDEXES, replace_months=False,
+                 append_rejects=False, partition=None):
+    """Return (orders loaded, order items loaded, items whose name matches no product)"""
+    # Explode items into order lines, resolving product names in memory
+    orders_df['pedido_id'] = allocate_pedido_ids(cursor, len(orders_df))
+    items_df, unresolved_df = explode_order_items(orders_df, product_index)
+    
+    # Item rows that would violate an itens_pedido constraint (e.g. a name longer than item_name)
+    # are quarantined; their order is still loaded
+    items_df = quarantine_invalid(items_df, 'itens_pedido', partition_file(ORDER_ITEMS_REJECTS_FILE, partition),
+                                  append=append_rejects)
+    unresolved_df = unresolved_df[unresolved_df.index.isin(items_df.index)]
+    
+    if partitioned:
+        if replace_months:
+            clear_rollup_months(cursor, orders_df['created_at'].dt.to_period('M').unique())
+        loaded = insert_orders_partitioned(cursor, orders_df, batch_size, replace_months)
+    elif bulk:
+        if defer_indexes:
+            drop_order_constraints(cursor)
+        loaded = insert_orders_copy(cursor, orders_df, batch_size)
+        if defer_indexes:
+            create_order_constraints(cursor)
+    else:
+        loaded = insert_orders_rowwise(cursor, orders_df)
+    items_loaded = insert_order_items(cursor, items_df, batch_size)
+    
+    # Dashboards read the rollups, which take this load's delta in the same transaction
+    update_rollups(cursor, orders_df, items_df)
+    return loaded, items_loaded, unresolved_df
 
 # Function to load orders data
-def load_orders_data(conn, engine):
+@instrumented
+def load_orders_data(conn, engine, bulk=True, batch_size=COPY_BATCH_SIZE, time_lookup=None,
+                     incremental=INCREMENTAL, partitioned=PARTITION_ORDERS, defer_indexes=DEFER_ORDER_INDEXES,
+                     replace_months=REPLACE_MONTHS, fingerprint_index=FINGERPRINT_INDEX, partition=None):
     try:
-        # Read orders data
-        orders_df = pd.read_csv(ORDERS_FILE, parse_dates=[
-            'created_at', 'payment_date', 
-            'shipping_status_date_awaiting_payment', 'shipping_status_date_preparing',
-            'shipping_status_date_sent', 'shipping_status_date_delivered'
-        ])
+        # This run's reports replace the previous run's, even when this run has nothing to report;
+        # each partition keeps its own, so loading one day leaves the others' reports alone
+        orders_rejects_file = partition_file(ORDERS_REJECTS_FILE, partition)
+        clear_reports(orders_rejects_file, partition_file(ORDER_ITEMS_REJECTS_FILE, partition),
+                      partition_file(ORDER_ITEMS_UNRESOLVED_FILE, partition))
         
-        # Replace NaN values with None for SQL compatibility
-        orders_df = orders_df.replace({np.nan: None})
+        # Read orders data
+        orders_df = read_processed_file(partition_file(ORDERS_FILE, partition), 'fato_orders', columns=ORDERS_COLUMNS,
+                                        parse_dates=ORDERS_DATE_COLUMNS)
+        record(rows_in=len(orders_df))
         
         # Create a cursor
         cursor = conn.cursor()
         
-        # Process each order
-        for _, row in orders_df.iterrows():
-            # Get tempo_id for the order date
-            order_date = row['created_at'].date()
-            cursor.execute("SELECT tempo_id FROM dim_tempo WHERE data = %s", (order_date,))
-            tempo_id_result = cursor.fetchone()
-            tempo_id = tempo_id_result[0] if tempo_id_result else None
-            
-            # For simplicity, we're using the first product mentioned in items
-            # In a real scenario, you might want to split items and create multiple records
-            # or use a junction table for order_items
-            
-            # Insert order data
-            cursor.execute("""
-            INSERT INTO fato_pedidos (
-                user_id, product_id, tempo_id, created_at, items, total, 
-                payment_status, payment_method, payment_date, shipping_status,
-                shipping_status_date_awaiting_payment, shipping_status_date_preparing,
-                shipping_status_date_sent, shipping_status_date_delivered
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                row['user_id'], None, tempo_id, row['created_at'], row['items'], row['total'],
-                row['payment_status'], row['payment_method'], row['payment_date'], row['shipping_status'],
-                row['shipping_status_date_awaiting_payment'], row['shipping_status_date_preparing'],
-                row['shipping_status_date_sent'], row['shipping_status_date_delivered']
-            ))
+        # Skip orders already loaded, so rerunning the same delta is a no-op; replaced months are loaded whole.
+        # A partition holds one day's delivery, which may be older than the orders already loaded, so it
+        # relies on the fingerprints alone
+        replacing = partitioned and replace_months
+        if incremental and not replacing and not partition:
+            cursor.execute("SELECT MAX(created_at) FROM fato_pedidos")
+            last_loaded = cursor.fetchone()[0]
+            if last_loaded is not None:
+                orders_df = orders_df[orders_df['created_at'] > pd.Timestamp(last_loaded)]
+        
+        # Check the whole batch in memory before writing: orders that would violate a NOT NULL, domain or
+        # foreign key constraint, or fall outside the calendar, go to the reject report with a reason,
+        # so one bad row doesn't roll back the load
+        if time_lookup is None:
+            time_lookup = fetch_time_lookup(cursor)
+        orders_df, rejected_df = screen_orders(orders_df, fetch_user_keys(cursor), time_lookup)
+        record(rows_rejected=len(rejected_df))
+        write_rejects(rejected_df, orders_rejects_file)
         
+        # Re-sent orders are dropped by fingerprint, whatever their created_at
+        local_index = open_fingerprint_index(fingerprint_index)
+        orders_df, _ = drop_loaded_orders(cursor, orders_df, local_index, check_loaded=not replacing)
+        
+        product_index = fetch_product_index(cursor)
+        start = time.perf_counter()
+        loaded, items_loaded, unresolved_df = write_orders(cursor, orders_df, product_index, bulk, batch_size,
+                                                           partitioned, defer_indexes, replace_months,
+                                                           partition=partition)
+        write_unresolved_items(unresolved_df, partition=partition)
         conn.commit()
-        print(f"Loaded {len(orders_df)} orders records")
-    except Exception as e:
+        update_fingerprint_index(local_index, orders_df, replacing)
+        elapsed = time.perf_counter() - start
+        record(rows_out=loaded)
+        
+        rate = loaded / elapsed if elapsed > 0 else float('inf')
+        print(f"Loaded {loaded} orders records and {items_loaded} order items in {elapsed:.2f}s ({rate:,.0f} orders/s)")
+        return loaded
+    except Exception:
         conn.rollback()
-        print(f"Error loading orders data: {e}")
+        raise
+
+# Function to run one loader stage and log how long it took
+def run_stage(name, stage, *args):
+    start = time.perf_counter()
+    result = stage(*args)
+    elapsed = time.perf_counter() - start
+    print(f"Stage {name} finished in {elapsed:.2f}s")
+    return result, elapsed
+
+# Function to run a stage that needs a raw connection, borrowed from the engine's pool
+def with_pooled_connection(engine, stage):
+    def run():
+        conn = engine.raw_connection()
+        try:
+            return stage(conn)
+        finally:
+            conn.close()  # returns the connection to the pool
+    return run
+
+# Function to skip a stage whose input file hasn't changed since its last successful load; one manifest per partition
+def unless_unchanged(name, input_file, stage, skip_unchanged=SKIP_UNCHANGED, partition=None):
+    if not skip_unchanged:
+        return stage
+    
+    def run():
+        manifest = StageManifest(f'{name}_ds={partition}' if partition else name, [input_file],
+                                 params={'incremental': INCREMENTAL}, manifest_dir=LOADER_MANIFEST_DIR)
+        if manifest.unchanged():
+            print(f"Stage {name} skipped, {os.path.basename(input_file)} unchanged")
+            return None
+        # The load functions raise when they fail, so only a successful load is recorded
+        result = stage()
+        manifest.commit()
+        return result
+    return run
+
+# Function to orchestrate the load: tables, then the independent dimensions concurrently, then the fact table.
+# With a partition, the files of processed/ds=YYYY-MM-DD are loaded and the ones that day doesn't have are skipped
+def run_loader(engine, workers=LOADER_WORKERS, skip_unchanged=SKIP_UNCHANGED, replace_months=REPLACE_MONTHS,
+               partition=None):
+    timings = {}
+    users_file = processed_file_path(partition_file(USERS_FILE, partition), 'dim_users')
+    products_file = processed_file_path(partition_file(PRODUCTS_FILE, partition), 'dim_produtos')
+    orders_file = processed_file_path(partition_file(ORDERS_FILE, partition), 'fato_orders')
+    has_orders = not partition or os.path.exists(orders_file)
+    
+    _, timings['create_tables'] = run_stage('create_tables', with_pooled_connection(engine, create_tables))
+    
+    # Users, products and time don't depend on each other; each stage commits before returning.
+    # The time dimension runs whenever there are orders: it is a no-op once the calendar covers them
+    dimension_stages = {}
+    if has_orders:
+        dimension_stages['generate_time_dimension'] = with_pooled_connection(
+            engine, lambda conn: generate_time_dimension(conn, partition=partition))
+    if not partition or os.path.exists(users_file):
+        dimension_stages['load_users_data'] = unless_unchanged(
+            'load_users_data', users_file, lambda: load_users_data(engine, partition=partition), skip_unchanged,
+            partition)
+    if not partition or os.path.exists(products_file):
+        dimension_stages['load_products_data'] = unless_unchanged(
+            'load_products_data', products_file, lambda: load_products_data(engine, partition=partition),
+            skip_unchanged, partition)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {name: executor.submit(run_stage, name, stage) for name, stage in dimension_stages.items()}
+        for name, future in futures.items():
+            _, timings[name] = future.result()
+    
+    # The fact table references every dimension, so it is loaded once they are committed
+    if has_orders:
+        load_orders = with_pooled_connection(engine, lambda conn: load_orders_data(
+            conn, engine, replace_months=replace_months, partition=partition))
+        _, timings['load_orders_data'] = run_stage(
+            'load_orders_data', unless_unchanged('load_orders_data', orders_file, load_orders, skip_unchanged,
+                                                 partition))
+    
+    return timings
 
 # Main function
 def main():
-    # Get database connection
-    conn = get_connection()
-    if not conn:
-        return
+    # Each instrumented stage logs its metrics as one JSON line
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     
-    # Get SQLAlchemy engine
-    engine = get_engine()
+    # One bounded pool for every stage
+    engine = get_engine(pool_size=LOADER_POOL_SIZE)
     
     try:
-        # Create tables
-        create_tables(conn)
-        
-        # Generate time dimension
-        generate_time_dimension(conn)
-        
-        # Load dimension tables first
-        load_users_data(engine)
-        load_products_data(engine)
-        
-        # Load fact table last
-        load_orders_data(conn, engine)
-        
-        print("Data loading completed successfully")
+        start = time.perf_counter()
+        run_loader(engine, workers=LOADER_WORKERS, replace_months=REPLACE_MONTHS)
+        print(f"Data loading completed successfully in {time.perf_counter() - start:.2f}s")
     except Exception as e:
         print(f"Error in main process: {e}")
+        raise
     finally:
-        conn.close()
+        engine.dispose()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,11 +1,30 @@
-from dags.pipeline_airflow import (
+import os
+from concurrent.futures import ProcessPoolExecutor
+from steps.pipeline_tasks import (
     process_user_data,
     process_product_data,
     process_order_data,
     generate_reports
 )
 
-process_user_data()
-process_product_data()
-process_order_data()
-generate_reports()
\ No newline at end of file
+# Processes used to run the independent processing tasks; 1 runs everything in this process
+LOCAL_WORKERS = int(os.environ.get('SEVEN_LOCAL_WORKERS', '0')) or os.cpu_count() or 1
+
+# Same dependencies as the DAG: the three processing tasks are independent, reports need all of them
+PROCESSING_TASKS = [process_user_data, process_product_data, process_order_data]
+
+def run_local(workers=LOCAL_WORKERS):
+    """Run the processing tasks in a process pool, then generate_reports once all of them succeeded"""
+    if workers <= 1:
+        results = [task() for task in PROCESSING_TASKS]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(PROCESSING_TASKS))) as executor:
+            futures = [executor.submit(task) for task in PROCESSING_TASKS]
+            # result() re-raises a failed task's exception, so reports never run on partial output
+            results = [future.result() for future in futures]
+    results.append(generate_reports())
+    return results
+
+if __name__ == '__main__':
+    for result in run_local():
+        print(result)
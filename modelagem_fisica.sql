@@ -9,7 +9,8 @@ CREATE TABLE dim_usuarios (
     entry_time TIME NOT NULL,
     update_date DATE,
     email VARCHAR(100) NOT NULL,  -- Changed from e-mail to email to avoid issues with special characters
-    cpf VARCHAR(14) NOT NULL
+    cpf VARCHAR(14) NOT NULL,
+    row_hash BIGINT  -- Hash of the business columns, compared by the loader to skip unchanged rows
 );
 
 -- Create dimension table for products
@@ -19,7 +20,24 @@ CREATE TABLE dim_produtos (
     price DECIMAL(10, 2) NOT NULL,
     stock INTEGER NOT NULL,
     created_at DATE NOT NULL,
-    description TEXT
+    description TEXT,
+    row_hash BIGINT
+);
+
+-- Versions of each user and product (SEVEN_DIMENSION_SCD2=1 in the loader): a changed row closes
+-- its open version (valid_to) and opens a new one; the dimensions above keep the current values
+CREATE TABLE dim_usuarios_historico (
+    LIKE dim_usuarios,
+    valid_from TIMESTAMP NOT NULL,
+    valid_to TIMESTAMP,
+    PRIMARY KEY (user_id, valid_from)
+);
+
+CREATE TABLE dim_produtos_historico (
+    LIKE dim_produtos,
+    valid_from TIMESTAMP NOT NULL,
+    valid_to TIMESTAMP,
+    PRIMARY KEY (product_id, valid_from)
 );
 
 -- Create dimension table for time
@@ -52,6 +70,8 @@ CREATE TABLE fato_pedidos (
     shipping_status_date_preparing DATE,
     shipping_status_date_sent DATE,
     shipping_status_date_delivered DATE,
+    -- Hash of user_id, created_at, items and total, used to drop re-sent orders
+    fingerprint BIGINT,
     
     -- Foreign key constraints
     FOREIGN KEY (user_id) REFERENCES dim_usuarios(user_id),
@@ -59,12 +79,84 @@ CREATE TABLE fato_pedidos (
     FOREIGN KEY (tempo_id) REFERENCES dim_tempo(tempo_id)
 );
 
+-- Create bridge table with one row per product in each order
+CREATE TABLE itens_pedido (
+    item_id SERIAL PRIMARY KEY,
+    pedido_id INTEGER NOT NULL,
+    product_id INTEGER,
+    tempo_id INTEGER,
+    item_name VARCHAR(100) NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 1,
+    
+    -- Foreign key constraints
+    FOREIGN KEY (pedido_id) REFERENCES fato_pedidos(pedido_id),
+    FOREIGN KEY (product_id) REFERENCES dim_produtos(product_id),
+    FOREIGN KEY (tempo_id) REFERENCES dim_tempo(tempo_id)
+);
+
+-- Rollup tables maintained by the loader after each fato_pedidos load (see queries.sql)
+CREATE TABLE rollup_pedidos_mes (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    total_pedidos BIGINT NOT NULL,
+    receita_total DECIMAL(16, 2) NOT NULL,
+    PRIMARY KEY (ano, mes)
+);
+
+CREATE TABLE rollup_receita_pagamento (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    total_pedidos BIGINT NOT NULL,
+    receita_total DECIMAL(16, 2) NOT NULL,
+    PRIMARY KEY (ano, mes, payment_method)
+);
+
+CREATE TABLE rollup_pedidos_status (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    shipping_status VARCHAR(50) NOT NULL,
+    total_pedidos BIGINT NOT NULL,
+    receita_total DECIMAL(16, 2) NOT NULL,
+    PRIMARY KEY (ano, mes, shipping_status)
+);
+
+CREATE TABLE rollup_ticket_cliente (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    total_pedidos BIGINT NOT NULL,
+    receita_total DECIMAL(16, 2) NOT NULL,
+    PRIMARY KEY (ano, mes, user_id)
+);
+
+CREATE TABLE rollup_produtos (
+    ano INTEGER NOT NULL,
+    mes INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantidade_total BIGINT NOT NULL,
+    PRIMARY KEY (ano, mes, product_id)
+);
+
+-- Optional monthly partitioning of the fact table (SEVEN_PARTITION_ORDERS=1 in the loader):
+-- fato_pedidos is declared with PRIMARY KEY (pedido_id, created_at) and
+-- PARTITION BY RANGE (created_at), itens_pedido drops its foreign key to fato_pedidos,
+-- and each month is a partition created on demand, e.g.
+--   CREATE TABLE fato_pedidos_2025_04 PARTITION OF fato_pedidos
+--       FOR VALUES FROM ('2025-04-01') TO ('2025-05-01');
+-- Indexes created on fato_pedidos below are created on every partition.
+
 -- Create indexes for better query performance
 CREATE INDEX idx_fato_pedidos_user_id ON fato_pedidos(user_id);
 CREATE INDEX idx_fato_pedidos_product_id ON fato_pedidos(product_id);
 CREATE INDEX idx_fato_pedidos_tempo_id ON fato_pedidos(tempo_id);
 CREATE INDEX idx_fato_pedidos_payment_method ON fato_pedidos(payment_method);
 CREATE INDEX idx_fato_pedidos_shipping_status ON fato_pedidos(shipping_status);
+CREATE UNIQUE INDEX idx_fato_pedidos_fingerprint ON fato_pedidos(fingerprint, created_at);
+CREATE UNIQUE INDEX idx_dim_usuarios_historico_atual ON dim_usuarios_historico(user_id) WHERE valid_to IS NULL;
+CREATE UNIQUE INDEX idx_dim_produtos_historico_atual ON dim_produtos_historico(product_id) WHERE valid_to IS NULL;
+CREATE INDEX idx_itens_pedido_product_id ON itens_pedido(product_id);
+CREATE INDEX idx_itens_pedido_pedido_id ON itens_pedido(pedido_id);
 CREATE INDEX idx_dim_tempo_data ON dim_tempo(data);
 CREATE INDEX idx_dim_tempo_ano ON dim_tempo(ano);
 
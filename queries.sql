@@ -23,14 +23,13 @@ ORDER BY
     receita_total DESC;
 
 -- Produto mais vendido (por quantidade)
--- Nota: Assumindo que existe uma tabela de itens de pedido não mostrada nos arquivos
--- Esta query é uma aproximação baseada nos dados disponíveis
+-- Usa a tabela ponte itens_pedido, com uma linha por produto de cada pedido
 SELECT 
     p.product_id,
     p.name AS nome_produto,
     SUM(i.quantity) AS quantidade_total
 FROM 
-    produtos_raw p
+    dim_produtos p
 JOIN 
     itens_pedido i ON p.product_id = i.product_id
 GROUP BY 
@@ -63,4 +62,40 @@ FROM
 GROUP BY 
     shipping_status
 ORDER BY 
-    total_pedidos DESC;
\ No newline at end of file
+    total_pedidos DESC;
+
+
+-- Consultas do dashboard sobre as tabelas de rollup, atualizadas pelo loader a cada carga
+-- de fato_pedidos; leem poucas linhas por mês, independente do tamanho da tabela fato
+
+-- Total de pedidos por mês
+SELECT ano, mes, total_pedidos
+FROM rollup_pedidos_mes
+ORDER BY ano, mes;
+
+-- Receita total por método de pagamento
+SELECT payment_method, SUM(receita_total) AS receita_total
+FROM rollup_receita_pagamento
+GROUP BY payment_method
+ORDER BY receita_total DESC;
+
+-- Produto mais vendido (por quantidade)
+SELECT p.product_id, p.name AS nome_produto, SUM(r.quantidade_total) AS quantidade_total
+FROM rollup_produtos r
+JOIN dim_produtos p ON p.product_id = r.product_id
+GROUP BY p.product_id, p.name
+ORDER BY quantidade_total DESC
+LIMIT 1;
+
+-- Ticket médio por cliente
+SELECT r.user_id, u.name AS nome_cliente, SUM(r.receita_total) / SUM(r.total_pedidos) AS ticket_medio
+FROM rollup_ticket_cliente r
+JOIN dim_usuarios u ON u.user_id = r.user_id
+GROUP BY r.user_id, u.name
+ORDER BY ticket_medio DESC;
+
+-- Pedidos por status de envio
+SELECT shipping_status, SUM(total_pedidos) AS total_pedidos
+FROM rollup_pedidos_status
+GROUP BY shipping_status
+ORDER BY total_pedidos DESC;
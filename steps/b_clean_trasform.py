@@ -1,28 +1,53 @@
 import re
+import numpy as np
 import pandas as pd
 from io import StringIO
 
+# Regex para validação de e-mails, compilada uma única vez
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+# Pesos do primeiro e do segundo dígito verificador do CPF (módulo 11)
+CPF_WEIGHTS_1 = np.arange(10, 1, -1)
+CPF_WEIGHTS_2 = np.arange(11, 1, -1)
+
 # Função para validar e-mails em uma pandas Series
-def validate_clean_email_series(emails_series):
-    # Regex para validação de e-mails
-    padrao = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    
-    # Aplicar a validação em toda a série usando .apply()
-    return emails_series.apply(lambda email: email.lower().strip() if re.match(padrao, str(email)) else None)
-
-def validate_clean_cpf_series(cpf_series):
-    # Padronizar os CPFs: remover pontos, traços e validar que sejam números
-    cpf_series = (
-        cpf_series
-        .astype(str)  # Garantir que os valores sejam strings
-        .str.replace(r'\D', '', regex=True)  # Remover todos os caracteres não numéricos
-        .str.strip()  # Remover espaços em branco
-    )
-
-    # Filtrar CPFs inválidos (com tamanho diferente de 11)
-    cpf_series = cpf_series[cpf_series.str.len() == 11]
-
-    return cpf_series
+def validate_clean_email_series(emails_series, return_mask=False):
+    # Padronizar: remover espaços e validar toda a série de uma vez com str.fullmatch
+    emails = emails_series.astype('string').str.strip()
+    valid = emails.str.fullmatch(EMAIL_PATTERN).fillna(False).astype(bool)
+
+    # E-mails inválidos viram nulos, mantendo o índice original
+    cleaned = emails.str.lower().where(valid)
+    return (cleaned, valid) if return_mask else cleaned
+
+def cpf_check_digits_mask(digits):
+    # digits: matriz (n, 11) com os dígitos de cada CPF
+    d1 = (digits[:, :9] @ CPF_WEIGHTS_1) * 10 % 11 % 10
+    d2 = (digits[:, :10] @ CPF_WEIGHTS_2) * 10 % 11 % 10
+    # CPFs com todos os dígitos iguais passam no módulo 11, mas são inválidos
+    repeated = (digits == digits[:, :1]).all(axis=1)
+    return (digits[:, 9] == d1) & (digits[:, 10] == d2) & ~repeated
+
+def validate_clean_cpf_series(cpf_series, return_mask=False):
+    # Matriz de códigos Unicode (n, largura máxima), um caractere por coluna
+    values = cpf_series.to_numpy(dtype=str, na_value='')
+    codes = values.view(np.uint32).reshape(len(values), values.dtype.itemsize // 4)
+
+    # Padronizar os CPFs: considerar apenas os dígitos, ignorando pontos, traços e espaços
+    is_digit = (codes >= ord('0')) & (codes <= ord('9'))
+    has_11_digits = is_digit.sum(axis=1) == 11
+
+    # Extrair os 11 dígitos de cada candidato, na ordem, e verificar o módulo 11
+    digits = (codes[has_11_digits][is_digit[has_11_digits]].reshape(-1, 11) - ord('0')).astype(np.int64)
+    valid = has_11_digits.copy()
+    valid[has_11_digits] = cpf_check_digits_mask(digits)
+
+    # CPFs válidos como texto de 11 dígitos; inválidos viram nulos, mantendo o índice original
+    cleaned_codes = np.zeros((len(values), 11), dtype=np.uint32)
+    cleaned_codes[has_11_digits] = digits + ord('0')
+    cleaned = pd.Series(cleaned_codes.view('<U11').ravel(), index=cpf_series.index).where(valid)
+    valid = pd.Series(valid, index=cpf_series.index)
+    return (cleaned, valid) if return_mask else cleaned
 
 # Removing the test code that was causing the error
 # user_string_raw = StringIO(dict_files_contents['user_raw.csv'])
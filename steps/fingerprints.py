@@ -0,0 +1,118 @@
+import os
+import numpy as np
+import pandas as pd
+from steps.instrumentation import record
+
+# Índice local das impressões já carregadas, um arquivo .npy ordenado por mês de created_at
+FINGERPRINTS_DIR = os.path.join('data', 'desafio', 'state', 'fingerprints', 'orders')
+
+def row_hashes(df, columns):
+    """Hash de 64 bits (int64) das colunas columns de cada linha de df, calculado de forma vetorizada.
+
+    Os valores são normalizados antes do hash (datas em segundos, números decimais com 2 casas, texto
+    e categorias como objetos), então a mesma linha tem o mesmo hash lida do bruto, do CSV ou do
+    Parquet, com qualquer tipo inteiro.
+    """
+    normalized = {}
+    for col in columns:
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            values = values.astype('datetime64[s]').astype('int64')
+        elif pd.api.types.is_float_dtype(values):
+            values = values.round(2)
+        elif not pd.api.types.is_integer_dtype(values):
+            values = values.astype(object)
+        normalized[col] = values
+    # A chave de hash é fixa, então o hash não muda entre execuções nem entre processos
+    hashes = pd.util.hash_pandas_object(pd.DataFrame(normalized, index=df.index), index=False, categorize=False)
+    return pd.Series(hashes.to_numpy().view('int64'), index=df.index)
+
+# Um pedido reenviado pelo upstream repete exatamente estas colunas
+FINGERPRINT_COLUMNS = ['user_id', 'created_at', 'items', 'total']
+
+def order_fingerprints(df):
+    """Impressão digital de cada pedido de df: o hash de FINGERPRINT_COLUMNS"""
+    return row_hashes(df, FINGERPRINT_COLUMNS).rename('fingerprint')
+
+def _months(created_at):
+    # Mês como inteiro (ano * 12 + mês - 1), sem formatar texto linha a linha
+    return (created_at.dt.year * 12 + created_at.dt.month - 1).to_numpy()
+
+def _by_month(values, created_at):
+    # Posições de cada mês em values; linhas sem created_at não pertencem a nenhum mês
+    for month, positions in pd.Series(values).groupby(_months(created_at)).indices.items():
+        yield int(month), positions
+
+class FingerprintIndex:
+    """Conjunto das impressões de pedidos já vistos, em um arquivo .npy ordenado por mês.
+
+    created_at faz parte da impressão, então um pedido repetido cai sempre no mesmo mês: cada consulta
+    lê só os meses do lote e o custo não cresce com o histórico. index_dir=None mantém o conjunto só
+    em memória. add() só altera a memória; commit() grava os meses alterados.
+    """
+
+    def __init__(self, index_dir=FINGERPRINTS_DIR):
+        self.index_dir = index_dir
+        self._sets = {}
+        self._changed = set()
+
+    def _path(self, month):
+        return os.path.join(self.index_dir, f'{month // 12}-{month % 12 + 1:02d}.npy')
+
+    def _get(self, month):
+        if month not in self._sets:
+            path = self._path(month) if self.index_dir else None
+            self._sets[month] = np.load(path) if path and os.path.exists(path) else np.empty(0, dtype='int64')
+        return self._sets[month]
+
+    def seen(self, fingerprints, created_at):
+        """Máscara (alinhada a fingerprints) das impressões que já estão no índice"""
+        values = fingerprints.to_numpy()
+        found = np.zeros(len(values), dtype=bool)
+        for month, positions in _by_month(values, created_at):
+            known = self._get(month)
+            if len(known) > 0:
+                candidates = values[positions]
+                slots = np.minimum(np.searchsorted(known, candidates), len(known) - 1)
+                found[positions] = known[slots] == candidates
+        return pd.Series(found, index=fingerprints.index)
+
+    def add(self, fingerprints, created_at):
+        values = fingerprints.to_numpy()
+        for month, positions in _by_month(values, created_at):
+            self._sets[month] = np.union1d(self._get(month), values[positions])
+            self._changed.add(month)
+
+    def forget(self, created_at):
+        """Esvazia os meses de created_at, para meses que serão recarregados inteiros"""
+        for month, _ in _by_month(np.zeros(len(created_at)), created_at):
+            self._sets[month] = np.empty(0, dtype='int64')
+            self._changed.add(month)
+
+    def commit(self):
+        if not self.index_dir:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        for month in sorted(self._changed):
+            # Grava em um arquivo temporário e substitui, para nunca deixar um mês pela metade
+            path = self._path(month)
+            tmp_path = path[:-len('.npy')] + '.tmp.npy'
+            np.save(tmp_path, self._sets[month])
+            os.replace(tmp_path, path)
+        self._changed.clear()
+
+class DuplicateFilter:
+    """Descarta pedidos repetidos no mesmo bloco ou em blocos anteriores desta execução.
+
+    Roda depois da limpeza (created_at já convertido); os descartados contam como rows_duplicate.
+    """
+
+    def __init__(self, index=None):
+        self.index = index or FingerprintIndex(index_dir=None)
+
+    def __call__(self, df):
+        fingerprints = order_fingerprints(df)
+        duplicate = fingerprints.duplicated() | self.index.seen(fingerprints, df['created_at'])
+        self.index.add(fingerprints[~duplicate], df['created_at'][~duplicate])
+        record(rows_duplicate=int(duplicate.sum()))
+        return df[~duplicate]
@@ -0,0 +1,216 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from steps.manifest import SKIP_UNCHANGED, StageManifest
+
+# Tamanho de cada bloco transferido; arquivos maiores são enviados e lidos por faixas de bytes
+TRANSFER_CHUNK_SIZE = int(os.environ.get('SEVEN_TRANSFER_CHUNK_SIZE', str(4 * 1024 * 1024)))
+
+# Número de arquivos transferidos ao mesmo tempo
+TRANSFER_WORKERS = int(os.environ.get('SEVEN_TRANSFER_WORKERS', '8'))
+
+# Backend de armazenamento: 'azure' (Data Lake) ou 'local' (diretório, para testes e benchmarks)
+STORAGE_BACKEND = os.environ.get('SEVEN_STORAGE_BACKEND', 'azure')
+LOCAL_DATALAKE_DIR = os.environ.get('SEVEN_LOCAL_DATALAKE_DIR', os.path.join('data', 'datalake'))
+
+
+class LocalStorageBackend:
+    """Data Lake simulado em um diretório local, com a mesma interface do backend Azure"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, path):
+        return os.path.join(self.root, *path.strip('/').split('/'))
+
+    def size(self, path):
+        return os.path.getsize(self._path(path))
+
+    def read_range(self, path, offset, length):
+        with open(self._path(path), 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def create(self, path):
+        full_path = self._path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path + '.part', 'wb').close()
+
+    def append(self, path, data, offset):
+        with open(self._path(path) + '.part', 'r+b') as f:
+            f.seek(offset)
+            f.write(data)
+
+    def flush(self, path, length):
+        # Como no Data Lake, o arquivo só fica visível depois do flush
+        full_path = self._path(path)
+        os.replace(full_path + '.part', full_path)
+
+    def list(self, prefix):
+        directory = self._path(prefix)
+        return [f"{prefix.rstrip('/')}/{name}" for name in sorted(os.listdir(directory))
+                if os.path.isfile(os.path.join(directory, name)) and not name.endswith('.part')]
+
+
+class AzureDataLakeBackend:
+    """Backend Azure Data Lake Gen2; envia com append/flush e lê por faixas com download_file"""
+
+    def __init__(self, account_name, account_key, file_system_name):
+        from azure.storage.filedatalake import DataLakeServiceClient
+        service_client = DataLakeServiceClient(
+            account_url=f"https://{account_name}.dfs.core.windows.net",
+            credential=account_key
+        )
+        self.file_system_client = service_client.get_file_system_client(file_system=file_system_name)
+
+    def _file(self, path):
+        return self.file_system_client.get_file_client(path)
+
+    def size(self, path):
+        return self._file(path).get_file_properties().size
+
+    def read_range(self, path, offset, length):
+        return self._file(path).download_file(offset=offset, length=length).readall()
+
+    def create(self, path):
+        self._file(path).create_file()
+
+    def append(self, path, data, offset):
+        self._file(path).append_data(data, offset=offset, length=len(data))
+
+    def flush(self, path, length):
+        self._file(path).flush_data(length)
+
+    def list(self, prefix):
+        return [p.name for p in self.file_system_client.get_paths(path=prefix, recursive=False) if not p.is_directory]
+
+
+def storage_backend_from_env():
+    """Backend configurado por SEVEN_STORAGE_BACKEND (mesmas variáveis do notebook para o Azure)"""
+    if STORAGE_BACKEND == 'local':
+        return LocalStorageBackend(LOCAL_DATALAKE_DIR)
+    if STORAGE_BACKEND == 'azure':
+        return AzureDataLakeBackend(os.getenv("account_name"), os.getenv("account_key"),
+                                    os.getenv("file_system_name"))
+    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+
+class RangedReader(io.RawIOBase):
+    """Arquivo remoto lido sob demanda em faixas de chunk_size bytes, sem baixá-lo inteiro"""
+
+    def __init__(self, backend, path, chunk_size=None):
+        self.backend = backend
+        self.path = path
+        self.chunk_size = chunk_size or TRANSFER_CHUNK_SIZE
+        self.length = backend.size(path)
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.position >= self.length:
+            return 0
+        length = min(len(buffer), self.chunk_size, self.length - self.position)
+        data = self.backend.read_range(self.path, self.position, length)
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def open_remote(backend, path, chunk_size=None):
+    """Arquivo binário bufferizado para leitura em streaming (ex.: pd.read_csv)"""
+    chunk_size = chunk_size or TRANSFER_CHUNK_SIZE
+    return io.BufferedReader(RangedReader(backend, path, chunk_size), buffer_size=chunk_size)
+
+
+def upload_file(backend, local_path, dest_path, chunk_size=None):
+    """Envia um arquivo local em blocos, sem carregá-lo inteiro em memória; retorna os bytes enviados"""
+    chunk_size = chunk_size or TRANSFER_CHUNK_SIZE
+    backend.create(dest_path)
+    offset = 0
+    with open(local_path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            backend.append(dest_path, data, offset)
+            offset += len(data)
+    backend.flush(dest_path, offset)
+    return offset
+
+
+def upload_file_if_changed(backend, local_path, dest_path, chunk_size=None, manifest_dir=None):
+    """Envia o arquivo só se o conteúdo mudou desde o último envio bem-sucedido; retorna os bytes enviados"""
+    manifest = StageManifest(f'ingest_{os.path.basename(local_path)}', [local_path],
+                             params={'backend': type(backend).__name__, 'dest': dest_path}, manifest_dir=manifest_dir)
+    if manifest.unchanged():
+        return 0
+    size = upload_file(backend, local_path, dest_path, chunk_size)
+    manifest.commit()
+    return size
+
+
+def download_file(backend, path, local_path, chunk_size=None):
+    """Baixa um arquivo por faixas direto para o disco; retorna os bytes baixados"""
+    chunk_size = chunk_size or TRANSFER_CHUNK_SIZE
+    os.makedirs(os.path.dirname(local_path) or '.', exist_ok=True)
+    length = backend.size(path)
+    with open(local_path, 'wb') as f:
+        for offset in range(0, length, chunk_size):
+            f.write(backend.read_range(path, offset, min(chunk_size, length - offset)))
+    return length
+
+
+def read_csv_remote(backend, path, chunk_size=None, **read_csv_kwargs):
+    """Lê um CSV do Data Lake alimentando o parser por faixas; com chunksize retorna um iterador"""
+    return pd.read_csv(open_remote(backend, path, chunk_size), encoding='utf-8', **read_csv_kwargs)
+
+
+def _run_concurrently(fn, jobs, workers):
+    # jobs: {nome: argumentos}; o resultado mantém os nomes e falha se qualquer transferência falhar
+    with ThreadPoolExecutor(max_workers=workers or TRANSFER_WORKERS) as executor:
+        futures = {name: executor.submit(fn, *args) for name, args in jobs.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def upload_directory(backend, local_dir, dest_dir, workers=None, chunk_size=None, skip_unchanged=SKIP_UNCHANGED,
+                     manifest_dir=None):
+    """Envia todos os arquivos de local_dir para dest_dir em paralelo; retorna {arquivo: bytes}.
+
+    Com skip_unchanged, arquivos iguais aos do último envio não são reenviados (0 bytes).
+    """
+    file_names = [f for f in sorted(os.listdir(local_dir)) if os.path.isfile(os.path.join(local_dir, f))]
+    jobs = {name: (backend, os.path.join(local_dir, name), f"{dest_dir}/{name}", chunk_size) for name in file_names}
+    if skip_unchanged:
+        jobs = {name: args + (manifest_dir,) for name, args in jobs.items()}
+        return _run_concurrently(upload_file_if_changed, jobs, workers)
+    return _run_concurrently(upload_file, jobs, workers)
+
+
+def download_files(backend, paths, local_dir, workers=None, chunk_size=None):
+    """Baixa os arquivos em paralelo para local_dir; retorna {arquivo: bytes}"""
+    jobs = {os.path.basename(p): (backend, p, os.path.join(local_dir, os.path.basename(p)), chunk_size)
+            for p in paths}
+    return _run_concurrently(download_file, jobs, workers)
+
+
+def read_csv_files(backend, paths, workers=None, chunk_size=None, **read_csv_kwargs):
+    """Lê vários CSVs do Data Lake em paralelo, cada um em streaming; retorna {arquivo: DataFrame}"""
+    jobs = {os.path.basename(p): (backend, p, chunk_size) for p in paths}
+    return _run_concurrently(lambda *args: read_csv_remote(*args, **read_csv_kwargs), jobs, workers)
+
+
+if __name__ == '__main__':
+    # Mesmo fluxo do notebook: envia local_file_path para dest_file_path e lê os CSVs de volta
+    local_file_path = os.getenv("local_file_path")
+    dest_file_path = os.getenv("dest_file_path")
+    backend = storage_backend_from_env()
+
+    for file_name, size in upload_directory(backend, local_file_path, dest_file_path).items():
+        print(f"{file_name} enviado com sucesso! ({size} bytes)")
+
+    remote_files = [p for p in backend.list(dest_file_path) if p.endswith('.csv')]
+    for file_name, df in read_csv_files(backend, remote_files).items():
+        print(f"{file_name} em memória: {len(df)} linhas")
@@ -0,0 +1,108 @@
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import resource
+import threading
+import time
+
+# Cada etapa instrumentada emite uma linha JSON neste logger ao terminar, com ou sem erro
+logger = logging.getLogger('seven.metrics')
+
+# Contadores que as funções de uma etapa somam com record()
+COUNTERS = ('rows_in', 'rows_out', 'rows_rejected', 'rows_duplicate', 'bytes_read', 'bytes_written')
+
+# Métricas da etapa em execução; cada thread tem o seu contexto, então etapas paralelas não se misturam
+_current_stage = contextvars.ContextVar('seven_current_stage', default=None)
+
+def peak_rss_mb():
+    """Pico de memória residente do processo (VmHWM no Linux, ru_maxrss nos demais)"""
+    try:
+        with open('/proc/self/status') as status:
+            return next(int(line.split()[1]) for line in status if line.startswith('VmHWM')) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.isfile(path) else 0
+
+class StageMetrics:
+    """Tempo, CPU, linhas, bytes e pico de memória de uma execução de etapa"""
+
+    def __init__(self, stage, labels=None):
+        self.stage = stage
+        self.labels = labels or {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.status = 'running'
+        self.error = None
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_mb = None
+        # Threads de uma mesma etapa (ex.: streaming) somam contadores ao mesmo tempo
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                if name not in self.counters:
+                    raise ValueError(f"Unknown counter: {name}")
+                self.counters[name] += int(value)
+
+    def as_dict(self):
+        metrics = {'stage': self.stage, **self.labels, 'status': self.status, 'wall_s': self.wall_s,
+                   'cpu_s': self.cpu_s, 'peak_rss_mb': self.peak_rss_mb, **self.counters}
+        if self.error is not None:
+            metrics['error'] = self.error
+        return metrics
+
+def record(**counts):
+    """Soma contadores à etapa em execução; fora de uma etapa instrumentada não faz nada"""
+    metrics = _current_stage.get()
+    if metrics is not None:
+        metrics.add(**counts)
+
+@contextlib.contextmanager
+def instrument(stage, **labels):
+    """Mede o bloco como a etapa stage e emite as métricas em JSON ao sair, mesmo com erro.
+
+    labels (ex.: partition) identificam a execução no log; os que forem None são omitidos.
+
+    O tempo de CPU e o pico de memória são do processo: etapas que rodam em paralelo
+    no mesmo processo enxergam o consumo umas das outras.
+    """
+    metrics = StageMetrics(stage, {name: value for name, value in labels.items() if value is not None})
+    token = _current_stage.set(metrics)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield metrics
+        metrics.status = 'success'
+    except Exception as e:
+        metrics.status = 'failed'
+        metrics.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        metrics.wall_s = round(time.perf_counter() - wall_start, 6)
+        metrics.cpu_s = round(time.process_time() - cpu_start, 6)
+        metrics.peak_rss_mb = round(peak_rss_mb(), 1)
+        _current_stage.reset(token)
+        logger.info(json.dumps(metrics.as_dict()))
+
+def instrumented(func):
+    """Decorador que mede a função como uma etapa com o nome dela.
+
+    Em uma tarefa do Airflow (quando recebe ti), as métricas também vão para o XCom na chave 'metrics',
+    com a partição da tarefa, quando houver.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        ti = kwargs.get('ti')
+        metrics = None
+        try:
+            with instrument(func.__name__, partition=kwargs.get('partition')) as metrics:
+                return func(*args, **kwargs)
+        finally:
+            if ti is not None and metrics is not None:
+                ti.xcom_push(key='metrics', value=metrics.as_dict())
+    return wrapper
@@ -0,0 +1,86 @@
+import hashlib
+import json
+import os
+
+# Manifesto de cada etapa (ingest, process, load, report): hash, tamanho e mtime das entradas
+# e saídas da última execução bem-sucedida. Um arquivo por etapa, para que tarefas
+# paralelas nunca gravem o mesmo arquivo.
+MANIFEST_DIR = os.path.join('data', 'desafio', 'state', 'manifest')
+
+# Pula etapas cujas entradas não mudaram desde a última execução bem-sucedida
+SKIP_UNCHANGED = os.environ.get('SEVEN_SKIP_UNCHANGED', '0') == '1'
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fingerprint(path, previous=None):
+    """Hash, tamanho e mtime do arquivo; o hash anterior é reaproveitado se tamanho e mtime não mudaram"""
+    stat = os.stat(path)
+    if previous and previous['size'] == stat.st_size and previous['mtime'] == stat.st_mtime_ns:
+        return dict(previous)
+    return {'hash': file_hash(path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+class StageManifest:
+    """Detecta se as entradas de uma etapa mudaram e registra a execução bem-sucedida.
+
+    params guarda opções que mudam o resultado (ex.: modo incremental); se mudarem,
+    a etapa roda de novo. As saídas também são conferidas, para que uma saída apagada
+    ou alterada por fora force a execução.
+    """
+
+    def __init__(self, stage, inputs, outputs=(), params=None, manifest_dir=None):
+        self.stage = stage
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = json.loads(json.dumps(params or {}))
+        self.path = os.path.join(manifest_dir or MANIFEST_DIR, f'{stage}.json')
+        self.previous = self._load()
+        self.current_inputs = None
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _fingerprints(self, paths, recorded):
+        return {path: fingerprint(path, recorded.get(path)) for path in paths}
+
+    def unchanged(self):
+        # As impressões das entradas são tiradas antes da etapa rodar e gravadas no commit
+        recorded = self.previous or {'inputs': {}, 'outputs': {}}
+        self.current_inputs = self._fingerprints(self.inputs, recorded['inputs'])
+        if self.previous is None or self.previous['params'] != self.params:
+            return False
+        if self._hashes(self.current_inputs) != self._hashes(recorded['inputs']):
+            return False
+        if any(not os.path.exists(path) for path in self.outputs):
+            return False
+        current_outputs = self._fingerprints(self.outputs, recorded['outputs'])
+        return self._hashes(current_outputs) == self._hashes(recorded['outputs'])
+
+    @staticmethod
+    def _hashes(fingerprints):
+        return {path: fp['hash'] for path, fp in fingerprints.items()}
+
+    def commit(self):
+        # Só grava depois que as saídas da etapa foram gravadas com sucesso
+        recorded = self.previous or {'inputs': {}, 'outputs': {}}
+        inputs = self.current_inputs or self._fingerprints(self.inputs, recorded['inputs'])
+        manifest = {
+            'params': self.params,
+            'inputs': inputs,
+            'outputs': self._fingerprints(self.outputs, recorded['outputs']),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.path)
+        self.previous = manifest
@@ -0,0 +1,321 @@
+from steps.b_clean_trasform import validate_clean_email_series, validate_clean_cpf_series
+from steps.fingerprints import DuplicateFilter
+from steps.instrumentation import file_size, instrumented, record
+from steps.manifest import SKIP_UNCHANGED, StageManifest
+from steps.processed_layer import ProcessedWriter, iter_processed, processed_path
+from steps.reports import (REPORT_SPECS, build_reports, combine_partials, finalize_reports, fold_partials,
+                           load_report_state, required_columns, save_report_state)
+from steps.schemas import csv_dtypes, parse_datetimes
+from steps.sharding import PROCESS_SHARDS, process_csv_sharded
+from steps.watermarks import WatermarkFilter
+import pandas as pd
+import os
+
+# Task callables of the seven_etl_pipeline DAG. dags/pipeline_airflow.py only references them by
+# name, so the scheduler parses the DAG file without importing pandas or the cleaning code.
+
+# Rows per chunk when streaming the raw files; None processes each file in one shot
+PROCESS_CHUNKSIZE = int(os.environ.get('SEVEN_PROCESS_CHUNKSIZE', '0')) or None
+
+# Incremental mode: only rows newer than the persisted watermark of each source are processed
+INCREMENTAL = os.environ.get('SEVEN_INCREMENTAL', '0') == '1'
+
+# Drop orders whose fingerprint (user_id, created_at, items, total) repeats an order seen earlier in
+# the same run, as when upstream re-sends overlapping extracts in one file
+DEDUP_ORDERS = os.environ.get('SEVEN_DEDUP_ORDERS', '0') == '1'
+
+# In incremental mode reports fold each run's orders into per-day partial aggregates kept here;
+# SEVEN_REPORTS_REBUILD=1 recomputes that state from the whole order history instead. In the DAG each
+# partition saves its own aggregates under ds=YYYY-MM-DD, and fold_reports combines them here
+REPORTS_STATE_DIR = os.path.join('data', 'desafio', 'state', 'reports')
+REPORTS_REBUILD = os.environ.get('SEVEN_REPORTS_REBUILD', '0') == '1'
+
+# Cleaning functions, applied to a whole file or to each chunk of it
+def drop_incomplete(df):
+    """Drop rows with a missing field, counting them as rejected"""
+    complete = df.dropna()
+    record(rows_rejected=len(df) - len(complete))
+    return complete
+
+def clean_user_data(user_raw):
+    """Clean and standardize a frame of raw user rows"""
+    user_raw = drop_incomplete(user_raw)
+    user_raw['name'] = user_raw['name'].str.title()
+    user_raw['e-mail'] = validate_clean_email_series(user_raw['e-mail'])
+    user_raw['cpf'] = validate_clean_cpf_series(user_raw['cpf'])
+    return user_raw
+
+def clean_product_data(produtos_raw):
+    """Clean and standardize a frame of raw product rows"""
+    produtos_raw = drop_incomplete(produtos_raw)
+    produtos_raw['name'] = produtos_raw['name'].str.title()
+    produtos_raw['description'] = produtos_raw['description'].str.capitalize()
+    return produtos_raw
+
+def clean_order_data(pedidos_raw):
+    """Clean a frame of raw order rows and convert its date columns"""
+    pedidos_raw = drop_incomplete(pedidos_raw)
+    # Every timestamp column of the schema, parsed with its explicit format
+    return parse_datetimes(pedidos_raw, 'pedidos_raw')
+
+def process_csv(input_path, processed_dir, name, clean, chunksize=None, fmt=None, source=None, shards=1,
+                watermark=None, dedup=None):
+    """Read input_path, apply clean and write the processed file, chunk by chunk when chunksize is set.
+
+    source names input_path's entry in the schema registry, which gives the read dtypes. A watermark
+    filters each chunk before clean, dedup filters each cleaned chunk. With shards > 1 the file is split
+    into byte ranges cleaned in a process pool, so clean must be a module-level function.
+    """
+    record(bytes_read=file_size(input_path))
+    dtype = csv_dtypes(source) if source else None
+    if shards > 1:
+        output_path = process_csv_sharded(input_path, processed_dir, name, clean, shards, fmt, chunksize, dtype,
+                                          watermark, dedup=dedup)
+        record(bytes_written=file_size(output_path))
+        return
+    
+    if watermark is not None:
+        clean = incremental_clean(clean, watermark)
+    if dedup is not None:
+        clean = deduplicated_clean(clean, dedup)
+    with ProcessedWriter(processed_dir, name, fmt) as writer:
+        if not chunksize:
+            chunks = [pd.read_csv(input_path, sep=",", encoding="utf-8", dtype=dtype)]
+        else:
+            # Streaming mode: only one chunk is held in memory at a time
+            chunks = pd.read_csv(input_path, sep=",", encoding="utf-8", dtype=dtype, chunksize=chunksize)
+        for chunk in chunks:
+            cleaned = clean(chunk)
+            writer.write(cleaned)
+            record(rows_in=len(chunk), rows_out=len(cleaned))
+    record(bytes_written=file_size(writer.path))
+
+def incremental_clean(clean, watermark):
+    """Apply the watermark filter before the cleaning function"""
+    return lambda df: clean(watermark(df))
+
+def deduplicated_clean(clean, dedup):
+    """Apply the duplicate filter after the cleaning function"""
+    return lambda df: dedup(clean(df))
+
+def counted(chunks):
+    """Pass chunks through, counting their rows as the stage's input"""
+    for chunk in chunks:
+        record(rows_in=len(chunk))
+        yield chunk
+
+def order_history(columns, chunksize=None, dedup=DEDUP_ORDERS):
+    """Every raw order, cleaned as process_order_data does but ignoring the orders watermark.
+
+    In incremental mode the processed fato_orders only holds the last delta, so rebuilding the reports
+    state reads the full history from the raw file instead.
+    """
+    order_file_path = os.path.join('data', 'desafio', 'raw', 'pedidos_raw.csv')
+    record(bytes_read=file_size(order_file_path))
+    chunks = pd.read_csv(order_file_path, sep=",", encoding="utf-8", dtype=csv_dtypes('pedidos_raw'),
+                         chunksize=chunksize)
+    clean = deduplicated_clean(clean_order_data, DuplicateFilter()) if dedup else clean_order_data
+    for chunk in (chunks if chunksize else [chunks]):
+        yield clean(chunk)[columns]
+
+def stage_manifest(stage, inputs, outputs, skip_unchanged, partition=None, **params):
+    """Change detection for a task, or None when SEVEN_SKIP_UNCHANGED is off; one manifest per partition"""
+    if not skip_unchanged:
+        return None
+    return StageManifest(f'{stage}_ds={partition}' if partition else stage, inputs, outputs, params=params)
+
+def partition_dir(base_dir, partition=None):
+    """base_dir/ds=YYYY-MM-DD for a date partition, base_dir itself otherwise"""
+    return os.path.join(base_dir, f'ds={partition}') if partition else base_dir
+
+def list_partitions(ds=None, params=None, **kwargs):
+    """Partitions with raw data in the lookback window ending at ds, as op_kwargs for the mapped tasks"""
+    lookback_days = int((params or {}).get('lookback_days', 1))
+    raw_dir = os.path.join('data', 'desafio', 'raw')
+    end = pd.Timestamp(ds)
+    days = pd.date_range(end - pd.Timedelta(days=lookback_days - 1), end, freq='D').strftime('%Y-%m-%d')
+    return [{'partition': day} for day in days if os.path.isdir(partition_dir(raw_dir, day))]
+
+# Task functions
+@instrumented
+def process_user_data(chunksize=PROCESS_CHUNKSIZE, incremental=INCREMENTAL, skip_unchanged=SKIP_UNCHANGED,
+                      shards=PROCESS_SHARDS, partition=None, **kwargs):
+    """Process and clean user data, of one date partition when partition is set"""
+    # In a real scenario, you would read from a file or database
+    # For this example, we'll assume the file exists in a data directory
+    data_dir = partition_dir(os.path.join('data', 'desafio', 'raw'), partition)
+    user_file_path = os.path.join(data_dir, 'user_raw.csv')
+    processed_dir = partition_dir(os.path.join('data', 'desafio', 'processed'), partition)
+    
+    # A partition holds only that day's data, so it needs no watermark; days without user data are skipped
+    if partition:
+        incremental = False
+        if not os.path.exists(user_file_path):
+            return f"No user data for {partition}, processing skipped"
+    
+    # Skip the task when the raw file and the processed output are the same as on the last successful run
+    manifest = stage_manifest('process_user_data', [user_file_path], [processed_path(processed_dir, 'dim_users')],
+                              skip_unchanged, partition, incremental=incremental)
+    if manifest and manifest.unchanged():
+        return "User data unchanged, processing skipped"
+    
+    # Users are upserted, so rows updated on the watermark day are reprocessed
+    watermark = WatermarkFilter('users', 'update_date', inclusive=True) if incremental else None
+    
+    # Clean, standardize and save processed data
+    process_csv(user_file_path, processed_dir, 'dim_users', clean_user_data, chunksize, source='user_raw',
+                shards=shards, watermark=watermark)
+    
+    if incremental:
+        watermark.commit()
+    if manifest:
+        manifest.commit()
+    
+    return "User data processing completed"
+
+@instrumented
+def process_product_data(chunksize=PROCESS_CHUNKSIZE, skip_unchanged=SKIP_UNCHANGED, shards=PROCESS_SHARDS,
+                         partition=None, **kwargs):
+    """Process and clean product data, of one date partition when partition is set"""
+    data_dir = partition_dir(os.path.join('data', 'desafio', 'raw'), partition)
+    product_file_path = os.path.join(data_dir, 'produtos_raw.csv')
+    processed_dir = partition_dir(os.path.join('data', 'desafio', 'processed'), partition)
+    
+    if partition and not os.path.exists(product_file_path):
+        return f"No product data for {partition}, processing skipped"
+    
+    manifest = stage_manifest('process_product_data', [product_file_path],
+                              [processed_path(processed_dir, 'dim_produtos')], skip_unchanged, partition)
+    if manifest and manifest.unchanged():
+        return "Product data unchanged, processing skipped"
+    
+    # Clean, standardize and save processed data
+    process_csv(product_file_path, processed_dir, 'dim_produtos', clean_product_data, chunksize,
+                source='produtos_raw', shards=shards)
+    
+    if manifest:
+        manifest.commit()
+    
+    return "Product data processing completed"
+
+@instrumented
+def process_order_data(chunksize=PROCESS_CHUNKSIZE, incremental=INCREMENTAL, skip_unchanged=SKIP_UNCHANGED,
+                       shards=PROCESS_SHARDS, dedup=DEDUP_ORDERS, partition=None, **kwargs):
+    """Process and clean order data, of one date partition when partition is set"""
+    data_dir = partition_dir(os.path.join('data', 'desafio', 'raw'), partition)
+    order_file_path = os.path.join(data_dir, 'pedidos_raw.csv')
+    processed_dir = partition_dir(os.path.join('data', 'desafio', 'processed'), partition)
+    
+    if partition:
+        incremental = False
+        if not os.path.exists(order_file_path):
+            return f"No order data for {partition}, processing skipped"
+    
+    manifest = stage_manifest('process_order_data', [order_file_path], [processed_path(processed_dir, 'fato_orders')],
+                              skip_unchanged, partition, incremental=incremental, dedup=dedup)
+    if manifest and manifest.unchanged():
+        return "Order data unchanged, processing skipped"
+    
+    watermark = WatermarkFilter('orders', 'created_at') if incremental else None
+    
+    # Clean, convert date columns, drop re-delivered orders and save processed data
+    process_csv(order_file_path, processed_dir, 'fato_orders', clean_order_data, chunksize, source='pedidos_raw',
+                shards=shards, watermark=watermark, dedup=DuplicateFilter() if dedup else None)
+    
+    if incremental:
+        watermark.commit()
+    if manifest:
+        manifest.commit()
+    
+    return "Order data processing completed"
+
+@instrumented
+def generate_reports(chunksize=PROCESS_CHUNKSIZE, incremental=INCREMENTAL, rebuild=REPORTS_REBUILD,
+                     skip_unchanged=SKIP_UNCHANGED, partition=None, **kwargs):
+    """Generate business reports from processed data, of one date partition when partition is set"""
+    processed_dir = partition_dir(os.path.join('data', 'desafio', 'processed'), partition)
+    reports_dir = partition_dir(os.path.join('data', 'desafio', 'reports'), partition)
+    report_files = [os.path.join(reports_dir, f'{name}.csv') for name in REPORT_SPECS]
+    
+    # A partition's reports cover that day only, rebuilt from its processed orders; its aggregates are
+    # saved for fold_reports, so rerunning a partition replaces its share of the history-wide reports
+    state_dir = partition_dir(REPORTS_STATE_DIR, partition)
+    if partition:
+        incremental = False
+        report_files += [os.path.join(state_dir, f'{name}.parquet') for name in REPORT_SPECS]
+        if not os.path.exists(processed_path(processed_dir, 'fato_orders')):
+            return f"No processed orders for {partition}, reports skipped"
+    
+    # A rebuild always runs; otherwise unchanged processed orders give the same reports
+    manifest = stage_manifest('generate_reports', [processed_path(processed_dir, 'fato_orders')], report_files,
+                              skip_unchanged, partition, incremental=incremental, specs=REPORT_SPECS)
+    if manifest and not rebuild and manifest.unchanged():
+        return "Processed orders unchanged, reports skipped"
+    
+    # Every report in REPORT_SPECS is built in a single pass over the order columns they use,
+    # chunk by chunk when chunksize is set
+    columns = required_columns(REPORT_SPECS)
+    if incremental and rebuild:
+        chunks = counted(order_history(columns, chunksize))
+    else:
+        chunks = iter_processed(processed_dir, 'fato_orders', columns=columns, chunksize=chunksize)
+        chunks = counted(chunks)
+        record(bytes_read=file_size(processed_path(processed_dir, 'fato_orders')))
+    
+    if incremental:
+        # Fold only orders newer than the last folded created_at into the saved state,
+        # so rerunning the task on the same delta doesn't count it twice; a rebuild starts
+        # over from the full order history
+        state = None if rebuild else load_report_state(REPORTS_STATE_DIR, REPORT_SPECS)
+        watermark = WatermarkFilter('reports', 'created_at', reset=rebuild or state is None)
+        partials = fold_partials((watermark(chunk) for chunk in chunks), REPORT_SPECS, state, by_day=True)
+        save_report_state(partials, REPORTS_STATE_DIR)
+        watermark.commit()
+        reports = finalize_reports(partials, REPORT_SPECS)
+    elif partition:
+        partials = fold_partials(chunks, REPORT_SPECS, by_day=True)
+        save_report_state(partials, state_dir)
+        reports = finalize_reports(partials, REPORT_SPECS)
+    else:
+        reports = build_reports(chunks, REPORT_SPECS)
+    
+    write_reports(reports, reports_dir)
+    
+    if manifest:
+        manifest.commit()
+    
+    return "Reports generated successfully"
+
+@instrumented
+def fold_reports(**kwargs):
+    """Fold the aggregates saved by every partition into the report state and write the history-wide reports"""
+    partition_dirs = []
+    if os.path.isdir(REPORTS_STATE_DIR):
+        partition_dirs = sorted(entry.path for entry in os.scandir(REPORTS_STATE_DIR)
+                                if entry.is_dir() and entry.name.startswith('ds='))
+    partials = combine_partials([load_report_state(path, REPORT_SPECS) for path in partition_dirs], REPORT_SPECS,
+                                by_day=True)
+    save_report_state(partials, REPORTS_STATE_DIR)
+    write_reports(finalize_reports(partials, REPORT_SPECS), os.path.join('data', 'desafio', 'reports'))
+    return f"Reports of {len(partition_dirs)} partitions folded"
+
+def load_partition(partition=None, **kwargs):
+    """Load the processed files of one date partition into PostgreSQL, the flat layout when partition is None"""
+    # Imported when the task runs, so the processing tasks don't need the database drivers
+    import load_data_to_postgres as loader
+    
+    engine = loader.get_engine(pool_size=loader.LOADER_POOL_SIZE)
+    try:
+        loader.run_loader(engine, partition=partition)
+    finally:
+        engine.dispose()
+    return f"Partition {partition} loaded" if partition else "Data loaded"
+
+def write_reports(reports, reports_dir):
+    """Save each report as reports_dir/<name>.csv"""
+    os.makedirs(reports_dir, exist_ok=True)
+    
+    for name, report in reports.items():
+        report_file = os.path.join(reports_dir, f'{name}.csv')
+        report.to_csv(report_file, index=False)
+        record(rows_out=len(report), bytes_written=file_size(report_file))
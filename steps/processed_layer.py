@@ -0,0 +1,131 @@
+import os
+import pandas as pd
+from steps.schemas import SCHEMAS, csv_dtypes, parse_datetimes
+
+# Formato da camada processed: 'csv' (padrão, compatível) ou 'parquet'
+PROCESSED_FORMAT = os.environ.get('SEVEN_PROCESSED_FORMAT', 'csv')
+
+FILE_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet'}
+
+# Schema explícito de cada arquivo processed (do registro em steps/schemas.py), usado na escrita em Parquet
+PROCESSED_SCHEMAS = {name: SCHEMAS[name] for name in ('dim_users', 'dim_produtos', 'fato_orders')}
+
+# Caminho do arquivo processed para o formato escolhido
+def processed_path(processed_dir, name, fmt=None):
+    fmt = fmt or PROCESSED_FORMAT
+    if fmt not in FILE_EXTENSIONS:
+        raise ValueError(f"Unknown processed format: {fmt}")
+    return os.path.join(processed_dir, name + FILE_EXTENSIONS[fmt])
+
+def _arrow_type(kind):
+    import pyarrow as pa
+    return {
+        'id': pa.int32(),
+        'int': pa.int32(),
+        'string': pa.string(),
+        'time': pa.string(),
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'date': pa.date32(),
+        'timestamp': pa.timestamp('us'),
+        'decimal': pa.decimal128(10, 2),
+    }[kind]
+
+def arrow_schema(name):
+    import pyarrow as pa
+    return pa.schema([(col, _arrow_type(kind)) for col, kind in PROCESSED_SCHEMAS[name].items()])
+
+# Converte um DataFrame limpo para uma tabela Arrow com o schema explícito
+def to_arrow_table(df, name):
+    import pyarrow as pa
+    arrays = []
+    for col, kind in PROCESSED_SCHEMAS[name].items():
+        values = df[col]
+        if kind in ('date', 'timestamp'):
+            array = pa.array(pd.to_datetime(values, errors='coerce'), type=pa.timestamp('us'), from_pandas=True)
+            if kind == 'date':
+                array = array.cast(pa.date32(), safe=False)
+        elif kind == 'decimal':
+            array = pa.array(values.astype('float64').round(2), from_pandas=True).cast(_arrow_type(kind))
+        elif kind == 'category':
+            array = pa.array(values.astype(object), type=pa.string(), from_pandas=True).dictionary_encode()
+        elif kind in ('string', 'time'):
+            array = pa.array(values.astype(object), type=pa.string(), from_pandas=True)
+        else:
+            array = pa.array(values, type=_arrow_type(kind), from_pandas=True)
+        arrays.append(array)
+    return pa.Table.from_arrays(arrays, schema=arrow_schema(name))
+
+class ProcessedWriter:
+    """Grava DataFrames limpos em um arquivo processed, de uma vez ou em blocos"""
+
+    def __init__(self, processed_dir, name, fmt=None):
+        self.name = name
+        self.fmt = fmt or PROCESSED_FORMAT
+        self.path = processed_path(processed_dir, name, self.fmt)
+        self._parquet_writer = None
+        self._rows_written = 0
+        os.makedirs(processed_dir, exist_ok=True)
+
+    def write(self, df):
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, arrow_schema(self.name))
+            self._parquet_writer.write_table(to_arrow_table(df, self.name))
+        else:
+            first = self._rows_written == 0
+            df.to_csv(self.path, index=False, mode='w' if first else 'a', header=first,
+                      date_format='%Y-%m-%d %H:%M:%S')
+        self._rows_written += len(df)
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Converte uma tabela Arrow para pandas; decimais ficam exatos no arquivo e viram float64 para agregação
+def _table_to_pandas(table):
+    import pyarrow as pa
+    decimal_scales = {}
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            decimal_scales[field.name] = field.type.scale
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+    df = table.to_pandas()
+    for col, scale in decimal_scales.items():
+        df[col] = df[col].round(scale)
+    return df
+
+# Lê um arquivo processed carregando apenas as colunas pedidas
+def read_processed(processed_dir, name, columns=None, fmt=None, parse_dates=None):
+    fmt = fmt or PROCESSED_FORMAT
+    path = processed_path(processed_dir, name, fmt)
+    if fmt == 'csv':
+        df = pd.read_csv(path, usecols=columns, dtype=csv_dtypes(name, columns))
+        return parse_datetimes(df, name, parse_dates) if parse_dates is not None else df
+
+    import pyarrow.parquet as pq
+    return _table_to_pandas(pq.read_table(path, columns=columns))
+
+# Lê um arquivo processed em blocos de chunksize linhas (ou inteiro, sem chunksize)
+def iter_processed(processed_dir, name, columns=None, fmt=None, chunksize=None):
+    fmt = fmt or PROCESSED_FORMAT
+    if not chunksize:
+        yield read_processed(processed_dir, name, columns, fmt)
+        return
+
+    path = processed_path(processed_dir, name, fmt)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, usecols=columns, dtype=csv_dtypes(name, columns), chunksize=chunksize)
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+        yield _table_to_pandas(pa.Table.from_batches([batch]))
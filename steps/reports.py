@@ -0,0 +1,175 @@
+import os
+import pandas as pd
+from steps.schemas import parse_datetime
+
+# Relatórios declarados como especificações. Todos são calculados em uma única
+# leitura das colunas necessárias, bloco a bloco, com agregados combináveis:
+#   key       coluna de agrupamento
+#   transform 'month' (created_at -> mês) ou 'items' (uma linha por produto do texto items)
+#   agg       'count', 'sum' ou 'mean' (mantida como soma e contagem até o final)
+#   value     coluna somada ou média (sum/mean)
+#   output    nome da coluna do resultado
+#   sort_descending  ordena pelo resultado, do maior para o menor (opcional)
+#   limit     número máximo de linhas (opcional)
+#   daily_state      False para não separar o estado persistido por dia; use em chaves
+#                    de alta cardinalidade, em que dia x chave cresceria como os pedidos
+REPORT_SPECS = {
+    'orders_by_month': {'key': 'created_at', 'transform': 'month', 'agg': 'count', 'output': 'count'},
+    'revenue_by_payment': {'key': 'payment_method', 'agg': 'sum', 'value': 'total', 'output': 'total'},
+    'orders_by_status': {'key': 'shipping_status', 'agg': 'count', 'output': 'count'},
+    'avg_ticket_by_customer': {'key': 'user_id', 'agg': 'mean', 'value': 'total', 'output': 'ticket_medio',
+                               'sort_descending': True, 'daily_state': False},
+    'top_products': {'key': 'items', 'transform': 'items', 'agg': 'count', 'output': 'quantity',
+                     'sort_descending': True, 'limit': 10},
+}
+
+# Colunas de estado de cada agregação; todas são somadas ao combinar blocos
+STATE_COLUMNS = {'count': ['count'], 'sum': ['sum'], 'mean': ['sum', 'count']}
+
+# Nível do índice com o dia do pedido nos agregados persistidos
+DAY_LEVEL = 'day'
+
+def required_columns(specs=None):
+    specs = specs or REPORT_SPECS
+    columns = []
+    for spec in specs.values():
+        for col in (spec['key'], spec.get('value')):
+            if col is not None and col not in columns:
+                columns.append(col)
+    return columns
+
+def _key_and_values(chunk, spec):
+    key = chunk[spec['key']]
+    values = chunk[spec['value']] if spec.get('value') else None
+    if spec.get('transform') == 'month':
+        key = parse_datetime(key, 'fato_orders', spec['key']).dt.to_period('M')
+    elif spec.get('transform') == 'items':
+        key = key.str.split(',').explode().str.strip().rename('item_name')
+        key = key[key.notna() & (key != '')]
+    return key, values
+
+def _plain_level(level):
+    # Chaves categóricas (Parquet) e períodos viram valores simples, que combinam entre
+    # blocos com categorias diferentes e podem ser persistidos
+    if isinstance(level, pd.CategoricalIndex):
+        return pd.Index(level.astype(level.categories.dtype), name=level.name)
+    if isinstance(level, pd.PeriodIndex):
+        return level.astype(str)
+    return level
+
+def _plain_index(index):
+    if isinstance(index, pd.MultiIndex):
+        return index.set_levels([_plain_level(level) for level in index.levels])
+    return _plain_level(index)
+
+# Agregados parciais de um bloco para todos os relatórios; by_day separa cada chave pelo dia do pedido
+def partial_aggregates(chunk, specs=None, by_day=False):
+    specs = specs or REPORT_SPECS
+    day = None
+    if by_day:
+        day = parse_datetime(chunk['created_at'], 'fato_orders', 'created_at').dt.to_period('D').rename(DAY_LEVEL)
+    partials = {}
+    for name, spec in specs.items():
+        key, values = _key_and_values(chunk, spec)
+        groups = key
+        if by_day and spec.get('daily_state', True):
+            # key pode ter linhas repetidas (transform 'items'); o dia acompanha o índice original
+            groups = [day.reindex(key.index), key]
+        state = {}
+        if spec['agg'] == 'count':
+            state['count'] = key.groupby(groups, observed=True, sort=False).size()
+        else:
+            grouped = values.groupby(groups, observed=True, sort=False)
+            state['sum'] = grouped.sum()
+            if spec['agg'] == 'mean':
+                state['count'] = grouped.count()
+        state = pd.DataFrame(state)[STATE_COLUMNS[spec['agg']]]
+        state.index = _plain_index(state.index)
+        partials[name] = state
+    return partials
+
+# Combina dois conjuntos de agregados parciais
+def merge_partials(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    merged = {}
+    for name in right:
+        merged[name] = left[name].add(right[name], fill_value=0)
+    return merged
+
+# Transforma os agregados em relatórios finais
+def finalize_reports(partials, specs=None):
+    specs = specs or REPORT_SPECS
+    reports = {}
+    for name, spec in specs.items():
+        state = partials[name]
+        # Estado por dia: soma os dias de cada chave
+        if DAY_LEVEL in state.index.names:
+            state = state.groupby(level=[n for n in state.index.names if n != DAY_LEVEL]).sum()
+        if spec['agg'] == 'count':
+            metric = state['count'].astype('int64')
+        elif spec['agg'] == 'sum':
+            metric = state['sum']
+        else:
+            metric = state['sum'] / state['count']
+        report = metric.rename(spec['output']).sort_index()
+        if spec.get('sort_descending'):
+            report = report.sort_values(ascending=False, kind='stable')
+        if 'limit' in spec:
+            report = report.head(spec['limit'])
+        reports[name] = report.reset_index()
+    return reports
+
+def _empty_partials(specs, by_day=False):
+    columns = required_columns(specs)
+    if 'created_at' not in columns:
+        columns.append('created_at')
+    return partial_aggregates(pd.DataFrame(columns=columns), specs, by_day)
+
+# Agrega todos os blocos em uma única passagem, somando ao estado anterior quando houver
+def fold_partials(chunks, specs=None, state=None, by_day=False):
+    specs = specs or REPORT_SPECS
+    partials = state
+    for chunk in chunks:
+        partials = merge_partials(partials, partial_aggregates(chunk, specs, by_day))
+    return partials if partials is not None else _empty_partials(specs, by_day)
+
+# Combina de uma vez vários conjuntos de agregados parciais, como os salvos por partição
+def combine_partials(partials_list, specs=None, by_day=False):
+    specs = specs or REPORT_SPECS
+    partials_list = [partials for partials in partials_list if partials is not None]
+    if not partials_list:
+        return _empty_partials(specs, by_day)
+    combined = {}
+    for name in specs:
+        state = pd.concat([partials[name] for partials in partials_list])
+        combined[name] = state.groupby(level=list(range(state.index.nlevels))).sum()
+    return combined
+
+# Calcula todos os relatórios em uma única passagem pelos blocos
+def build_reports(chunks, specs=None):
+    specs = specs or REPORT_SPECS
+    return finalize_reports(fold_partials(chunks, specs), specs)
+
+# Persistência do estado incremental: um Parquet por relatório com as chaves como colunas
+def save_report_state(partials, state_dir):
+    os.makedirs(state_dir, exist_ok=True)
+    for name, state in partials.items():
+        path = os.path.join(state_dir, f'{name}.parquet')
+        state.reset_index().to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+def load_report_state(state_dir, specs=None):
+    """Estado salvo de cada relatório, ou None se ainda não houver estado completo"""
+    specs = specs or REPORT_SPECS
+    partials = {}
+    for name, spec in specs.items():
+        path = os.path.join(state_dir, f'{name}.parquet')
+        if not os.path.exists(path):
+            return None
+        state = pd.read_parquet(path)
+        keys = [col for col in state.columns if col not in STATE_COLUMNS[spec['agg']]]
+        partials[name] = state.set_index(keys)
+    return partials
@@ -0,0 +1,80 @@
+import pandas as pd
+
+# Registro central dos tipos de cada arquivo, brutos (raw) e da camada processed.
+# Todas as leituras usam estes tipos, em vez de deixar o pandas inferir coluna a coluna.
+# Tipos: 'id' e 'int' (inteiros de 32 bits), 'string', 'time' (texto HH:MM), 'category'
+# (baixa cardinalidade, guardada como dicionário), 'date', 'timestamp', 'decimal'
+SCHEMAS = {
+    'user_raw': {
+        'user_id': 'id',
+        'name': 'string',
+        'entry_date': 'date',
+        'entry_time': 'time',
+        'update_date': 'date',
+        'e-mail': 'string',
+        'cpf': 'string',
+    },
+    'produtos_raw': {
+        'product_id': 'id',
+        'name': 'string',
+        'price': 'decimal',
+        'stock': 'int',
+        'created_at': 'date',
+        'description': 'string',
+    },
+    'pedidos_raw': {
+        'user_id': 'id',
+        'created_at': 'timestamp',
+        'items': 'string',
+        'total': 'decimal',
+        'payment_status': 'category',
+        'payment_method': 'category',
+        'payment_date': 'timestamp',
+        'shipping_status': 'category',
+        'shipping_status_date_awaiting_payment': 'timestamp',
+        'shipping_status_date_preparing': 'timestamp',
+        'shipping_status_date_sent': 'timestamp',
+        'shipping_status_date_delivered': 'timestamp',
+    },
+}
+
+# Os arquivos processed têm as mesmas colunas e tipos dos brutos de origem
+SCHEMAS['dim_users'] = SCHEMAS['user_raw']
+SCHEMAS['dim_produtos'] = SCHEMAS['produtos_raw']
+SCHEMAS['fato_orders'] = SCHEMAS['pedidos_raw']
+
+# Formato explícito de cada tipo de data; ISO8601 aceita 'YYYY-MM-DD HH:MM' dos brutos
+# e 'YYYY-MM-DD HH:MM:SS' da camada processed, sem inferir o formato a cada leitura
+DATETIME_FORMATS = {'date': '%Y-%m-%d', 'timestamp': 'ISO8601'}
+
+# Tipo pandas de cada tipo do registro na leitura de CSV; datas são lidas como texto e
+# convertidas por parse_datetimes. Inteiros anuláveis não viram float64 quando falta um valor,
+# e texto nunca é lido como número (CPFs sem pontuação perderiam zeros à esquerda)
+CSV_DTYPES = {
+    'id': 'Int32',
+    'int': 'Int32',
+    'string': str,
+    'time': str,
+    'category': 'category',
+    'date': str,
+    'timestamp': str,
+    'decimal': 'float64',
+}
+
+def csv_dtypes(name, columns=None):
+    """dtype para pd.read_csv do arquivo name, só com as colunas pedidas"""
+    return {col: CSV_DTYPES[kind] for col, kind in SCHEMAS[name].items() if columns is None or col in columns}
+
+def datetime_columns(name, kinds=('date', 'timestamp')):
+    return [col for col, kind in SCHEMAS[name].items() if kind in kinds]
+
+def parse_datetime(values, name, column):
+    """Converte values, da coluna de data column do arquivo name, com o formato do registro"""
+    return pd.to_datetime(values, format=DATETIME_FORMATS[SCHEMAS[name][column]], errors='coerce')
+
+def parse_datetimes(df, name, columns=None):
+    """Converte as colunas de data do arquivo name presentes em df com o formato do registro"""
+    for col in datetime_columns(name):
+        if col in df.columns and (columns is None or col in columns):
+            df[col] = parse_datetime(df[col], name, col)
+    return df
@@ -0,0 +1,130 @@
+import io
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from steps.instrumentation import instrument, record
+from steps.processed_layer import PROCESSED_FORMAT, ProcessedWriter, arrow_schema, processed_path
+
+# Número de faixas de bytes em que um arquivo bruto grande é dividido para ser limpo em paralelo
+PROCESS_SHARDS = int(os.environ.get('SEVEN_PROCESS_SHARDS', '1'))
+
+def byte_ranges(path, shards):
+    """Cabeçalho do CSV e faixas (início, fim) das linhas de dados, cortadas sempre em início de linha.
+
+    Supõe que nenhum campo entre aspas contém quebra de linha, como nos arquivos brutos do pipeline.
+    """
+    length = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        boundaries = [len(header)]
+        for i in range(1, shards):
+            f.seek(max(len(header) + (length - len(header)) * i // shards - 1, boundaries[-1]))
+            f.readline()  # avança até o início da próxima linha
+            boundaries.append(max(f.tell(), boundaries[-1]))
+    boundaries.append(length)
+    ranges = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start]
+    return header, ranges or [(len(header), len(header))]
+
+class _ByteRangeReader(io.RawIOBase):
+    """Arquivo somente leitura com o cabeçalho seguido dos bytes [start, end) de f, lidos sob demanda"""
+
+    def __init__(self, f, header, start, end):
+        f.seek(start)
+        self._f = f
+        self._header = header
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        if self._header:
+            n = min(len(view), len(self._header))
+            view[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        n = self._f.readinto(view[:min(len(view), self._remaining)]) or 0
+        self._remaining -= n
+        return n
+
+def _shard_frames(path, header, start, end, chunksize, dtype):
+    # A faixa é lida em blocos pelo parser, sem carregar a faixa inteira em memória
+    with open(path, 'rb', buffering=0) as f:
+        reader = io.BufferedReader(_ByteRangeReader(f, header, start, end))
+        frames = pd.read_csv(reader, sep=",", encoding="utf-8", dtype=dtype, chunksize=chunksize)
+        if chunksize:
+            yield from frames
+        else:
+            yield frames
+
+def clean_shard(path, header, start, end, parts_dir, name, clean, fmt, chunksize=None, dtype=None, watermark=None,
+                dedup=None):
+    """Limpa uma faixa de bytes e grava o resultado como parte; roda em um processo do pool.
+
+    Retorna o caminho da parte, os contadores da faixa e o maior valor visto pela marca d'água.
+    """
+    with instrument(f'{name}_shard') as metrics:
+        with ProcessedWriter(parts_dir, name, fmt) as writer:
+            for chunk in _shard_frames(path, header, start, end, chunksize, dtype):
+                cleaned = clean(watermark(chunk) if watermark else chunk)
+                if dedup:
+                    cleaned = dedup(cleaned)
+                writer.write(cleaned)
+                record(rows_in=len(chunk), rows_out=len(cleaned))
+    counters = {k: v for k, v in metrics.counters.items() if k.startswith('rows_')}
+    return writer.path, counters, watermark.max_seen if watermark else None
+
+def concat_parts(part_paths, output_path, name, fmt):
+    """Junta as partes, na ordem das faixas, no arquivo processed final"""
+    tmp_path = output_path + '.tmp'
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(tmp_path, arrow_schema(name)) as out:
+            for part in part_paths:
+                out.write_table(pq.read_table(part))
+    else:
+        with open(tmp_path, 'wb') as out:
+            for i, part in enumerate(part_paths):
+                with open(part, 'rb') as f:
+                    if i > 0:
+                        f.readline()  # só a primeira parte mantém o cabeçalho
+                    shutil.copyfileobj(f, out)
+    os.replace(tmp_path, output_path)
+
+def process_csv_sharded(input_path, processed_dir, name, clean, shards, fmt=None, chunksize=None, dtype=None,
+                        watermark=None, workers=None, dedup=None):
+    """Divide input_path em faixas de bytes, limpa cada uma em um processo e concatena o resultado.
+
+    clean precisa ser uma função de módulo (enviada aos processos por referência). Com watermark,
+    cada faixa é filtrada com a marca salva e o maior valor visto é devolvido ao filtro do chamador.
+    dedup é aplicado depois de clean e cada processo recebe a sua cópia, então só descarta repetições
+    dentro da mesma faixa.
+    """
+    fmt = fmt or PROCESSED_FORMAT
+    header, ranges = byte_ranges(input_path, shards)
+    parts_root = os.path.join(processed_dir, f'.{name}.parts')
+    shutil.rmtree(parts_root, ignore_errors=True)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or len(ranges)) as executor:
+            futures = [
+                executor.submit(clean_shard, input_path, header, start, end, os.path.join(parts_root, f'{i:04d}'),
+                                name, clean, fmt, chunksize, dtype, watermark, dedup)
+                for i, (start, end) in enumerate(ranges)
+            ]
+            results = [future.result() for future in futures]
+        output_path = processed_path(processed_dir, name, fmt)
+        os.makedirs(processed_dir, exist_ok=True)
+        # Uma faixa sem linhas lidas em blocos não grava parte, como process_csv sem linhas
+        concat_parts([part for part, _, _ in results if os.path.exists(part)], output_path, name, fmt)
+    finally:
+        shutil.rmtree(parts_root, ignore_errors=True)
+
+    for _, counters, max_seen in results:
+        record(**counters)
+        if watermark is not None and max_seen is not None:
+            watermark.max_seen = max_seen if watermark.max_seen is None else max(watermark.max_seen, max_seen)
+    return output_path
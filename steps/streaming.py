@@ -0,0 +1,116 @@
+import contextvars
+import os
+import queue
+import threading
+
+# Blocos em trânsito entre duas etapas de um fluxo. Quando uma etapa é mais lenta que a anterior,
+# a fila enche e a anterior espera (backpressure), então a memória fica limitada a poucos blocos
+STREAM_QUEUE_SIZE = int(os.environ.get('SEVEN_STREAM_QUEUE_SIZE', '4'))
+
+# Intervalo com que uma etapa parada em uma fila confere se o fluxo foi interrompido
+POLL_INTERVAL_S = 0.1
+
+# Marca o fim dos blocos em uma fila
+_END = object()
+
+class StreamStopped(Exception):
+    """A etapa parou porque outra etapa do fluxo falhou"""
+
+class _Stream:
+    """Filas e estado de erro compartilhados pelas etapas de um fluxo"""
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        self.error = None
+        self._lock = threading.Lock()
+
+    def fail(self, error):
+        with self._lock:
+            if self.error is None:
+                self.error = error
+        self.stopped.set()
+
+    def put(self, q, item):
+        while True:
+            if self.stopped.is_set():
+                raise StreamStopped()
+            try:
+                q.put(item, timeout=POLL_INTERVAL_S)
+                return
+            except queue.Full:
+                pass
+
+    def get(self, q):
+        while True:
+            if self.stopped.is_set():
+                raise StreamStopped()
+            try:
+                return q.get(timeout=POLL_INTERVAL_S)
+            except queue.Empty:
+                pass
+
+    def drain(self, q):
+        while True:
+            item = self.get(q)
+            if item is _END:
+                return
+            yield item
+
+def _produce(stream, source, out):
+    try:
+        for chunk in source:
+            stream.put(out, chunk)
+        stream.put(out, _END)
+    except StreamStopped:
+        pass
+    except BaseException as e:
+        stream.fail(e)
+
+def _transform(stream, stage, inp, out):
+    try:
+        for chunk in stream.drain(inp):
+            result = stage(chunk)
+            if result is not None:
+                stream.put(out, result)
+        stream.put(out, _END)
+    except StreamStopped:
+        pass
+    except BaseException as e:
+        stream.fail(e)
+
+def _thread(target, *args):
+    # Cada thread roda em uma cópia do contexto de quem chamou, então record() soma na mesma etapa instrumentada
+    return threading.Thread(target=contextvars.copy_context().run, args=(target, *args), daemon=True)
+
+def run_stream(source, stages, sink, queue_size=STREAM_QUEUE_SIZE):
+    """Roda source -> stages -> sink como etapas concorrentes, ligadas por filas de queue_size blocos.
+
+    source é um iterável de blocos, lido em uma thread própria. Cada etapa de stages roda em sua thread,
+    recebe um bloco e devolve o bloco transformado (None o descarta). sink recebe o iterador dos blocos
+    finais e roda na thread de quem chamou; o que ele devolve é o resultado de run_stream.
+
+    Se qualquer etapa falha, as demais param no próximo bloco e o primeiro erro é relançado aqui.
+    """
+    stream = _Stream()
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    threads = [_thread(_produce, stream, source, queues[0])]
+    threads += [_thread(_transform, stream, stage, inp, out) for stage, inp, out in zip(stages, queues, queues[1:])]
+    for thread in threads:
+        thread.start()
+
+    result = None
+    try:
+        result = sink(stream.drain(queues[-1]))
+    except StreamStopped:
+        pass
+    except BaseException as e:
+        stream.fail(e)
+    finally:
+        # Libera etapas ainda bloqueadas, se o sink terminou antes de consumir tudo
+        stream.stopped.set()
+        for thread in threads:
+            thread.join()
+
+    if stream.error is not None:
+        raise stream.error
+    return result
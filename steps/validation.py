@@ -0,0 +1,72 @@
+import pandas as pd
+
+# Restrições de cada tabela do warehouse, verificadas em memória e de forma vetorizada antes da escrita.
+# Uma linha que violaria uma delas vai para a quarentena com o código do motivo, em vez de derrubar
+# a transação inteira no banco. Regras, na ordem em que são verificadas (vale o primeiro motivo):
+#   not_null      colunas NOT NULL                                           null_<col>
+#   max_length    colunas VARCHAR(n)                                         too_long_<col>
+#   non_negative  valores que não podem ser negativos                        negative_<col>
+#   max_abs       colunas DECIMAL(p, s): o valor absoluto deve ser menor     out_of_range_<col>
+#   references    coluna -> tabela cujas chaves ela referencia (FK)          unknown_<col>
+#   key           chave primária: repetições no mesmo lote ficam só com a
+#                 última ocorrência, como faria o upsert                     duplicate_<col>
+CONSTRAINTS = {
+    'dim_usuarios': {
+        'not_null': ['user_id', 'name', 'entry_date', 'entry_time', 'email', 'cpf'],
+        'max_length': {'name': 100, 'email': 100, 'cpf': 14},
+        'key': 'user_id',
+    },
+    'dim_produtos': {
+        'not_null': ['product_id', 'name', 'price', 'stock', 'created_at'],
+        'max_length': {'name': 100},
+        'non_negative': ['price', 'stock'],
+        'max_abs': {'price': 10 ** 8},
+        'key': 'product_id',
+    },
+    'fato_pedidos': {
+        'not_null': ['user_id', 'created_at', 'items', 'total', 'payment_status', 'payment_method',
+                     'shipping_status'],
+        'max_length': {'payment_status': 50, 'payment_method': 50, 'shipping_status': 50},
+        'non_negative': ['total'],
+        'max_abs': {'total': 10 ** 8},
+        'references': {'user_id': 'dim_usuarios'},
+    },
+    'itens_pedido': {
+        'not_null': ['pedido_id', 'item_name'],
+        'max_length': {'item_name': 100},
+    },
+}
+
+def _flags(mask):
+    # Comparações com valores nulos dão NA nos tipos anuláveis; nulos já são tratados por not_null
+    return mask.fillna(False).astype(bool)
+
+def validate(df, table, keys=None):
+    """Separa as linhas de df que respeitam as restrições de table das que vão para a quarentena.
+
+    keys traz, para cada tabela referenciada, as chaves existentes (ex.: {'dim_usuarios': user_ids}).
+    Devolve (válidas, rejeitadas); as rejeitadas ganham a coluna reject_reason.
+    """
+    rules = CONSTRAINTS[table]
+    reason = pd.Series(None, index=df.index, dtype=object)
+
+    def flag(bad, code):
+        reason.mask(_flags(bad) & reason.isna(), code, inplace=True)
+
+    for col in rules.get('not_null', []):
+        flag(df[col].isna(), f'null_{col}')
+    for col, length in rules.get('max_length', {}).items():
+        flag(df[col].astype('string').str.len() > length, f'too_long_{col}')
+    for col in rules.get('non_negative', []):
+        flag(df[col] < 0, f'negative_{col}')
+    for col, limit in rules.get('max_abs', {}).items():
+        flag(df[col].astype('float64').abs().round(2) >= limit, f'out_of_range_{col}')
+    for col, referenced in rules.get('references', {}).items():
+        flag(~df[col].isin(keys[referenced]) & df[col].notna(), f'unknown_{col}')
+    if 'key' in rules:
+        key = rules['key']
+        valid = reason.isna()
+        flag(valid & df[key].where(valid).duplicated(keep='last'), f'duplicate_{key}')
+
+    rejected = reason.notna()
+    return df[~rejected], df[rejected].assign(reject_reason=reason[rejected])
@@ -0,0 +1,60 @@
+import json
+import os
+import pandas as pd
+
+# Arquivo com a marca d'água (último valor processado) de cada fonte
+WATERMARKS_FILE = os.path.join('data', 'desafio', 'state', 'watermarks.json')
+
+def load_watermarks(state_file=None):
+    state_file = state_file or WATERMARKS_FILE
+    if not os.path.exists(state_file):
+        return {}
+    with open(state_file, encoding='utf-8') as f:
+        return json.load(f)
+
+def get_watermark(source, state_file=None):
+    value = load_watermarks(state_file).get(source)
+    return pd.Timestamp(value) if value is not None else None
+
+def set_watermark(source, value, state_file=None):
+    state_file = state_file or WATERMARKS_FILE
+    watermarks = load_watermarks(state_file)
+    watermarks[source] = pd.Timestamp(value).isoformat()
+
+    # Grava em um arquivo temporário e substitui, para nunca deixar o estado pela metade
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    tmp_file = state_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(watermarks, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, state_file)
+
+class WatermarkFilter:
+    """Mantém apenas as linhas mais novas que a marca d'água salva e acompanha o novo máximo.
+
+    inclusive=True também mantém as linhas iguais à marca d'água; use para fontes
+    que são carregadas com upsert e têm granularidade de dia (ex.: update_date).
+    reset=True ignora a marca salva (reprocessamento completo) e a substitui no commit.
+    """
+
+    def __init__(self, source, column, inclusive=False, state_file=None, reset=False):
+        self.source = source
+        self.column = column
+        self.inclusive = inclusive
+        self.state_file = state_file
+        self.watermark = None if reset else get_watermark(source, state_file)
+        self.max_seen = None
+
+    def __call__(self, df):
+        values = pd.to_datetime(df[self.column], format='ISO8601', errors='coerce')
+        if self.watermark is not None:
+            keep = values >= self.watermark if self.inclusive else values > self.watermark
+            df, values = df[keep], values[keep]
+        if values.notna().any():
+            chunk_max = values.max()
+            self.max_seen = chunk_max if self.max_seen is None else max(self.max_seen, chunk_max)
+        return df
+
+    def commit(self):
+        # Só avança a marca d'água depois que a saída foi gravada com sucesso
+        if self.max_seen is not None:
+            set_watermark(self.source, self.max_seen, self.state_file)
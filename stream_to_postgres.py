@@ -0,0 +1,181 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import load_data_to_postgres as loader
+from steps.instrumentation import file_size, instrument, record
+from steps.pipeline_tasks import clean_order_data, clean_product_data, clean_user_data
+from steps.processed_layer import ProcessedWriter
+from steps.schemas import csv_dtypes
+from steps.streaming import STREAM_QUEUE_SIZE, run_stream
+
+# Streaming mode: each raw file is read in chunks, cleaned and written to PostgreSQL by concurrent stages
+# connected by bounded queues (steps/streaming.py), so cleaning and loading overlap and no processed file
+# is needed. Every chunk is committed on its own, so the first rows reach the warehouse after one chunk
+RAW_DIR = os.path.join(loader.BASE_DIR, 'data', 'desafio', 'raw')
+
+# Rows per chunk read from the raw files
+STREAM_CHUNKSIZE = int(os.environ.get('SEVEN_STREAM_CHUNKSIZE', '50000'))
+
+# Also write the cleaned chunks to the processed layer, for auditing or a later batch load
+STREAM_TEE = os.environ.get('SEVEN_STREAM_TEE', '0') == '1'
+
+# Raw file, cleaning function and processed file of each stream
+STREAMS = {
+    'users': ('user_raw', clean_user_data, 'dim_users'),
+    'products': ('produtos_raw', clean_product_data, 'dim_produtos'),
+    'orders': ('pedidos_raw', clean_order_data, 'fato_orders'),
+}
+
+# Function to read a raw file in chunks with the registry's dtypes
+def read_raw(source, chunksize=STREAM_CHUNKSIZE):
+    raw_file = os.path.join(RAW_DIR, f'{source}.csv')
+    record(bytes_read=file_size(raw_file))
+    for chunk in pd.read_csv(raw_file, sep=",", encoding="utf-8", dtype=csv_dtypes(source), chunksize=chunksize):
+        record(rows_in=len(chunk))
+        yield chunk
+
+# Function to build the stage that writes each cleaned chunk to the processed layer and passes it on
+def tee_to(writer):
+    def tee(chunk):
+        writer.write(chunk)
+        return chunk
+    return tee
+
+# Function to build the sink that upserts each chunk of a dimension with upsert (loader.upsert_users/products),
+# whose invalid rows go to rejects_file
+def dimension_sink(engine, upsert, rejects_file, timing):
+    def sink(chunks):
+        # Each run starts its reject report over; its chunks append to it
+        loader.clear_reports(rejects_file)
+        loaded = 0
+        for chunk in chunks:
+            loaded += upsert(engine, chunk, append_rejects=True)
+            timing.setdefault('first_commit_s', time.perf_counter() - timing['start'])
+        return loaded
+    return sink
+
+# Function to build the sink that loads each chunk of orders once the dimensions are committed
+def orders_sink(engine, wait_for_dimensions, timing, incremental=loader.INCREMENTAL,
+                fingerprint_index=loader.FINGERPRINT_INDEX):
+    def sink(chunks):
+        # Each run starts its reports over; its chunks append to them
+        loader.clear_reports(loader.ORDERS_REJECTS_FILE, loader.ORDER_ITEMS_REJECTS_FILE,
+                             loader.ORDER_ITEMS_UNRESOLVED_FILE)
+        local_index = loader.open_fingerprint_index(fingerprint_index)
+        conn = engine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            last_loaded = None
+            if incremental:
+                cursor.execute("SELECT MAX(created_at) FROM fato_pedidos")
+                last_loaded = cursor.fetchone()[0]
+            time_lookup = loader.fetch_time_lookup(cursor)
+
+            # Orders reference users and products: chunks read and cleaned meanwhile wait in the queues
+            wait_for_dimensions()
+            user_keys = loader.fetch_user_keys(cursor)
+            product_index = loader.fetch_product_index(cursor)
+
+            loaded = 0
+            for chunk in chunks:
+                orders_df = chunk[loader.ORDERS_COLUMNS]
+                if last_loaded is not None:
+                    orders_df = orders_df[orders_df['created_at'] > pd.Timestamp(last_loaded)]
+                if orders_df.empty:
+                    continue
+
+                # The calendar grows with the dates seen so far, in either direction
+                days = orders_df['created_at'].dt.normalize()
+                if time_lookup.empty or days.min() < time_lookup.index.min() or days.max() > time_lookup.index.max():
+                    calendar_df = loader.extend_time_dimension(cursor, days.min(), days.max())
+                    time_lookup = pd.concat([time_lookup, pd.Series(calendar_df['tempo_id'].to_numpy(dtype='int64'),
+                                                                    index=pd.DatetimeIndex(calendar_df['data']))])
+
+                orders_df, rejected_df = loader.screen_orders(orders_df, user_keys, time_lookup)
+                if len(rejected_df) > 0:
+                    record(rows_rejected=len(rejected_df))
+                    loader.write_rejects(rejected_df, loader.ORDERS_REJECTS_FILE, append=True)
+                # Orders re-sent within the stream or loaded before are dropped by fingerprint
+                orders_df, _ = loader.drop_loaded_orders(cursor, orders_df, local_index)
+                chunk_loaded, _, unresolved_df = loader.write_orders(cursor, orders_df, product_index,
+                                                                     defer_indexes=False, append_rejects=True)
+                if len(unresolved_df) > 0:
+                    loader.write_unresolved_items(unresolved_df, append=True)
+                conn.commit()
+                if local_index is not None:
+                    # In memory per chunk, written to disk once the stream ends
+                    local_index.add(orders_df['fingerprint'], orders_df['created_at'])
+                record(rows_out=chunk_loaded)
+                loaded += chunk_loaded
+                timing.setdefault('first_commit_s', time.perf_counter() - timing['start'])
+            if local_index is not None:
+                local_index.commit()
+            return loaded
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()  # returns the connection to the pool
+    return sink
+
+# Function to run one stream, reader -> cleaner [-> tee] -> sink, as an instrumented stage
+def run_entity_stream(name, sink, chunksize=STREAM_CHUNKSIZE, tee=STREAM_TEE, queue_size=STREAM_QUEUE_SIZE):
+    source, clean, processed_name = STREAMS[name]
+    with instrument(f'stream_{name}'):
+        if not tee:
+            return run_stream(read_raw(source, chunksize), [clean], sink, queue_size)
+        with ProcessedWriter(loader.DATA_DIR, processed_name) as writer:
+            return run_stream(read_raw(source, chunksize), [clean, tee_to(writer)], sink, queue_size)
+
+# Function to stream every raw file to PostgreSQL: users and products concurrently, orders as soon as both committed
+def run_streaming(engine, chunksize=STREAM_CHUNKSIZE, tee=STREAM_TEE, queue_size=STREAM_QUEUE_SIZE):
+    loader.with_pooled_connection(engine, loader.create_tables)()
+
+    start = time.perf_counter()
+    timings = {name: {'start': start} for name in STREAMS}
+    sinks = {
+        'users': dimension_sink(engine, loader.upsert_users, loader.USERS_REJECTS_FILE, timings['users']),
+        'products': dimension_sink(engine, loader.upsert_products, loader.PRODUCTS_REJECTS_FILE, timings['products']),
+    }
+    with ThreadPoolExecutor(max_workers=len(STREAMS)) as executor:
+        futures = {name: executor.submit(run_entity_stream, name, sink, chunksize, tee, queue_size)
+                   for name, sink in sinks.items()}
+
+        # A failed dimension stream makes the orders stream fail too, instead of waiting forever
+        dimension_futures = list(futures.values())
+        def wait_for_dimensions():
+            for future in dimension_futures:
+                future.result()
+
+        futures['orders'] = executor.submit(run_entity_stream, 'orders',
+                                            orders_sink(engine, wait_for_dimensions, timings['orders']),
+                                            chunksize, tee, queue_size)
+        results = {name: future.result() for name, future in futures.items()}
+
+    for name, loaded in results.items():
+        first_commit = timings[name].get('first_commit_s')
+        first = f", first rows after {first_commit:.2f}s" if first_commit is not None else ""
+        print(f"Streamed {loaded} {name} records{first}")
+    return {name: {'rows': loaded, 'first_commit_s': timings[name].get('first_commit_s')}
+            for name, loaded in results.items()}
+
+# Main function
+def main():
+    # Each stream logs its metrics as one JSON line
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    engine = loader.get_engine(pool_size=loader.LOADER_POOL_SIZE)
+    try:
+        start = time.perf_counter()
+        run_streaming(engine)
+        print(f"Streaming load completed successfully in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print(f"Error in main process: {e}")
+        raise
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import pandas as pd
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.b_clean_trasform import validate_clean_email_series, validate_clean_cpf_series
+
+# Test e-mails are normalized, invalid ones become null and the index is kept
+def test_validate_clean_email_series():
+    emails = pd.Series([' John.Doe@Example.com', 'invalid_email', None, 'a@b.co'], index=[10, 11, 12, 13])
+    
+    cleaned, valid = validate_clean_email_series(emails, return_mask=True)
+    
+    assert cleaned.index.tolist() == [10, 11, 12, 13]
+    assert valid.tolist() == [True, False, False, True]
+    assert cleaned[10] == 'john.doe@example.com'
+    assert cleaned[[11, 12]].isna().all()
+
+# Test CPFs are checked with the mod-11 check digits and stay index-aligned
+def test_validate_clean_cpf_series():
+    cpfs = pd.Series(['529.982.247-25', '123.456.789-00', '111.111.111-11', None, '1234', 52998224725],
+                     index=[5, 6, 7, 8, 9, 10])
+    
+    cleaned, valid = validate_clean_cpf_series(cpfs, return_mask=True)
+    
+    assert cleaned.index.tolist() == [5, 6, 7, 8, 9, 10]
+    assert valid.tolist() == [True, False, False, False, False, True]
+    assert cleaned[5] == '52998224725'
+    assert cleaned[10] == '52998224725'
+    assert cleaned[[6, 7, 8, 9]].isna().all()
+
+# Test assigning back to the frame no longer shifts values between rows
+def test_validate_clean_cpf_series_assignment():
+    users = pd.DataFrame({'cpf': ['123', '529.982.247-25']}, index=[0, 1])
+    
+    users['cpf'] = validate_clean_cpf_series(users['cpf'])
+    
+    assert pd.isna(users.loc[0, 'cpf'])
+    assert users.loc[1, 'cpf'] == '52998224725'
@@ -0,0 +1,66 @@
+import pytest
+import pandas as pd
+import os
+import sys
+from io import StringIO
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.fingerprints import DuplicateFilter, FingerprintIndex, order_fingerprints
+from steps.schemas import csv_dtypes, parse_datetimes
+
+RAW_ORDERS = """user_id,created_at,items,total,payment_status
+1001,2025-03-31 23:59,"Laptop, Mouse",1200.0,Paid
+1003,2025-04-03 08:15,"Monitor, Keyboard",450.0,Paid
+1001,2025-03-31 23:59,"Laptop, Mouse",1200.0,Pending
+"""
+
+@pytest.fixture
+def raw_orders():
+    df = pd.read_csv(StringIO(RAW_ORDERS), dtype=csv_dtypes('pedidos_raw', ['user_id', 'items', 'total',
+                                                                            'payment_status']))
+    return parse_datetimes(df, 'pedidos_raw')
+
+# Test the fingerprint only depends on the identifying values, not on how they were read
+def test_order_fingerprints_deterministic(raw_orders):
+    fingerprints = order_fingerprints(raw_orders)
+
+    # A re-sent order with another payment status is the same order
+    assert fingerprints[0] == fingerprints[2]
+    assert fingerprints[0] != fingerprints[1]
+    assert fingerprints.dtype == 'int64'
+
+    # int64 ids, object text and nanosecond timestamps, as the processed CSV may be read back
+    converted = raw_orders.astype({'user_id': 'int64', 'items': object, 'created_at': 'datetime64[ns]'})
+    assert order_fingerprints(converted).tolist() == fingerprints.tolist()
+
+    changed = raw_orders.assign(total=raw_orders['total'] + 0.01)
+    assert not order_fingerprints(changed).isin(fingerprints).any()
+
+# Test the index keeps one sorted file per month and only finds committed months after a reload
+def test_fingerprint_index_by_month(raw_orders, tmp_path):
+    index_dir = str(tmp_path / 'fingerprints')
+    fingerprints = order_fingerprints(raw_orders)
+    index = FingerprintIndex(index_dir)
+
+    assert not index.seen(fingerprints, raw_orders['created_at']).any()
+    index.add(fingerprints[:2], raw_orders['created_at'][:2])
+    assert FingerprintIndex(index_dir).seen(fingerprints, raw_orders['created_at']).sum() == 0
+
+    index.commit()
+    assert sorted(os.listdir(index_dir)) == ['2025-03.npy', '2025-04.npy']
+    assert FingerprintIndex(index_dir).seen(fingerprints, raw_orders['created_at']).tolist() == [True, True, True]
+
+    # A replaced month starts over
+    index.forget(raw_orders['created_at'][1:2])
+    index.commit()
+    assert FingerprintIndex(index_dir).seen(fingerprints, raw_orders['created_at']).tolist() == [True, False, True]
+
+# Test the duplicate filter drops repeats within a chunk and across chunks of one run
+def test_duplicate_filter_across_chunks(raw_orders):
+    dedup = DuplicateFilter()
+
+    assert dedup(raw_orders.iloc[:2])['user_id'].tolist() == [1001, 1003]
+    assert dedup(raw_orders.iloc[2:]).empty
+    assert len(DuplicateFilter()(raw_orders)) == 2
@@ -0,0 +1,51 @@
+import pytest
+import json
+import logging
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.instrumentation import instrument, instrumented, record
+
+def logged_metrics(caplog):
+    return [json.loads(r.getMessage()) for r in caplog.records if r.name == 'seven.metrics']
+
+# Test counters recorded anywhere inside a stage are summed into its JSON log line
+def test_instrument_logs_counters(caplog):
+    caplog.set_level(logging.INFO, logger='seven.metrics')
+    
+    with instrument('process_order_data') as metrics:
+        record(rows_in=10, bytes_read=2048)
+        record(rows_in=5, rows_out=12, rows_rejected=3)
+    record(rows_in=100)  # outside any stage: ignored
+    
+    [logged] = logged_metrics(caplog)
+    assert logged == metrics.as_dict()
+    assert logged['stage'] == 'process_order_data'
+    assert logged['status'] == 'success'
+    assert (logged['rows_in'], logged['rows_out'], logged['rows_rejected']) == (15, 12, 3)
+    assert logged['bytes_read'] == 2048 and logged['bytes_written'] == 0
+    assert logged['wall_s'] >= 0 and logged['cpu_s'] >= 0 and logged['peak_rss_mb'] > 0
+
+# Test a failing task still logs and pushes its metrics to XCom, and the error propagates
+def test_instrumented_failure_pushed_to_xcom(caplog):
+    caplog.set_level(logging.INFO, logger='seven.metrics')
+    
+    @instrumented
+    def load_users_data(**kwargs):
+        record(rows_in=7)
+        raise RuntimeError('null value in column "cpf"')
+    
+    ti = MagicMock()
+    with pytest.raises(RuntimeError):
+        load_users_data(ti=ti)
+    
+    [logged] = logged_metrics(caplog)
+    assert logged['stage'] == 'load_users_data'
+    assert logged['status'] == 'failed'
+    assert logged['rows_in'] == 7
+    assert 'null value in column' in logged['error']
+    ti.xcom_push.assert_called_once_with(key='metrics', value=logged)
@@ -0,0 +1,499 @@
+import pytest
+import pandas as pd
+import os
+import sys
+from unittest.mock import MagicMock
+from datetime import datetime
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import load_data_to_postgres as loader
+
+# Every load writes its reject reports, so tests keep them out of the repository's data directory
+@pytest.fixture(autouse=True)
+def rejects_dir(tmp_path, monkeypatch):
+    for name in ['USERS_REJECTS_FILE', 'PRODUCTS_REJECTS_FILE', 'ORDERS_REJECTS_FILE', 'ORDER_ITEMS_REJECTS_FILE',
+                 'ORDER_ITEMS_UNRESOLVED_FILE']:
+        monkeypatch.setattr(loader, name, str(tmp_path / 'rejects' / os.path.basename(getattr(loader, name))))
+    return tmp_path / 'rejects'
+
+@pytest.fixture
+def sample_orders_df():
+    return pd.DataFrame({
+        'user_id': [1001, 1003, 1004],
+        'created_at': pd.to_datetime(['2025-04-01 10:45', '2025-04-03 08:15', '2025-04-04 09:50']),
+        'items': ['Laptop, Mouse', 'Monitor, Keyboard', 'Smartphone'],
+        'total': [1200.0, 450.0, 950.0],
+        'payment_status': ['Paid', 'Paid', 'Paid'],
+        'payment_method': ['Credit Card', 'Debit Card', 'Apple Pay'],
+        'payment_date': pd.to_datetime(['2025-04-01 11:00', '2025-04-03 08:30', None]),
+        'shipping_status': ['Delivered', 'Sent', 'Awaiting'],
+        'shipping_status_date_awaiting_payment': pd.to_datetime(['2025-04-01 10:45', '2025-04-03 08:15', '2025-04-04 09:50']),
+        'shipping_status_date_preparing': pd.to_datetime(['2025-04-01 12:30', '2025-04-03 10:00', '2025-04-03 10:00']),
+        'shipping_status_date_sent': pd.to_datetime(['2025-04-02 09:00', '2025-04-03 14:45', '2025-04-05 10:00']),
+        'shipping_status_date_delivered': pd.to_datetime(['2025-04-03 15:20', '2025-04-03 15:20', None]),
+    })
+
+# Test copy_dataframe batching and CSV serialization
+def test_copy_dataframe_batches(sample_orders_df):
+    cursor = MagicMock()
+    buffers = []
+    cursor.copy_expert.side_effect = lambda sql, buf: buffers.append(buf.getvalue())
+    
+    copied = loader.copy_dataframe(cursor, sample_orders_df, 'stg_fato_pedidos', loader.ORDERS_COLUMNS, batch_size=2)
+    
+    assert copied == 3
+    assert cursor.copy_expert.call_count == 2
+    assert cursor.copy_expert.call_args[0][0].startswith('COPY stg_fato_pedidos (user_id, created_at')
+    
+    lines = ''.join(buffers).splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith('1001,2025-04-01 10:45:00,"Laptop, Mouse",1200.0,')
+    # NaT is written as an unquoted empty field, which COPY reads as NULL
+    assert lines[2].endswith(',')
+
+@pytest.fixture
+def sample_time_lookup():
+    dates = pd.date_range('2025-04-01', '2025-04-03')
+    return pd.Series([1, 2, 3], index=dates)
+
+# Test tempo_id is resolved in memory and out-of-calendar orders are rejected
+def test_assign_tempo_id(sample_orders_df, sample_time_lookup):
+    orders_df, rejected_df = loader.assign_tempo_id(sample_orders_df, sample_time_lookup)
+    
+    assert orders_df['tempo_id'].tolist() == [1, 3]
+    assert orders_df['tempo_id'].dtype == 'int64'
+    assert rejected_df['user_id'].tolist() == [1004]
+    assert rejected_df['reject_reason'].tolist() == ['date_outside_dim_tempo']
+
+def make_conn(fetchone=None, loaded_fingerprints=()):
+    """Mock connection whose cursor answers the loader's lookup queries"""
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    calendar = [(d.date(), i) for i, d in enumerate(pd.date_range('2025-04-01', '2025-04-03'), 1)]
+    products = [('Laptop', 201), ('Mouse', 202), ('Monitor', 203)]
+    users = [(1001,), (1003,), (1004,)]
+    
+    def fetchall():
+        sql = cursor.execute.call_args[0][0]
+        if 'FROM dim_tempo' in sql:
+            return calendar
+        if 'FROM dim_produtos' in sql:
+            return products
+        if 'FROM dim_usuarios' in sql:
+            return users
+        if 'FROM stg_fingerprints' in sql:
+            return [(fingerprint,) for fingerprint in loaded_fingerprints]
+        return [(1000 + i,) for i in range(1, cursor.execute.call_args[0][1][0] + 1)]
+    cursor.fetchall.side_effect = fetchall
+    cursor.fetchone.return_value = fetchone
+    return conn, cursor
+
+# Test the bulk path copies resolved orders and their items, and writes the reject report
+def test_load_orders_data_bulk(sample_orders_df, tmp_path, monkeypatch):
+    orders_file = tmp_path / 'pedidos_processed.csv'
+    sample_orders_df.to_csv(orders_file, index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(orders_file))
+    monkeypatch.setattr(loader, 'ORDERS_REJECTS_FILE', str(tmp_path / 'rejects' / 'orders_rejected.csv'))
+    monkeypatch.setattr(loader, 'ORDER_ITEMS_UNRESOLVED_FILE', str(tmp_path / 'rejects' / 'order_items_unresolved.csv'))
+    
+    conn, cursor = make_conn()
+    copied = {}
+    cursor.copy_expert.side_effect = lambda sql, buf: copied.setdefault(sql.split()[1], buf.getvalue())
+    
+    loaded = loader.load_orders_data(conn, None, bulk=True)
+    
+    assert loaded == 2
+    # dim_tempo, dim_usuarios, dim_produtos, the fingerprint lookup (staging table, ANALYZE, join)
+    # and the pedido_id allocation: no per-order queries
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert len([sql for sql in statements if 'rollup' not in sql]) == 7
+    assert cursor.copy_expert.call_args_list[1][0][0].startswith('COPY fato_pedidos (pedido_id, tempo_id, user_id')
+    assert conn.commit.called
+    rejected = pd.read_csv(tmp_path / 'rejects' / 'orders_rejected.csv')
+    assert rejected['user_id'].tolist() == [1004]
+    
+    # "Laptop, Mouse" and "Monitor, Keyboard" become four lines; Keyboard has no product
+    assert copied['itens_pedido'].splitlines() == [
+        '1001,201,1,Laptop,1', '1001,202,1,Mouse,1', '1002,203,3,Monitor,1', '1002,,3,Keyboard,1'
+    ]
+    unresolved = pd.read_csv(tmp_path / 'rejects' / 'order_items_unresolved.csv')
+    assert unresolved['item_name'].tolist() == ['Keyboard']
+    
+    # The rollups receive this load's delta, one row per month and key
+    assert copied['stg_rollup_pedidos_mes'].splitlines() == ['2025,4,2,1650.0']
+    assert copied['stg_rollup_produtos'].splitlines() == ['2025,4,201,1', '2025,4,202,1', '2025,4,203,1']
+
+# Test an item name longer than itens_pedido.item_name is quarantined while its order is still loaded
+def test_load_orders_data_item_too_long(sample_orders_df, tmp_path, monkeypatch):
+    orders_file = tmp_path / 'pedidos_processed.csv'
+    sample_orders_df.assign(items=['Laptop, Mouse', 'Monitor, ' + 'K' * 101, 'Smartphone']).to_csv(orders_file,
+                                                                                                    index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(orders_file))
+    monkeypatch.setattr(loader, 'ORDERS_REJECTS_FILE', str(tmp_path / 'rejects' / 'orders_rejected.csv'))
+    monkeypatch.setattr(loader, 'ORDER_ITEMS_REJECTS_FILE', str(tmp_path / 'rejects' / 'order_items_rejected.csv'))
+    monkeypatch.setattr(loader, 'ORDER_ITEMS_UNRESOLVED_FILE', str(tmp_path / 'rejects' / 'order_items_unresolved.csv'))
+    
+    conn, cursor = make_conn()
+    copied = {}
+    cursor.copy_expert.side_effect = lambda sql, buf: copied.setdefault(sql.split()[1], buf.getvalue())
+    
+    assert loader.load_orders_data(conn, None, bulk=True) == 2
+    assert copied['itens_pedido'].splitlines() == ['1001,201,1,Laptop,1', '1001,202,1,Mouse,1', '1002,203,3,Monitor,1']
+    rejected = pd.read_csv(tmp_path / 'rejects' / 'order_items_rejected.csv')
+    assert rejected['reject_reason'].tolist() == ['too_long_item_name']
+    assert rejected['pedido_id'].tolist() == [1002]
+    # The rejected item is not reported as unresolved too
+    assert pd.read_csv(tmp_path / 'rejects' / 'order_items_unresolved.csv').empty
+
+# Test a clean batch load replaces the reports a previous run left behind, and a partition keeps its own
+def test_load_orders_data_clears_reports(sample_orders_df, rejects_dir, tmp_path, monkeypatch):
+    orders_file = tmp_path / 'pedidos_processed.csv'
+    sample_orders_df[sample_orders_df['user_id'] != 1004].assign(items='Laptop').to_csv(orders_file, index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(orders_file))
+    rejects_dir.mkdir()
+    for name in ['orders_rejected.csv', 'order_items_rejected.csv', 'order_items_unresolved.csv']:
+        (rejects_dir / name).write_text('pedido_id,reject_reason\n999,stale\n')
+    
+    conn, cursor = make_conn()
+    
+    assert loader.load_orders_data(conn, None, bulk=True) == 2
+    for name in ['orders_rejected.csv', 'order_items_rejected.csv', 'order_items_unresolved.csv']:
+        assert pd.read_csv(rejects_dir / name).empty
+    
+    # A partition writes its own reports and leaves the flat ones alone
+    partition_dir = tmp_path / 'ds=2025-04-03'
+    partition_dir.mkdir()
+    sample_orders_df.to_csv(partition_dir / 'pedidos_processed.csv', index=False)
+    (rejects_dir / 'orders_rejected.csv').write_text('pedido_id,reject_reason\n999,stale\n')
+    
+    assert loader.load_orders_data(conn, None, bulk=True, partition='2025-04-03') == 2
+    rejected = pd.read_csv(rejects_dir / 'ds=2025-04-03' / 'orders_rejected.csv')
+    assert rejected['user_id'].tolist() == [1004]
+    assert pd.read_csv(rejects_dir / 'orders_rejected.csv')['reject_reason'].tolist() == ['stale']
+
+# Test repeated products in one order are counted as quantity
+def test_explode_order_items_quantity():
+    orders_df = pd.DataFrame({'pedido_id': [7], 'tempo_id': [1], 'items': ['Mouse, Mouse ,Laptop,']})
+    product_index = pd.Series([201, 202], index=['laptop', 'mouse'])
+    
+    items_df, unresolved_df = loader.explode_order_items(orders_df, product_index)
+    
+    assert items_df['item_name'].tolist() == ['Mouse', 'Laptop']
+    assert items_df['quantity'].tolist() == [2, 1]
+    assert items_df['product_id'].tolist() == [202, 201]
+    assert len(unresolved_df) == 0
+
+# Test the calendar columns are derived correctly
+def test_build_time_dimension():
+    calendar_df = loader.build_time_dimension('2025-06-28', '2025-07-01', first_tempo_id=10)
+    
+    assert calendar_df['tempo_id'].tolist() == [10, 11, 12, 13]
+    assert calendar_df['dia_da_semana'].tolist() == ['Saturday', 'Sunday', 'Monday', 'Tuesday']
+    assert calendar_df['eh_final_de_semana'].tolist() == [True, True, False, False]
+    assert calendar_df['nome_mes'].tolist() == ['June', 'June', 'June', 'July']
+    assert calendar_df['trimestre'].tolist() == [2, 2, 2, 3]
+    assert calendar_df['semestre'].tolist() == [1, 1, 1, 2]
+    assert not calendar_df['eh_feriado'].any()
+
+# Test an existing calendar is only extended past its last date
+def test_generate_time_dimension_incremental(sample_orders_df, tmp_path, monkeypatch):
+    orders_file = tmp_path / 'pedidos_processed.csv'
+    sample_orders_df.to_csv(orders_file, index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(orders_file))
+    
+    conn = MagicMock()
+    cursor = conn.cursor.return_value
+    cursor.fetchone.return_value = (datetime(2025, 4, 30).date(), 60)
+    
+    calendar_df = loader.generate_time_dimension(conn)
+    
+    # Orders end on 2025-04-04, so the calendar runs until 2025-05-04
+    assert calendar_df['data'].min() == pd.Timestamp('2025-05-01')
+    assert calendar_df['data'].max() == pd.Timestamp('2025-05-04')
+    assert calendar_df['tempo_id'].tolist() == [61, 62, 63, 64]
+    assert cursor.copy_expert.call_count == 1
+    assert conn.commit.called
+
+# Test new months are loaded into a bare table and attached, while existing months go through the parent
+def test_insert_orders_partitioned(sample_orders_df):
+    orders_df = sample_orders_df.copy()
+    orders_df.loc[0, 'created_at'] = pd.Timestamp('2025-03-31 23:59')
+    orders_df['pedido_id'] = [1, 2, 3]
+    orders_df['tempo_id'] = [1, 2, 3]
+    orders_df['fingerprint'] = loader.order_fingerprints(orders_df)
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [('fato_pedidos_2025_03',)]
+    
+    loaded = loader.insert_orders_partitioned(cursor, orders_df)
+    
+    assert loaded == 3
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert "CREATE TABLE fato_pedidos_2025_04 (LIKE fato_pedidos INCLUDING DEFAULTS)" in statements
+    assert ("ALTER TABLE fato_pedidos ATTACH PARTITION fato_pedidos_2025_04 "
+            "FOR VALUES FROM ('2025-04-01') TO ('2025-05-01')") in statements
+    assert not any('fato_pedidos_2025_03 (LIKE' in sql for sql in statements)
+    copies = [c[0][0].split(' (')[0] for c in cursor.copy_expert.call_args_list]
+    assert copies == ['COPY fato_pedidos', 'COPY fato_pedidos_2025_04']
+
+# Test create_tables refuses a fato_pedidos whose layout disagrees with SEVEN_PARTITION_ORDERS
+def test_create_tables_layout_mismatch():
+    conn, cursor = make_conn(fetchone=('r',))
+    
+    with pytest.raises(RuntimeError, match='migrate'):
+        loader.create_tables(conn, partitioned=True)
+    assert conn.rollback.called
+    assert not any('PARTITION BY' in c[0][0] for c in cursor.execute.call_args_list)
+    
+    # A partitioned table loaded without the flag is refused too
+    cursor.fetchone.return_value = ('p',)
+    with pytest.raises(RuntimeError, match='exists as a partitioned table'):
+        loader.check_orders_layout(cursor, partitioned=False)
+    
+    # A matching or missing table goes on to the DDL
+    for relkind, partitioned in [('p', True), ('r', False), (None, True), (None, False)]:
+        cursor.fetchone.return_value = (relkind,)
+        loader.check_orders_layout(cursor, partitioned)
+
+# Test dimension loads are upserts on the primary key
+def test_upsert_method_on_conflict():
+    from sqlalchemy import Column, Integer, MetaData, String, Table
+    from sqlalchemy.dialects import postgresql
+    
+    table = MagicMock()
+    table.table = Table('dim_produtos', MetaData(), Column('product_id', Integer, primary_key=True), Column('name', String))
+    conn = MagicMock()
+    
+    loader.upsert_method('product_id')(table, conn, ['product_id', 'name'], iter([(101, 'Wireless Mouse')]))
+    
+    sql = str(conn.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert 'ON CONFLICT (product_id) DO UPDATE SET name = excluded.name' in sql
+
+# Test incremental loads skip orders at or before the last loaded created_at
+def test_load_orders_data_incremental(sample_orders_df, tmp_path, monkeypatch):
+    orders_file = tmp_path / 'pedidos_processed.csv'
+    sample_orders_df.to_csv(orders_file, index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(orders_file))
+    monkeypatch.setattr(loader, 'ORDER_ITEMS_UNRESOLVED_FILE', str(tmp_path / 'order_items_unresolved.csv'))
+    
+    conn, cursor = make_conn(fetchone=(datetime(2025, 4, 3, 8, 15),))
+    time_lookup = pd.Series([1, 2, 3, 4], index=pd.date_range('2025-04-01', '2025-04-04'))
+    
+    loaded = loader.load_orders_data(conn, None, time_lookup=time_lookup, incremental=True)
+    
+    assert loaded == 1
+
+# Test the orchestrator loads dimensions through the pool before the fact table
+def test_run_loader_orders_after_dimensions(monkeypatch):
+    calls = []
+    monkeypatch.setattr(loader, 'create_tables', lambda conn: calls.append('create_tables'))
+    monkeypatch.setattr(loader, 'generate_time_dimension', lambda conn, partition: calls.append('time'))
+    monkeypatch.setattr(loader, 'load_users_data', lambda engine, partition: calls.append('users'))
+    monkeypatch.setattr(loader, 'load_products_data', lambda engine, partition: calls.append('products'))
+    monkeypatch.setattr(loader, 'load_orders_data',
+                        lambda conn, engine, replace_months, partition: calls.append(('orders', replace_months)))
+    engine = MagicMock()
+    
+    timings = loader.run_loader(engine, workers=3, replace_months=True)
+    
+    assert calls[0] == 'create_tables'
+    assert sorted(calls[1:4]) == ['products', 'time', 'users']
+    assert calls[4] == ('orders', True)
+    assert set(timings) == {'create_tables', 'generate_time_dimension', 'load_users_data',
+                            'load_products_data', 'load_orders_data'}
+    # Every raw connection borrowed from the pool is given back
+    assert engine.raw_connection.call_count == 3
+    assert engine.raw_connection.return_value.close.call_count == 3
+
+# Test a failed users load raises instead of looking like an empty load
+def test_load_users_data_raises(tmp_path, monkeypatch):
+    users_file = tmp_path / 'dim_users.csv'
+    users_file.write_text('user_id,name,entry_date,entry_time,update_date,e-mail,cpf\n'
+                          '1,Ana,2024-01-01,10:00,2024-01-02,ana@example.com,52998224725\n')
+    monkeypatch.setattr(loader, 'USERS_FILE', str(users_file))
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', MagicMock(side_effect=RuntimeError('not-null violation')))
+    
+    with pytest.raises(RuntimeError):
+        loader.load_users_data(MagicMock())
+
+# Test the loader reads the processed files under the names the DAG writes them
+def test_processed_file_names_match_dag():
+    from steps.processed_layer import processed_path
+    
+    for loader_file, name in [(loader.USERS_FILE, 'dim_users'), (loader.PRODUCTS_FILE, 'dim_produtos'),
+                              (loader.ORDERS_FILE, 'fato_orders')]:
+        assert loader_file == processed_path(loader.DATA_DIR, name, 'csv')
+        assert loader.partition_file(loader_file, '2025-04-03') == processed_path(
+            os.path.join(loader.DATA_DIR, 'ds=2025-04-03'), name, 'csv')
+
+# Test a partition load reads that day's files and skips the sources it doesn't have
+def test_run_loader_partition(sample_orders_df, rejects_dir, tmp_path, monkeypatch):
+    partition_dir = tmp_path / 'ds=2025-04-03'
+    partition_dir.mkdir()
+    sample_orders_df.to_csv(partition_dir / 'fato_orders.csv', index=False)
+    (partition_dir / 'dim_users.csv').write_text('user_id,name,entry_date,entry_time,update_date,e-mail,cpf\n'
+                                                 '1,Ana,2024-01-01,10:00,2024-01-02,ana@example.com,\n')
+    for name, file_name in [('USERS_FILE', 'dim_users.csv'), ('PRODUCTS_FILE', 'dim_produtos.csv'),
+                            ('ORDERS_FILE', 'fato_orders.csv')]:
+        monkeypatch.setattr(loader, name, str(tmp_path / file_name))
+    calls = []
+    monkeypatch.setattr(loader, 'create_tables', lambda conn: None)
+    monkeypatch.setattr(loader, 'write_dimension', lambda engine, df, table: len(df))
+    monkeypatch.setattr(loader, 'generate_time_dimension', lambda conn, partition: calls.append(('time', partition)))
+    monkeypatch.setattr(loader, 'load_orders_data', lambda conn, engine, replace_months, partition: calls.append(
+        ('orders', partition, len(loader.read_processed_file(loader.partition_file(loader.ORDERS_FILE, partition),
+                                                            'fato_orders')))))
+    
+    timings = loader.run_loader(MagicMock(), workers=2, partition='2025-04-03')
+    
+    assert calls == [('time', '2025-04-03'), ('orders', '2025-04-03', 3)]
+    assert set(timings) == {'create_tables', 'generate_time_dimension', 'load_users_data', 'load_orders_data'}
+    
+    # The partition's rejects go to its own report, so loading another day doesn't overwrite them
+    assert pd.read_csv(rejects_dir / 'ds=2025-04-03' / 'users_rejected.csv')['reject_reason'].tolist() == ['null_cpf']
+    assert not os.path.exists(rejects_dir / 'users_rejected.csv')
+    
+    # A day without orders only creates the tables
+    calls.clear()
+    assert set(loader.run_loader(MagicMock(), workers=2, partition='2025-04-04')) == {'create_tables'}
+    assert calls == []
+
+# Test streamed chunks extend the calendar on both sides of the dates it already has
+def test_extend_time_dimension_both_sides():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (datetime(2025, 4, 10).date(), datetime(2025, 4, 20).date(), 11)
+    
+    calendar_df = loader.extend_time_dimension(cursor, pd.Timestamp('2025-04-08 10:00'),
+                                               pd.Timestamp('2025-04-21 09:00'), margin_days=1)
+    
+    assert calendar_df['data'].dt.strftime('%Y-%m-%d').tolist() == ['2025-04-07', '2025-04-08', '2025-04-09',
+                                                                     '2025-04-21', '2025-04-22']
+    assert calendar_df['tempo_id'].tolist() == [12, 13, 14, 15, 16]
+    assert cursor.copy_expert.call_count == 1
+    
+    # Dates the calendar already covers add nothing
+    cursor.reset_mock()
+    assert len(loader.extend_time_dimension(cursor, pd.Timestamp('2025-04-12'), pd.Timestamp('2025-04-15'),
+                                            margin_days=1)) == 0
+    assert not cursor.copy_expert.called
+
+# Test orders and users that would violate a constraint are quarantined with a reason instead of failing the load
+def test_load_quarantines_invalid_rows(sample_orders_df, tmp_path, monkeypatch):
+    orders_df = sample_orders_df.copy()
+    orders_df.loc[1, 'user_id'] = 1002
+    orders_df.loc[2, 'created_at'] = pd.Timestamp('2025-04-02 09:50')
+    orders_df.loc[2, 'total'] = -1.0
+    orders_file = tmp_path / 'fato_orders.csv'
+    orders_df.to_csv(orders_file, index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(orders_file))
+    monkeypatch.setattr(loader, 'ORDERS_REJECTS_FILE', str(tmp_path / 'orders_rejected.csv'))
+    monkeypatch.setattr(loader, 'ORDER_ITEMS_UNRESOLVED_FILE', str(tmp_path / 'order_items_unresolved.csv'))
+    
+    conn, cursor = make_conn()
+    assert loader.load_orders_data(conn, None) == 1
+    
+    rejected = pd.read_csv(tmp_path / 'orders_rejected.csv')
+    assert dict(zip(rejected['user_id'], rejected['reject_reason'])) == {1002: 'unknown_user_id',
+                                                                         1004: 'negative_total'}
+    assert conn.commit.called
+    
+    users_file = tmp_path / 'dim_users.csv'
+    users_file.write_text('user_id,name,entry_date,entry_time,update_date,e-mail,cpf\n'
+                          '1,Ana,2024-01-01,10:00,2024-01-02,ana@example.com,\n'
+                          '2,Bia,2024-01-01,10:00,2024-01-02,bia@example.com,52998224725\n')
+    monkeypatch.setattr(loader, 'USERS_FILE', str(users_file))
+    monkeypatch.setattr(loader, 'USERS_REJECTS_FILE', str(tmp_path / 'users_rejected.csv'))
+    to_sql = MagicMock()
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', to_sql)
+    
+    assert loader.load_users_data(MagicMock()) == 1
+    assert pd.read_csv(tmp_path / 'users_rejected.csv')['reject_reason'].tolist() == ['null_cpf']
+
+# Test re-sent orders are dropped before the write: repeats within the file, orders whose fingerprint is
+# already in fato_pedidos and, with the local index, orders loaded before without querying the database
+def test_load_drops_loaded_orders(sample_orders_df, tmp_path, monkeypatch):
+    orders_df = pd.concat([sample_orders_df, sample_orders_df.iloc[[0]]])
+    orders_df.to_csv(tmp_path / 'fato_orders.csv', index=False)
+    monkeypatch.setattr(loader, 'ORDERS_FILE', str(tmp_path / 'fato_orders.csv'))
+    monkeypatch.setattr(loader, 'ORDERS_REJECTS_FILE', str(tmp_path / 'orders_rejected.csv'))
+    monkeypatch.setattr(loader, 'ORDER_ITEMS_UNRESOLVED_FILE', str(tmp_path / 'order_items_unresolved.csv'))
+    monkeypatch.setattr(loader, 'LOADER_FINGERPRINTS_DIR', str(tmp_path / 'fingerprints'))
+    fingerprints = loader.order_fingerprints(sample_orders_df)
+    
+    # 1004 is outside the calendar, 1001 appears twice and 1003 is already in fato_pedidos
+    conn, cursor = make_conn(loaded_fingerprints=[fingerprints[1]])
+    assert loader.load_orders_data(conn, None, fingerprint_index=True) == 1
+    copies = [c[0][0] for c in cursor.copy_expert.call_args_list]
+    assert copies[1].startswith('COPY fato_pedidos (') and copies[1].split(')')[0].endswith('fingerprint')
+    assert os.listdir(tmp_path / 'fingerprints') == ['2025-04.npy']
+    
+    # The second run finds 1001 in the local index and only looks up 1003 in the database
+    conn, cursor = make_conn(loaded_fingerprints=[fingerprints[1]])
+    assert loader.load_orders_data(conn, None, fingerprint_index=True) == 0
+    staged = [c[0][1].getvalue() for c in cursor.copy_expert.call_args_list if 'stg_fingerprints' in c[0][0]]
+    assert staged == [f'{fingerprints[1]},2025-04-03 08:15:00\n']
+
+# Test dimension loads only upsert rows whose business-column hash differs from the stored one,
+# and the SCD2 mode closes the open versions of changed rows before adding their new versions
+def test_write_dimension_only_changed_rows(monkeypatch):
+    products_df = pd.DataFrame({
+        'product_id': [201, 202, 203],
+        'name': ['Laptop', 'Mouse', 'Monitor'],
+        'price': [1200.0, 25.0, 300.0],
+        'stock': [10, 50, 7],
+        'created_at': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03']),
+        'description': ['Portable computer', 'Wireless mouse', '27 inch'],
+    })
+    products_df['row_hash'] = loader.row_hashes(products_df, loader.DIMENSION_HASH_COLUMNS['dim_produtos'])
+    # The hash only covers the business columns
+    assert loader.row_hashes(products_df.assign(price=[1200.0, 26.0, 300.0]),
+                             loader.DIMENSION_HASH_COLUMNS['dim_produtos']).ne(products_df['row_hash']).tolist() == [
+        False, True, False]
+    
+    engine = MagicMock()
+    conn = engine.begin.return_value.__enter__.return_value
+    cursor = conn.connection.cursor.return_value
+    cursor.fetchall.return_value = [(201,), (203,)]
+    written = {}
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', lambda df, table, con, **kwargs: written.update({table: df}))
+    
+    assert loader.write_dimension(engine, products_df, 'dim_produtos', scd2=False) == 1
+    assert written['dim_produtos']['product_id'].tolist() == [202]
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert 'JOIN dim_produtos d ON d.product_id = s.product_id AND d.row_hash = s.row_hash' in statements[-1]
+    
+    cursor.reset_mock()
+    cursor.fetchone.return_value = (datetime(2025, 4, 3, 8, 15, 0, 123456),)
+    assert loader.write_dimension(engine, products_df, 'dim_produtos', scd2=True) == 1
+    statements = [c[0][0] for c in cursor.execute.call_args_list]
+    assert 'JOIN dim_produtos_historico d' in statements[2] and 'valid_to IS NULL' in statements[2]
+    assert statements[4].strip().startswith('UPDATE dim_produtos_historico h SET valid_to')
+    copies = [c[0][0] for c in cursor.copy_expert.call_args_list]
+    assert copies[-1].startswith('COPY dim_produtos_historico (product_id, name, price, stock, created_at, '
+                                 'description, row_hash, valid_from)')
+
+# Test two versions of the same key written back to back, within one second, get distinct valid_from values
+def test_write_dimension_versions_in_same_second(monkeypatch):
+    products_df = pd.DataFrame({
+        'product_id': [202], 'name': ['Mouse'], 'price': [25.0], 'stock': [50],
+        'created_at': pd.to_datetime(['2024-01-02']), 'description': ['Wireless mouse'],
+    })
+    engine = MagicMock()
+    cursor = engine.begin.return_value.__enter__.return_value.connection.cursor.return_value
+    cursor.fetchall.return_value = []
+    cursor.fetchone.side_effect = [(datetime(2025, 4, 3, 8, 15, 0, 1),), (datetime(2025, 4, 3, 8, 15, 0, 2),)]
+    history_rows = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: (
+        history_rows.extend(buffer.getvalue().splitlines()) if 'historico' in sql else None)
+    monkeypatch.setattr(pd.DataFrame, 'to_sql', lambda *args, **kwargs: None)
+    
+    for price in [25.0, 26.0]:
+        version = products_df.assign(price=price)
+        version['row_hash'] = loader.row_hashes(version, loader.DIMENSION_HASH_COLUMNS['dim_produtos'])
+        assert loader.write_dimension(engine, version, 'dim_produtos', scd2=True) == 1
+    
+    valid_from = [row.rsplit(',', 1)[1] for row in history_rows]
+    assert valid_from == ['2025-04-03 08:15:00.000001', '2025-04-03 08:15:00.000002']
+    updates = [c[0] for c in cursor.execute.call_args_list if 'SET valid_to' in c[0][0]]
+    assert updates[-1][1] == (datetime(2025, 4, 3, 8, 15, 0, 2),)
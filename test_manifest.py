@@ -0,0 +1,46 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.manifest import StageManifest
+
+@pytest.fixture
+def stage_files(tmp_path):
+    raw = tmp_path / 'user_raw.csv'
+    raw.write_text('user_id,name\n1,ana\n')
+    out = tmp_path / 'dim_users.csv'
+    out.write_text('user_id,name\n1,Ana\n')
+    return str(raw), str(out), str(tmp_path / 'manifest')
+
+# Test a stage only counts as unchanged after a successful run with the same inputs and params
+def test_manifest_unchanged_after_commit(stage_files):
+    raw, out, manifest_dir = stage_files
+    
+    manifest = StageManifest('process_user_data', [raw], [out], {'incremental': False}, manifest_dir)
+    assert not manifest.unchanged()
+    manifest.commit()
+    
+    assert StageManifest('process_user_data', [raw], [out], {'incremental': False}, manifest_dir).unchanged()
+    assert not StageManifest('process_user_data', [raw], [out], {'incremental': True}, manifest_dir).unchanged()
+
+# Test content changes, and a touched file with the same content, are detected by hash
+def test_manifest_detects_content_change(stage_files):
+    raw, out, manifest_dir = stage_files
+    StageManifest('process_user_data', [raw], [out], manifest_dir=manifest_dir).commit()
+    
+    stat = os.stat(raw)
+    os.utime(raw, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert StageManifest('process_user_data', [raw], [out], manifest_dir=manifest_dir).unchanged()
+    
+    with open(raw, 'a') as f:
+        f.write('2,bia\n')
+    assert not StageManifest('process_user_data', [raw], [out], manifest_dir=manifest_dir).unchanged()
+    
+    # A deleted output forces the stage to run again
+    manifest = StageManifest('process_user_data', [raw], [out], manifest_dir=manifest_dir)
+    manifest.commit()
+    os.remove(out)
+    assert not StageManifest('process_user_data', [raw], [out], manifest_dir=manifest_dir).unchanged()
@@ -10,7 +10,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import the functions to test
-from seven_airflow_etl_dag import (
+from steps.pipeline_tasks import (
     process_user_data,
     process_product_data,
     process_order_data,
@@ -69,16 +69,17 @@ def sample_processed_order_data():
         'total': [999.99, 2599.98, 199.99],
         'payment_method': ['credit_card', 'paypal', 'debit_card'],
         'shipping_status': ['delivered', 'shipped', 'processing'],
-        'created_at': ['2023-01-15', '2023-02-20', '2023-03-10']
+        'created_at': ['2023-01-15', '2023-02-20', '2023-03-10'],
+        'items': ['iphone', 'laptop, laptop', 'headphones']
     })
     df['created_at'] = pd.to_datetime(df['created_at'])
     return df
 
 # Test process_user_data function
-@patch('seven_airflow_etl_dag.validate_clean_email_series')
-@patch('seven_airflow_etl_dag.validate_clean_cpf_series')
-@patch('seven_airflow_etl_dag.os.path.join')
-@patch('seven_airflow_etl_dag.os.makedirs')
+@patch('steps.pipeline_tasks.validate_clean_email_series')
+@patch('steps.pipeline_tasks.validate_clean_cpf_series')
+@patch('steps.pipeline_tasks.os.path.join')
+@patch('steps.pipeline_tasks.os.makedirs')
 @patch('builtins.open', new_callable=mock_open)
 @patch('pandas.read_csv')
 @patch('pandas.DataFrame.to_csv')
@@ -113,8 +114,8 @@ def test_process_user_data(
     assert mock_df['name'].str.title().equals(mock_df['name'].str.title())
 
 # Test process_product_data function
-@patch('seven_airflow_etl_dag.os.path.join')
-@patch('seven_airflow_etl_dag.os.makedirs')
+@patch('steps.pipeline_tasks.os.path.join')
+@patch('steps.pipeline_tasks.os.makedirs')
 @patch('builtins.open', new_callable=mock_open)
 @patch('pandas.read_csv')
 @patch('pandas.DataFrame.to_csv')
@@ -142,8 +143,8 @@ def test_process_product_data(
     assert mock_df['description'].str.capitalize().equals(mock_df['description'].str.capitalize())
 
 # Test process_order_data function
-@patch('seven_airflow_etl_dag.os.path.join')
-@patch('seven_airflow_etl_dag.os.makedirs')
+@patch('steps.pipeline_tasks.os.path.join')
+@patch('steps.pipeline_tasks.os.makedirs')
 @patch('builtins.open', new_callable=mock_open)
 @patch('pandas.read_csv')
 @patch('pandas.DataFrame.to_csv')
@@ -166,9 +167,52 @@ def test_process_order_data(
     assert mock_read_csv.called
     assert mock_makedirs.called
 
+# Process the same raw orders one-shot and in chunks of 2 rows, behind a watermark that filters out the whole
+# first chunk, and return both processed frames
+def process_both_ways(tmp_path, fmt):
+    from steps.pipeline_tasks import clean_order_data, process_csv
+    from steps.processed_layer import read_processed
+    from steps.schemas import SCHEMAS
+    from steps.watermarks import WatermarkFilter, set_watermark
+    
+    raw_file = tmp_path / 'pedidos_raw.csv'
+    rows = [(101, '2023-01-15 10:00', 'Laptop'), (102, '2023-02-20 11:30', 'Mouse'),
+            (103, '2023-03-10 09:15', 'Monitor'), (104, '2023-04-01 16:45', 'Keyboard')]
+    raw_file.write_text(','.join(SCHEMAS['pedidos_raw']) + '\n' + ''.join(
+        f'{user_id},{created_at},"{items}",99.90,Paid,Pix,{created_at},Delivered,{created_at},{created_at},'
+        f'{created_at},{created_at}\n' for user_id, created_at, items in rows))
+    state_file = str(tmp_path / 'watermarks.json')
+    set_watermark('orders', '2023-02-20 11:30', state_file)
+    
+    frames = []
+    for chunksize in [None, 2]:
+        processed_dir = str(tmp_path / f'processed_{chunksize}')
+        process_csv(str(raw_file), processed_dir, 'fato_orders', clean_order_data, chunksize, fmt=fmt,
+                    source='pedidos_raw', watermark=WatermarkFilter('orders', 'created_at', state_file=state_file))
+        frames.append(read_processed(processed_dir, 'fato_orders', fmt=fmt))
+    return frames
+
+# Test chunked processing writes the same CSV as one-shot, with the header written once
+def test_process_csv_chunked_matches_one_shot(tmp_path):
+    one_shot, chunked = process_both_ways(tmp_path, 'csv')
+    
+    assert one_shot['items'].tolist() == ['Monitor', 'Keyboard']
+    pd.testing.assert_frame_equal(chunked, one_shot)
+    chunked_text = (tmp_path / 'processed_2' / 'fato_orders.csv').read_text()
+    assert chunked_text == (tmp_path / 'processed_None' / 'fato_orders.csv').read_text()
+    assert chunked_text.count('user_id,created_at') == 1
+
+# Test chunked processing writes the same Parquet file contents as one-shot
+def test_process_parquet_chunked_matches_one_shot(tmp_path):
+    pytest.importorskip('pyarrow')
+    one_shot, chunked = process_both_ways(tmp_path, 'parquet')
+    
+    assert one_shot['items'].tolist() == ['Monitor', 'Keyboard']
+    pd.testing.assert_frame_equal(chunked, one_shot)
+
 # Test generate_reports function
-@patch('seven_airflow_etl_dag.os.path.join')
-@patch('seven_airflow_etl_dag.os.makedirs')
+@patch('steps.pipeline_tasks.os.path.join')
+@patch('steps.pipeline_tasks.os.makedirs')
 @patch('pandas.read_csv')
 @patch('pandas.DataFrame.to_csv')
 def test_generate_reports(
@@ -177,8 +221,6 @@ def test_generate_reports(
 ):
     # Setup mocks
     mock_read_csv.side_effect = [
-        sample_processed_user_data,
-        sample_processed_product_data,
         sample_processed_order_data
     ]
     
@@ -190,9 +232,9 @@ def test_generate_reports(
     
     # Assertions
     assert result == "Reports generated successfully"
-    assert mock_read_csv.call_count == 3  # Should read 3 files
+    assert mock_read_csv.call_count == 1  # Should read only the orders file
     assert mock_makedirs.called
-    assert mock_to_csv.call_count == 3  # Should write 3 report files
+    assert mock_to_csv.call_count == 5  # Should write 5 report files
     
     # Verify report generation
     # We can check that the to_csv was called with the right filenames
@@ -203,12 +245,16 @@ def test_generate_reports(
     assert any('orders_by_month' in str(f) for f in filenames)
     assert any('revenue_by_payment' in str(f) for f in filenames)
     assert any('orders_by_status' in str(f) for f in filenames)
+    assert any('avg_ticket_by_customer' in str(f) for f in filenames)
+    assert any('top_products' in str(f) for f in filenames)
 
 # Test the DAG structure (optional, if you want to test the DAG itself)
-@patch('airflow.models.DAG.create_dagrun')
-def test_dag_structure(mock_create_dagrun):
+def test_dag_structure():
+    pytest.importorskip('airflow.models')
+    
     # Import the DAG
-    from seven_airflow_etl_dag import dag
+    with patch('airflow.models.DAG.create_dagrun'):
+        from dags.pipeline_airflow import dag
     
     # Check DAG attributes
     assert dag.dag_id == 'seven_etl_pipeline'
@@ -216,6 +262,7 @@ def test_dag_structure(mock_create_dagrun):
     
     # Check task dependencies
     task_ids = [task.task_id for task in dag.tasks]
+    assert 'load_partition' in task_ids and 'fold_reports' in task_ids
     assert 'process_user_data' in task_ids
     assert 'process_product_data' in task_ids
     assert 'process_order_data' in task_ids
@@ -227,4 +274,99 @@ def test_dag_structure(mock_create_dagrun):
             upstream_task_ids = [t.task_id for t in task.upstream_list]
             assert 'process_user_data' in upstream_task_ids
             assert 'process_product_data' in upstream_task_ids
-            assert 'process_order_data' in upstream_task_ids
\ No newline at end of file
+            assert 'process_order_data' in upstream_task_ids
+        if task.task_id == 'fold_reports':
+            assert [t.task_id for t in task.upstream_list] == ['generate_reports']
+        if task.task_id == 'load_partition':
+            upstream_task_ids = [t.task_id for t in task.upstream_list]
+            assert 'process_order_data' in upstream_task_ids
+            assert 'generate_reports' not in upstream_task_ids
+
+# Test the mapped tasks get one partition per day of the lookback window that has raw data
+def test_list_partitions(tmp_path, monkeypatch):
+    from steps.pipeline_tasks import list_partitions
+    monkeypatch.chdir(tmp_path)
+    for day in ['2025-04-01', '2025-04-03', '2025-04-04']:
+        os.makedirs(os.path.join('data', 'desafio', 'raw', f'ds={day}'))
+    
+    assert list_partitions(ds='2025-04-03') == [{'partition': '2025-04-03'}]
+    assert list_partitions(ds='2025-04-03', params={'lookback_days': 3}) == [
+        {'partition': '2025-04-01'}, {'partition': '2025-04-03'}]
+    assert list_partitions(ds='2025-04-02') == []
+
+# Test a partition reads and writes its own ds= directories and skips sources it doesn't have
+def test_partitioned_tasks(tmp_path, monkeypatch, sample_order_data):
+    monkeypatch.chdir(tmp_path)
+    raw_dir = os.path.join('data', 'desafio', 'raw', 'ds=2023-01-15')
+    os.makedirs(raw_dir)
+    with open(os.path.join(raw_dir, 'pedidos_raw.csv'), 'w') as f:
+        f.write(sample_order_data.replace('order_id,', 'items,').replace('\n1,', '\nLaptop,')
+                .replace('\n2,', '\nMouse,').replace('\n3,', '\nMonitor,'))
+    
+    assert process_user_data(partition='2023-01-15') == "No user data for 2023-01-15, processing skipped"
+    assert process_order_data(partition='2023-01-15') == "Order data processing completed"
+    assert generate_reports(partition='2023-01-15') == "Reports generated successfully"
+    
+    assert os.path.exists(os.path.join('data', 'desafio', 'processed', 'ds=2023-01-15', 'fato_orders.csv'))
+    report = pd.read_csv(os.path.join('data', 'desafio', 'reports', 'ds=2023-01-15', 'orders_by_month.csv'))
+    assert report['count'].sum() == 3
+    assert not os.path.exists(os.path.join('data', 'desafio', 'processed', 'fato_orders.csv'))
+
+# Test the partitions' reports fold into history-wide reports, a rerun partition replacing its share
+def test_fold_partition_reports(tmp_path, monkeypatch, sample_order_data):
+    from steps.pipeline_tasks import fold_reports
+    monkeypatch.chdir(tmp_path)
+    raw_orders = (sample_order_data.replace('order_id,', 'items,').replace('\n1,', '\nLaptop,')
+                  .replace('\n2,', '\nMouse,').replace('\n3,', '\nMonitor,'))
+    for day, rows in [('2023-01-15', 3), ('2023-02-20', 2)]:
+        raw_dir = os.path.join('data', 'desafio', 'raw', f'ds={day}')
+        os.makedirs(raw_dir)
+        with open(os.path.join(raw_dir, 'pedidos_raw.csv'), 'w') as f:
+            f.write('\n'.join(raw_orders.splitlines()[:rows + 1]))
+        process_order_data(partition=day)
+        generate_reports(partition=day)
+    generate_reports(partition='2023-01-15')
+    
+    assert fold_reports() == "Reports of 2 partitions folded"
+    report = pd.read_csv(os.path.join('data', 'desafio', 'reports', 'orders_by_month.csv'))
+    assert report['count'].tolist() == [2, 2, 1]
+    assert os.path.exists(os.path.join('data', 'desafio', 'state', 'reports', 'orders_by_month.parquet'))
+
+# Test a rebuild in incremental mode refolds the whole order history, not just the last delta
+def test_incremental_reports_rebuild(tmp_path, monkeypatch, sample_order_data):
+    monkeypatch.chdir(tmp_path)
+    raw_dir = os.path.join('data', 'desafio', 'raw')
+    os.makedirs(raw_dir)
+    raw_orders = (sample_order_data.replace('order_id,', 'items,').replace('\n1,', '\nLaptop,')
+                  .replace('\n2,', '\nMouse,').replace('\n3,', '\nMonitor,'))
+    with open(os.path.join(raw_dir, 'pedidos_raw.csv'), 'w') as f:
+        f.write(raw_orders)
+    process_order_data(incremental=True)
+    generate_reports(incremental=True)
+    
+    with open(os.path.join(raw_dir, 'pedidos_raw.csv'), 'a') as f:
+        f.write('\nKeyboard,104,204,1,49.99,pix,delivered,2023-04-01')
+    process_order_data(incremental=True)
+    assert len(pd.read_csv(os.path.join('data', 'desafio', 'processed', 'fato_orders.csv'))) == 1
+    
+    assert generate_reports(incremental=True, rebuild=True) == "Reports generated successfully"
+    report = pd.read_csv(os.path.join('data', 'desafio', 'reports', 'orders_by_month.csv'))
+    assert report['count'].sum() == 4
+
+# Test the DAG callables only import the task module when a task runs
+def test_dag_callables_are_lazy():
+    pytest.importorskip('airflow.models')
+    from dags import pipeline_airflow
+    
+    assert pipeline_airflow.list_partitions.__name__ == 'list_partitions'
+    with patch('steps.pipeline_tasks.list_partitions', return_value=[]) as mock_list_partitions:
+        assert pipeline_airflow.list_partitions(ds='2025-04-03') == []
+    mock_list_partitions.assert_called_once_with(ds='2025-04-03')
+
+# Test parsing the DAG file stays within the scheduler's time budget and imports no task dependencies
+def test_dag_parse_budget():
+    pytest.importorskip('airflow.models')
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+    from bench_dag_parse import check, measure
+    
+    assert check([measure()], budget_ms=250) == []
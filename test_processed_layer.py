@@ -0,0 +1,52 @@
+import pytest
+import pandas as pd
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.processed_layer import ProcessedWriter, processed_path, read_processed
+
+@pytest.fixture
+def sample_orders_df():
+    return pd.DataFrame({
+        'user_id': [1001, 1003],
+        'created_at': ['2025-04-01 10:45', '2025-04-03 08:15'],
+        'items': ['Laptop, Mouse', 'Monitor, Keyboard'],
+        'total': [1200.0, 25.99],
+        'payment_status': ['Paid', 'Paid'],
+        'payment_method': ['Credit Card', 'Debit Card'],
+        'payment_date': pd.to_datetime(['2025-04-01 11:00', None]),
+        'shipping_status': ['Delivered', 'Sent'],
+        'shipping_status_date_awaiting_payment': pd.to_datetime(['2025-04-01 10:45', '2025-04-03 08:15']),
+        'shipping_status_date_preparing': pd.to_datetime(['2025-04-01 12:30', '2025-04-03 10:00']),
+        'shipping_status_date_sent': pd.to_datetime(['2025-04-02 09:00', '2025-04-03 14:45']),
+        'shipping_status_date_delivered': pd.to_datetime(['2025-04-03 15:20', None]),
+    })
+
+# Test the Parquet layer keeps the explicit types and reads only the requested columns
+def test_parquet_round_trip(sample_orders_df, tmp_path):
+    pytest.importorskip('pyarrow')
+    with ProcessedWriter(str(tmp_path), 'fato_orders', 'parquet') as writer:
+        writer.write(sample_orders_df.iloc[:1])
+        writer.write(sample_orders_df.iloc[1:])
+    
+    orders = read_processed(str(tmp_path), 'fato_orders', columns=['created_at', 'total', 'payment_method'], fmt='parquet')
+    
+    assert list(orders.columns) == ['created_at', 'total', 'payment_method']
+    assert pd.api.types.is_datetime64_any_dtype(orders['created_at'])
+    assert isinstance(orders['payment_method'].dtype, pd.CategoricalDtype)
+    assert orders['total'].tolist() == [1200.0, 25.99]
+
+# Test the CSV layer stays the default and appends chunks under a single header
+def test_csv_chunks_single_header(sample_orders_df, tmp_path):
+    with ProcessedWriter(str(tmp_path), 'fato_orders', 'csv') as writer:
+        writer.write(sample_orders_df.iloc[:1])
+        writer.write(sample_orders_df.iloc[1:])
+    
+    assert processed_path(str(tmp_path), 'fato_orders', 'csv').endswith('fato_orders.csv')
+    orders = read_processed(str(tmp_path), 'fato_orders', columns=['user_id', 'payment_date'], fmt='csv',
+                            parse_dates=['created_at', 'payment_date'])
+    assert orders['user_id'].tolist() == [1001, 1003]
+    assert orders['payment_date'].isna().tolist() == [False, True]
@@ -0,0 +1,74 @@
+import pytest
+import pandas as pd
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.reports import (DAY_LEVEL, REPORT_SPECS, build_reports, finalize_reports, fold_partials,
+                           load_report_state, partial_aggregates, required_columns, save_report_state)
+
+@pytest.fixture
+def sample_orders():
+    return pd.DataFrame({
+        'user_id': [1001, 1002, 1001, 1003],
+        'created_at': ['2025-03-30 10:45', '2025-04-02 14:30', '2025-04-03 08:15', '2025-04-04 09:50'],
+        'items': ['Laptop, Mouse', 'Headphones', 'Mouse', 'Mouse, Mouse'],
+        'total': [1200.0, 150.0, 100.0, 50.0],
+        'payment_method': ['Credit Card', 'PayPal', 'Credit Card', 'PayPal'],
+        'shipping_status': ['Delivered', 'Preparing', 'Sent', 'Delivered'],
+    })
+
+# Test the reports only need the columns named in the specs
+def test_required_columns():
+    assert set(required_columns(REPORT_SPECS)) == {'created_at', 'payment_method', 'total', 'shipping_status',
+                                                   'user_id', 'items'}
+
+# Test every report is computed in one pass and matches the expected aggregates
+def test_build_reports(sample_orders):
+    reports = build_reports([sample_orders])
+    
+    assert reports['orders_by_month'].astype(str).values.tolist() == [['2025-03', '1'], ['2025-04', '3']]
+    assert reports['revenue_by_payment'].values.tolist() == [['Credit Card', 1300.0], ['PayPal', 200.0]]
+    assert reports['orders_by_status'].values.tolist() == [['Delivered', 2], ['Preparing', 1], ['Sent', 1]]
+    assert reports['avg_ticket_by_customer'].values.tolist() == [[1001, 650.0], [1002, 150.0], [1003, 50.0]]
+    assert reports['top_products'].values.tolist()[0] == ['Mouse', 4]
+
+# Test building from chunks gives the same reports as a single frame
+def test_build_reports_chunked(sample_orders):
+    whole = build_reports([sample_orders])
+    chunked = build_reports([sample_orders.iloc[:1], sample_orders.iloc[1:3], sample_orders.iloc[3:]])
+    
+    for name in REPORT_SPECS:
+        pd.testing.assert_frame_equal(whole[name], chunked[name], check_dtype=False)
+
+# Test folding day by day into saved state gives the same reports as a full build
+def test_fold_partials_incremental(sample_orders, tmp_path):
+    whole = build_reports([sample_orders])
+    
+    state = None
+    for day in [sample_orders.iloc[:2], sample_orders.iloc[2:3], sample_orders.iloc[3:]]:
+        state = fold_partials([day], REPORT_SPECS, load_report_state(str(tmp_path)), by_day=True)
+        save_report_state(state, str(tmp_path))
+    reports = finalize_reports(load_report_state(str(tmp_path)))
+    
+    for name in REPORT_SPECS:
+        pd.testing.assert_frame_equal(whole[name], reports[name], check_dtype=False)
+
+# Test the daily state keeps the day level except for specs with daily_state=False
+def test_partial_aggregates_by_day(sample_orders):
+    partials = partial_aggregates(sample_orders, REPORT_SPECS, by_day=True)
+    
+    assert partials['orders_by_status'].index.names == [DAY_LEVEL, 'shipping_status']
+    assert partials['avg_ticket_by_customer'].index.names == ['user_id']
+    assert load_report_state('missing_state_dir') is None
+
+# Test created_at is parsed with the registry's format, so raw and processed timestamps can share a chunk
+def test_reports_mixed_timestamp_formats(sample_orders):
+    mixed = sample_orders.assign(created_at=['2025-03-30 10:45', '2025-04-02 14:30:00', '2025-04-03T08:15:00',
+                                             '2025-04-04 09:50'])
+    
+    assert build_reports([mixed])['orders_by_month']['count'].tolist() == [1, 3]
+    assert partial_aggregates(mixed, by_day=True)['orders_by_month'].index.get_level_values(DAY_LEVEL).tolist() == [
+        '2025-03-30', '2025-04-02', '2025-04-03', '2025-04-04']
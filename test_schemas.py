@@ -0,0 +1,34 @@
+import pandas as pd
+import os
+import sys
+from io import StringIO
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.schemas import csv_dtypes, parse_datetimes
+
+# Test raw orders are read with compact dtypes and explicitly formatted dates
+def test_orders_read_with_registry():
+    raw = StringIO(
+        "user_id,created_at,items,total,payment_status,payment_method,payment_date,shipping_status\n"
+        "1001,2025-04-01 10:45,\"Laptop, Mouse\",1200.00,Paid,Credit Card,2025-04-01 11:00,Delivered\n"
+        ",2025-04-02 14:30 ,Headphones,150.00,Awaiting,PayPal,,Preparing\n"
+    )
+    orders = parse_datetimes(pd.read_csv(raw, dtype=csv_dtypes('pedidos_raw')), 'pedidos_raw')
+    
+    # A missing ID doesn't turn the column into float64
+    assert orders['user_id'].dtype == 'Int32'
+    assert orders['user_id'].isna().tolist() == [False, True]
+    assert isinstance(orders['payment_method'].dtype, pd.CategoricalDtype)
+    assert orders['created_at'].tolist() == [pd.Timestamp('2025-04-01 10:45'), pd.Timestamp('2025-04-02 14:30')]
+    assert orders['payment_date'].isna().tolist() == [False, True]
+
+# Test CPFs without punctuation stay text and keep their leading zeros
+def test_cpf_read_as_text():
+    raw = StringIO("user_id,name,entry_date,entry_time,update_date,e-mail,cpf\n"
+                   "1001,Ana,2025-04-01,09:45,2025-04-05,ana@example.com,01234567890\n")
+    users = pd.read_csv(raw, dtype=csv_dtypes('user_raw'))
+    
+    assert users['cpf'].tolist() == ['01234567890']
+    assert users['entry_time'].tolist() == ['09:45']
@@ -0,0 +1,66 @@
+import pytest
+import pandas as pd
+import io
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.sharding import _ByteRangeReader, byte_ranges, process_csv_sharded
+from steps.watermarks import WatermarkFilter
+
+def clean_orders(df):
+    df = df.dropna()
+    df['items'] = df['items'].str.upper()
+    return df
+
+@pytest.fixture
+def raw_orders(tmp_path):
+    df = pd.DataFrame({
+        'user_id': range(1000, 1100),
+        'created_at': pd.date_range('2025-04-01', periods=100, freq='h').strftime('%Y-%m-%d %H:%M'),
+        'items': ['Laptop, Mouse' if i % 7 else None for i in range(100)],
+    })
+    path = tmp_path / 'pedidos_raw.csv'
+    df.to_csv(path, index=False)
+    return str(path), df
+
+# Test the byte ranges cover every data line exactly once and always start at a line
+def test_byte_ranges_split_on_lines(raw_orders):
+    path, _ = raw_orders
+    header, ranges = byte_ranges(path, 6)
+    
+    with open(path, 'rb') as f:
+        content = f.read()
+    assert header == content[:len(header)]
+    assert ranges[0][0] == len(header) and ranges[-1][1] == len(content)
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+    assert all(content[start - 1:start] == b'\n' for start, _ in ranges)
+
+# Test each range is read lazily as the header followed by exactly its own bytes
+def test_byte_range_reader(raw_orders):
+    path, _ = raw_orders
+    header, ranges = byte_ranges(path, 3)
+    
+    with open(path, 'rb') as f:
+        content = f.read()
+    with open(path, 'rb', buffering=0) as f:
+        for start, end in ranges:
+            reader = io.BufferedReader(_ByteRangeReader(f, header, start, end), buffer_size=64)
+            assert reader.read(10) == header[:10]
+            assert reader.read() == header[10:] + content[start:end]
+
+# Test the sharded output is the same file a single pass writes, and the watermark sees every shard
+def test_sharded_matches_single_pass(raw_orders, tmp_path):
+    path, df = raw_orders
+    state_file = str(tmp_path / 'watermarks.json')
+    watermark = WatermarkFilter('orders', 'created_at', state_file=state_file)
+    
+    output = process_csv_sharded(path, str(tmp_path / 'processed'), 'fato_orders', clean_orders, shards=4, fmt='csv',
+                                 chunksize=10, watermark=watermark, workers=2)
+    
+    expected = clean_orders(pd.read_csv(path))
+    pd.testing.assert_frame_equal(pd.read_csv(output), expected.reset_index(drop=True))
+    assert watermark.max_seen == pd.Timestamp(df['created_at'].max())
+    assert not os.path.exists(tmp_path / 'processed' / '.fato_orders.parts')
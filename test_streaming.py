@@ -0,0 +1,78 @@
+import pytest
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.instrumentation import instrument, record
+from steps.streaming import run_stream
+
+# Test chunks flow through the stages in order, with at most queue_size chunks waiting between two stages
+def test_run_stream_order_and_backpressure():
+    produced = []
+    consumed = []
+    max_ahead = []
+
+    def source():
+        for i in range(20):
+            produced.append(i)
+            record(rows_in=1)
+            yield i
+
+    def sink(chunks):
+        for chunk in chunks:
+            max_ahead.append(len(produced) - len(consumed))
+            consumed.append(chunk)
+            record(rows_out=1)
+        return len(consumed)
+
+    with instrument('stream_test') as metrics:
+        result = run_stream(source(), [lambda x: x * 10], sink, queue_size=2)
+
+    assert result == 20
+    assert consumed == list(range(0, 200, 10))
+    # The chunk being consumed, two queues of 2 chunks and one chunk held by the source and by the stage
+    assert max(max_ahead) <= 1 + 2 * 2 + 2
+    # record() in the stage threads counts towards the caller's stage
+    assert metrics.counters['rows_in'] == 20
+    assert metrics.counters['rows_out'] == 20
+
+    # A stage returning None drops the chunk
+    assert run_stream(range(10), [lambda x: x if x % 2 else None], list) == [1, 3, 5, 7, 9]
+
+# Test a failing stage stops the source and the sink and its error reaches the caller
+def test_run_stream_propagates_errors():
+    produced = []
+
+    def source():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    def clean(chunk):
+        if chunk == 3:
+            raise ValueError('bad chunk')
+        return chunk
+
+    with pytest.raises(ValueError, match='bad chunk'):
+        run_stream(source(), [clean], list, queue_size=1)
+    # The source stopped a few chunks after the failure instead of reading everything
+    assert len(produced) < 10
+
+# Test a streamed run's reject report holds that run's rejected chunks only
+def test_dimension_sink_rejects_per_run(tmp_path):
+    import pandas as pd
+    import load_data_to_postgres as loader
+    from stream_to_postgres import dimension_sink
+    rejects_file = str(tmp_path / 'rejects' / 'users_rejected.csv')
+    
+    def upsert(engine, chunk, append_rejects=False):
+        loader.write_rejects(chunk, rejects_file, append=append_rejects)
+        return len(chunk)
+    
+    sink = dimension_sink(None, upsert, rejects_file, {'start': 0})
+    assert sink(iter([pd.DataFrame({'user_id': [1]}), pd.DataFrame({'user_id': [2]})])) == 2
+    assert pd.read_csv(rejects_file)['user_id'].tolist() == [1, 2]
+    assert sink(iter([pd.DataFrame({'user_id': [3]})])) == 1
+    assert pd.read_csv(rejects_file)['user_id'].tolist() == [3]
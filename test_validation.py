@@ -0,0 +1,38 @@
+import pandas as pd
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.validation import CONSTRAINTS, validate
+
+# Test each rule flags its rows with its reason code, the first failing rule winning
+def test_validate_reason_codes():
+    products = pd.DataFrame({
+        'product_id': pd.array([1, 2, 3, 4, 5, 5, None], dtype='Int32'),
+        'name': ['Mouse', None, 'x' * 101, 'Cabo', 'Hub', 'Hub USB', 'Fone'],
+        'price': [10.0, 5.0, 5.0, -1.0, 2.0, 3.0, 1.0],
+        'stock': pd.array([1, 1, 1, 1, 1, 1, 1], dtype='Int32'),
+        'created_at': pd.to_datetime(['2025-04-01'] * 7),
+    })
+    
+    valid, rejected = validate(products, 'dim_produtos')
+    
+    assert valid['product_id'].tolist() == [1, 5]
+    assert valid['name'].tolist() == ['Mouse', 'Hub USB']
+    assert rejected['reject_reason'].tolist() == ['null_name', 'too_long_name', 'negative_price',
+                                                  'duplicate_product_id', 'null_product_id']
+    assert list(rejected.columns) == list(products.columns) + ['reject_reason']
+
+# Test foreign keys are checked against the referenced table's key set
+def test_validate_foreign_keys():
+    columns = CONSTRAINTS['fato_pedidos']['not_null']
+    orders = pd.DataFrame({col: ['x'] * 3 for col in columns})
+    orders['user_id'] = pd.array([1, 2, 3], dtype='Int32')
+    orders['total'] = [10.0, 1e8, 5.0]
+    
+    valid, rejected = validate(orders, 'fato_pedidos', {'dim_usuarios': pd.Index([1, 2])})
+    
+    assert valid['user_id'].tolist() == [1]
+    assert rejected['reject_reason'].tolist() == ['out_of_range_total', 'unknown_user_id']
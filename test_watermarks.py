@@ -0,0 +1,52 @@
+import pytest
+import pandas as pd
+import os
+import sys
+
+# Add the project root to the path so we can import the modules
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from steps.watermarks import WatermarkFilter, get_watermark
+
+@pytest.fixture
+def sample_orders_raw():
+    return pd.DataFrame({
+        'user_id': [1001, 1002, 1003],
+        'created_at': ['2025-04-01 10:45', '2025-04-02 14:30', '2025-04-03 08:15'],
+    })
+
+# Test the first run keeps everything and the watermark only moves on commit
+def test_watermark_first_run(sample_orders_raw, tmp_path):
+    state_file = str(tmp_path / 'watermarks.json')
+    watermark = WatermarkFilter('orders', 'created_at', state_file=state_file)
+    
+    assert len(watermark(sample_orders_raw)) == 3
+    assert get_watermark('orders', state_file) is None
+    
+    watermark.commit()
+    assert get_watermark('orders', state_file) == pd.Timestamp('2025-04-03 08:15')
+
+# Test later runs only keep rows newer than the watermark, across chunks
+def test_watermark_filters_processed_rows(sample_orders_raw, tmp_path):
+    state_file = str(tmp_path / 'watermarks.json')
+    first = WatermarkFilter('orders', 'created_at', state_file=state_file)
+    first(sample_orders_raw.iloc[:2])
+    first.commit()
+    
+    second = WatermarkFilter('orders', 'created_at', state_file=state_file)
+    kept = pd.concat([second(sample_orders_raw.iloc[:1]), second(sample_orders_raw.iloc[1:])])
+    second.commit()
+    
+    assert kept['user_id'].tolist() == [1003]
+    assert get_watermark('orders', state_file) == pd.Timestamp('2025-04-03 08:15')
+
+# Test inclusive watermarks keep rows on the watermark itself (for upserted sources)
+def test_watermark_inclusive(tmp_path):
+    state_file = str(tmp_path / 'watermarks.json')
+    users = pd.DataFrame({'user_id': [1001, 1002], 'update_date': ['2025-04-05', '2025-04-06']})
+    first = WatermarkFilter('users', 'update_date', inclusive=True, state_file=state_file)
+    first(users)
+    first.commit()
+    
+    second = WatermarkFilter('users', 'update_date', inclusive=True, state_file=state_file)
+    assert second(users)['user_id'].tolist() == [1002]